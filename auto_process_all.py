@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 PROCESSORE AUTOMATICO COMPLETO
-Pipeline completa: HTML → Metadata → TXT → LLM Entities → XML → Chunks → Embeddings → Markdown
+Pipeline completa: HTML → Metadata → TXT → LLM Entities → XML → Chunks → Embeddings → Markdown → Categorie
 """
 
 import sys
@@ -15,10 +15,14 @@ import os
 from html_metadata_extractor import process_all_html, extract_sentenze_from_html
 from final_pdf_extractor import process_single_pdf
 from llm_entity_extractor import process_sentenza_llm
+from ner_entity_extractor import NEREntityExtractor, process_sentenza_ner
 from akoma_ntoso_generator import process_sentenza_akoma_ntoso
 from chunking_processor import process_sentenza_chunking
 from embeddings_generator import process_sentenza_embeddings
 from markdown_generator import process_sentenza_markdown
+from section_segmenter import segment_sections
+from header_parser import parse_header
+from categorizer import process_categorization
 
 
 def main():
@@ -29,9 +33,9 @@ def main():
 
     # Determina backend LLM per estrazione entità
     backend = os.getenv('LLM_BACKEND', 'gemini')
-    has_api_key = bool(os.getenv('GOOGLE_API_KEY') or os.getenv('ANTHROPIC_API_KEY') or backend == 'ollama')
+    has_api_key = bool(os.getenv('GOOGLE_API_KEY') or os.getenv('ANTHROPIC_API_KEY') or backend in ('ollama', 'ner'))
 
-    print(f"🤖 Metodo estrazione entità: LLM")
+    print(f"🤖 Metodo estrazione entità: {'NER locale' if backend == 'ner' else 'LLM'}")
     print(f"   Backend: {backend}")
 
     if not has_api_key:
@@ -41,6 +45,7 @@ def main():
         print("     - Gemini:  export GOOGLE_API_KEY='...'")
         print("     - Claude:  export ANTHROPIC_API_KEY='sk-ant-...'")
         print("     - Ollama:  export LLM_BACKEND='ollama' (locale)")
+        print("     - NER:     export LLM_BACKEND='ner' (locale, offline)")
         print()
         print("   Puoi comunque estrarre entità manualmente con Claude.ai")
         print("   usando il prompt in PROGRESS.md")
@@ -83,11 +88,15 @@ def main():
     print(f"📂 {len(pdf_files)} PDFs disponibili")
     print()
 
+    # Modello NER caricato una sola volta per tutta la pipeline
+    ner_extractor = NEREntityExtractor() if backend == 'ner' else None
+
     # Contatori
     processed = 0
     skipped = 0
     errors = 0
     no_pdf = 0
+    processed_ids = []
 
     # PROCESSA ogni sentenza
     print("="*80)
@@ -127,18 +136,28 @@ def main():
             txt_result = process_single_pdf(str(matching_pdf), sentenza_id, str(Path.cwd()))
             txt_path = Path(txt_result['txt_file'])
 
-            # Step 2: TXT → Entities (LLM)
-            print(f"   → Step 2: LLM entity extraction...")
-            entity_result = process_sentenza_llm(txt_path, sentenza_id, entities_dir, backend=backend)
+            # Sezioni e intestazione calcolate una volta e condivise da XML, chunking e Markdown
+            text = txt_path.read_text(encoding='utf-8')
+            sections = segment_sections(text)
+            header = parse_header(text)
+
+            # Step 2: TXT → Entities (LLM o NER locale)
+            if ner_extractor:
+                print(f"   → Step 2: NER entity extraction...")
+                entity_result = process_sentenza_ner(txt_path, sentenza_id, entities_dir, extractor=ner_extractor)
+            else:
+                print(f"   → Step 2: LLM entity extraction...")
+                entity_result = process_sentenza_llm(txt_path, sentenza_id, entities_dir, backend=backend)
             entities_path = Path(entity_result['output_file'])
 
             # Step 3: TXT + Entities → Akoma Ntoso XML
             print(f"   → Step 3: Akoma Ntoso XML...")
-            xml_result = process_sentenza_akoma_ntoso(txt_path, entities_path, sentenza_id, akoma_dir)
+            xml_result = process_sentenza_akoma_ntoso(txt_path, entities_path, sentenza_id, akoma_dir,
+                                                      sections=sections, header=header)
 
             # Step 4: TXT → Chunks
             print(f"   → Step 4: Chunking...")
-            chunks_result = process_sentenza_chunking(txt_path, sentenza_id, chunks_dir, use_both=True)
+            chunks_result = process_sentenza_chunking(txt_path, sentenza_id, chunks_dir, sections=sections)
             chunks_path = Path(chunks_result['output_file'])
 
             # Step 5: Chunks → Embeddings
@@ -147,10 +166,12 @@ def main():
 
             # Step 7: TXT + Entities + Chunks → Markdown AI
             print(f"   → Step 7: Markdown AI...")
-            markdown_result = process_sentenza_markdown(txt_path, entities_path, chunks_path, sentenza_id, markdown_dir)
+            markdown_result = process_sentenza_markdown(txt_path, entities_path, chunks_path, sentenza_id, markdown_dir,
+                                                        sections=sections, header=header)
 
             print(f"   ✅ Completata ({txt_result['txt_length']:,} char)")
             processed += 1
+            processed_ids.append(sentenza_id)
 
         except Exception as e:
             errors += 1
@@ -158,6 +179,17 @@ def main():
 
         print()
 
+    # Step 6: categorizzazione a lotti (le sentenze ambigue di tutto il run
+    # condividono i prompt LLM, le altre si decidono con whitelist/blacklist)
+    if processed_ids:
+        print("🏷️  STEP 6: Categorizzazione")
+        print("-"*80)
+        llm_backend = backend if has_api_key and backend != 'ner' else None
+        categorization = process_categorization(processed_ids, txt_dir, backend=llm_backend)
+        print(f"✅ {categorization['documents']} sentenze: {categorization['whitelist']} whitelist, "
+              f"{categorization['blacklist']} blacklist, {categorization['ambigue']} ambigue "
+              f"({categorization['llm_calls']} chiamate LLM)\n")
+
     # RIEPILOGO FINALE
     print("="*80)
     print("RIEPILOGO FINALE")
@@ -178,6 +210,7 @@ def main():
         print(f"   Chunks:      chunks/")
         print(f"   Embeddings:  embeddings/")
         print(f"   Markdown:    markdown_ai/")
+        print(f"   Categorie:   categorization/")
 
 
 if __name__ == '__main__':
@@ -2,14 +2,42 @@
 """
 STEP 5: Compress TXT files by year
 Comprime tutti i file TXT di un anno in un archivio .tar.gz
+
+Ogni archivio ha un manifest (<archivio>.manifest.json) con SHA-256 e
+dimensione di ogni file, calcolati durante la compressione; i TXT vengono
+cancellati (--delete-after) solo dopo la verifica dell'archivio contro il
+manifest. --all-years comprime tutti gli anni in parallelo (un processo per
+anno).
+
+Formato alternativo --format stxa: dizionario zstd addestrato su un campione
+dei TXT (intestazioni, "RAGIONI DELLA DECISIONE", P.Q.M., formule di rito) e
+ogni sentenza compressa come frame indipendente su più thread; l'archivio è
+leggibile per singola sentenza senza estrazione (scripts/txt_archive.py).
 """
 
+import io
 import os
+import re
 import json
+import time
+import hashlib
 import tarfile
 import argparse
+import threading
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+# Archivio ad accesso casuale condiviso con gli script di processing
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'scripts'))
+from txt_archive import (
+    ARCHIVE_SUFFIX, TxtArchive, TxtArchiveWriter, default_codec,
+    make_compressor, make_decompressor, sample_files, train_dictionary
+)
+
+MANIFEST_SUFFIX = '.manifest.json'
+HASH_CHUNK_SIZE = 1024 * 1024
 
 
 def load_sentences_for_year(year, metadata_dir="metadata"):
@@ -30,27 +58,14 @@ def load_sentences_for_year(year, metadata_dir="metadata"):
         return []
 
 
-def compress_txt_files(year, txt_dir="txt", output_dir="txt_compressed", metadata_dir="metadata", delete_after=False):
-    """
-    Comprime tutti i TXT di un anno in un archivio .tar.gz
-
-    Args:
-        year: Anno da comprimere
-        txt_dir: Directory contenente i file TXT
-        output_dir: Directory output archivi compressi
-        metadata_dir: Directory metadata JSON
-        delete_after: Se True, cancella i TXT dopo compressione
-    """
-    print(f"🗜️  Compressione TXT Anno {year}")
-    print(f"📁 Input: {txt_dir}")
-    print(f"📦 Output: {output_dir}\n")
-
+def find_txt_files(year, txt_dir="txt", metadata_dir="metadata"):
+    """TXT esistenti delle sentenze di un anno (lista vuota se nessuno)"""
     # Carica ID sentenze per l'anno
     sentence_ids = load_sentences_for_year(year, metadata_dir)
 
     if not sentence_ids:
         print(f"✗ Nessuna sentenza trovata per anno {year}")
-        return
+        return []
 
     print(f"📊 Sentenze anno {year}: {len(sentence_ids)}")
 
@@ -58,7 +73,7 @@ def compress_txt_files(year, txt_dir="txt", output_dir="txt_compressed", metadat
     txt_path = Path(txt_dir)
     if not txt_path.exists():
         print(f"✗ Directory TXT non trovata: {txt_dir}")
-        return
+        return []
 
     txt_files = []
     missing = 0
@@ -76,8 +91,184 @@ def compress_txt_files(year, txt_dir="txt", output_dir="txt_compressed", metadat
 
     if not txt_files:
         print("\n✗ Nessun file TXT da comprimere")
+        return []
+
+    return txt_files
+
+
+def delete_txt_files(txt_files):
+    """Cancella i TXT originali dopo la compressione"""
+    print(f"\n🗑️  Cancellazione file TXT originali...")
+    deleted = 0
+    for txt_file in txt_files:
+        try:
+            txt_file.unlink()
+            deleted += 1
+        except Exception as e:
+            print(f"   ✗ Errore cancellazione {txt_file.name}: {e}")
+    print(f"   ✓ {deleted}/{len(txt_files)} file cancellati")
+
+
+class _HashingReader:
+    """File in lettura che aggiorna lo SHA-256 mentre tarfile lo copia"""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self._fileobj.read(size)
+        self.sha256.update(data)
+        return data
+
+
+def _file_sha256(path):
+    """SHA-256 di un file letto a blocchi"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def manifest_path_for(archive_path):
+    archive_path = Path(archive_path)
+    return archive_path.with_name(archive_path.name + MANIFEST_SUFFIX)
+
+
+def write_manifest(archive_path, year, archive_format, members):
+    """
+    Scrive il manifest dell'archivio
+
+    Args:
+        archive_path: Archivio creato
+        year: Anno
+        archive_format: 'tar.gz' o 'stxa'
+        members: {nome_file: {'size': ..., 'sha256': ...}}
+    """
+    archive_path = Path(archive_path)
+    manifest = {
+        'generated_at': datetime.now().isoformat(),
+        'year': str(year),
+        'format': archive_format,
+        'archive': archive_path.name,
+        'archive_size': archive_path.stat().st_size,
+        'archive_sha256': _file_sha256(archive_path),
+        'total_members': len(members),
+        'members': members,
+    }
+
+    manifest_path = manifest_path_for(archive_path)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest_path
+
+
+def _iter_archive_members(archive_path):
+    """(nome_file, SHA-256, dimensione) dei file contenuti, letti in streaming"""
+    archive_path = Path(archive_path)
+
+    if archive_path.suffix == ARCHIVE_SUFFIX:
+        with TxtArchive(archive_path) as archive:
+            for sentenza_id in archive.sentenza_ids:
+                data = archive.read(sentenza_id)
+                yield f"{sentenza_id}.txt", hashlib.sha256(data).hexdigest(), len(data)
         return
 
+    with tarfile.open(archive_path, 'r:gz') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            sha256 = hashlib.sha256()
+            size = 0
+            fileobj = tar.extractfile(member)
+            for block in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b''):
+                sha256.update(block)
+                size += len(block)
+            yield member.name, sha256.hexdigest(), size
+
+
+def verify_archive(archive_path):
+    """
+    Verifica un archivio contro il suo manifest
+
+    Controlla SHA-256 dell'archivio e, decomprimendo in streaming, SHA-256 e
+    dimensione di ogni file; segnala file mancanti o in più.
+
+    Returns:
+        dict: {'ok': bool, 'checked': n, 'errors': [...]}
+    """
+    manifest_path = manifest_path_for(archive_path)
+    if not manifest_path.exists():
+        return {'ok': False, 'checked': 0, 'errors': [f"manifest non trovato: {manifest_path}"]}
+
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    errors = []
+    if _file_sha256(archive_path) != manifest['archive_sha256']:
+        errors.append("SHA-256 archivio diverso dal manifest")
+
+    expected = manifest['members']
+    seen = set()
+    try:
+        for name, sha256, size in _iter_archive_members(archive_path):
+            seen.add(name)
+            entry = expected.get(name)
+            if entry is None:
+                errors.append(f"{name}: non presente nel manifest")
+            elif entry['sha256'] != sha256 or entry['size'] != size:
+                errors.append(f"{name}: checksum diverso")
+    except Exception as e:
+        errors.append(f"errore lettura archivio: {e}")
+
+    for name in sorted(set(expected) - seen):
+        errors.append(f"{name}: mancante nell'archivio")
+
+    return {'ok': not errors, 'checked': len(seen), 'errors': errors}
+
+
+def _verify_and_delete(archive_path, txt_files, delete_after):
+    """Verifica archivio e manifest; cancella i TXT solo se la verifica passa"""
+    print(f"\n🔍 Verifica checksum...")
+    verification = verify_archive(archive_path)
+
+    if verification['ok']:
+        print(f"   ✓ {verification['checked']} file verificati (SHA-256)")
+        if delete_after:
+            delete_txt_files(txt_files)
+    else:
+        print(f"   ✗ Verifica fallita ({len(verification['errors'])} errori)")
+        for error in verification['errors'][:10]:
+            print(f"      - {error}")
+        if delete_after:
+            print(f"   ⚠️  TXT originali NON cancellati")
+
+    return verification
+
+
+def compress_txt_files(year, txt_dir="txt", output_dir="txt_compressed", metadata_dir="metadata", delete_after=False):
+    """
+    Comprime tutti i TXT di un anno in un archivio .tar.gz
+
+    Args:
+        year: Anno da comprimere
+        txt_dir: Directory contenente i file TXT
+        output_dir: Directory output archivi compressi
+        metadata_dir: Directory metadata JSON
+        delete_after: Se True, cancella i TXT dopo compressione e verifica
+
+    Returns:
+        dict: Statistiche (None se nessun TXT o errore)
+    """
+    print(f"🗜️  Compressione TXT Anno {year}")
+    print(f"📁 Input: {txt_dir}")
+    print(f"📦 Output: {output_dir}\n")
+
+    txt_files = find_txt_files(year, txt_dir, metadata_dir)
+    if not txt_files:
+        return None
+
     # Crea directory output
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
@@ -88,13 +279,18 @@ def compress_txt_files(year, txt_dir="txt", output_dir="txt_compressed", metadat
 
     print(f"\n📦 Creazione archivio: {archive_name}")
 
-    # Crea archivio tar.gz
+    # Crea archivio tar.gz (SHA-256 calcolato mentre il file viene copiato)
+    members = {}
     try:
         with tarfile.open(archive_path, 'w:gz') as tar:
             for i, txt_file in enumerate(txt_files, 1):
                 # Aggiungi file all'archivio con percorso relativo
                 arcname = txt_file.name  # Solo il nome file, senza path
-                tar.add(txt_file, arcname=arcname)
+                tarinfo = tar.gettarinfo(txt_file, arcname=arcname)
+                with open(txt_file, 'rb') as f:
+                    reader = _HashingReader(f)
+                    tar.addfile(tarinfo, reader)
+                members[arcname] = {'size': tarinfo.size, 'sha256': reader.sha256.hexdigest()}
 
                 if i % 100 == 0 or i == len(txt_files):
                     print(f"   [{i}/{len(txt_files)}] file aggiunti...")
@@ -111,30 +307,271 @@ def compress_txt_files(year, txt_dir="txt", output_dir="txt_compressed", metadat
         print(f"📉 Dimensione compressa: {archive_size / 1024 / 1024:.2f} MB")
         print(f"🎯 Compressione: {compression_ratio:.1f}%")
 
-        # Cancella TXT se richiesto
-        if delete_after:
-            print(f"\n🗑️  Cancellazione file TXT originali...")
-            deleted = 0
-            for txt_file in txt_files:
-                try:
-                    txt_file.unlink()
-                    deleted += 1
-                except Exception as e:
-                    print(f"   ✗ Errore cancellazione {txt_file.name}: {e}")
-            print(f"   ✓ {deleted}/{len(txt_files)} file cancellati")
+        manifest_path = write_manifest(archive_path, year, 'tar.gz', members)
+        print(f"🧾 Manifest: {manifest_path}")
+
+        # Cancella TXT se richiesto (solo dopo verifica)
+        verification = _verify_and_delete(archive_path, txt_files, delete_after)
+
+        return {
+            'year': str(year),
+            'archive': str(archive_path),
+            'documents': len(txt_files),
+            'raw_bytes': total_txt_size,
+            'file_bytes': archive_size,
+            'verified': verification['ok'],
+        }
 
     except Exception as e:
         print(f"✗ Errore durante compressione: {e}")
         import traceback
         traceback.print_exc()
+        return None
+
+
+def _thread_map(make_fn, items, threads):
+    """
+    Applica una funzione creata per thread (compressori e decompressori non
+    sono thread-safe) mantenendo l'ordine degli elementi
+    """
+    local = threading.local()
+
+    def run(item):
+        fn = getattr(local, 'fn', None)
+        if fn is None:
+            fn = local.fn = make_fn()
+        return fn(item)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for result in executor.map(run, items):
+            yield result
+
+
+def _benchmark_tar_gz(txt_files):
+    """Tempi e dimensione del tar.gz attuale (in memoria) sugli stessi TXT"""
+    buffer = io.BytesIO()
+
+    start = time.perf_counter()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as tar:
+        for txt_file in txt_files:
+            tar.add(txt_file, arcname=txt_file.name)
+    compress_seconds = time.perf_counter() - start
+
+    buffer.seek(0)
+    start = time.perf_counter()
+    with tarfile.open(fileobj=buffer, mode='r:gz') as tar:
+        for member in tar:
+            tar.extractfile(member).read()
+    decompress_seconds = time.perf_counter() - start
+
+    return {
+        'bytes': len(buffer.getvalue()),
+        'compress_seconds': compress_seconds,
+        'decompress_seconds': decompress_seconds,
+    }
+
+
+def compress_txt_files_stxa(year, txt_dir="txt", output_dir="txt_compressed", metadata_dir="metadata",
+                            delete_after=False, codec=None, level=None, threads=None,
+                            dict_size=None, compare_tar=False):
+    """
+    Comprime i TXT di un anno in un archivio .stxa con dizionario addestrato
+
+    Il dizionario viene addestrato su un campione dei TXT dell'anno; ogni
+    sentenza è poi compressa indipendentemente (frame per sentenza) su più
+    thread: zstd e zlib rilasciano il GIL durante la compressione.
+
+    Args:
+        year: Anno da comprimere
+        txt_dir: Directory contenente i file TXT
+        output_dir: Directory output archivi compressi
+        metadata_dir: Directory metadata JSON
+        delete_after: Se True, cancella i TXT dopo compressione e verifica
+        codec: 'zstd' o 'zlib' (default: zstd se installato)
+        level: Livello compressione (default: 9)
+        threads: Thread di compressione (default: CPU disponibili)
+        dict_size: Dimensione dizionario in byte (default: in base al campione)
+        compare_tar: Se True confronta con il tar.gz sugli stessi TXT
+
+    Returns:
+        dict: Statistiche (None se nessun TXT)
+    """
+    codec = codec or default_codec()
+    threads = threads or os.cpu_count() or 1
+
+    print(f"🗜️  Compressione TXT Anno {year} (formato stxa, {codec}, {threads} thread)")
+    print(f"📁 Input: {txt_dir}")
+    print(f"📦 Output: {output_dir}\n")
+
+    txt_files = find_txt_files(year, txt_dir, metadata_dir)
+    if not txt_files:
+        return None
+
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    archive_path = output_path / f"{year}_sentenze_civile_quinta{ARCHIVE_SUFFIX}"
+
+    # Training dizionario
+    print(f"\n📚 Training dizionario...")
+    start = time.perf_counter()
+    dictionary = train_dictionary(sample_files(txt_files), codec, dict_size)
+    train_seconds = time.perf_counter() - start
+    print(f"   ✓ Dizionario {len(dictionary) / 1024:.0f} KB ({train_seconds:.1f}s)")
+
+    # Compressione parallela, scrittura nell'ordine dei file
+    print(f"\n📦 Creazione archivio: {archive_path.name}")
+
+    def make_compress():
+        compress = make_compressor(codec, dictionary, level)
+
+        def compress_file(txt_file):
+            data = txt_file.read_bytes()
+            return compress(data), len(data), hashlib.sha256(data).hexdigest()
+        return compress_file
+
+    members = {}
+    start = time.perf_counter()
+    with TxtArchiveWriter(archive_path, dictionary, codec, level) as writer:
+        frames = _thread_map(make_compress, txt_files, threads)
+        for i, (txt_file, (frame, size, sha256)) in enumerate(zip(txt_files, frames), 1):
+            writer.add_frame(txt_file.stem, frame, size)
+            members[txt_file.name] = {'size': size, 'sha256': sha256}
+            if i % 1000 == 0 or i == len(txt_files):
+                print(f"   [{i}/{len(txt_files)}] sentenze compresse...")
+    compress_seconds = time.perf_counter() - start
+
+    # Decompressione parallela di tutti i frame (throughput)
+    with TxtArchive(archive_path) as archive:
+        frames = [archive.frame(sid) for sid in archive.sentenza_ids]
+        start = time.perf_counter()
+        for _ in _thread_map(lambda: make_decompressor(archive.codec, archive.dictionary), frames, threads):
+            pass
+        decompress_seconds = time.perf_counter() - start
+        stats = archive.stats()
+
+    raw_mb = stats['raw_bytes'] / 1024 / 1024
+
+    stats.update({
+        'archive': str(archive_path),
+        'threads': threads,
+        'train_seconds': train_seconds,
+        'compress_mb_s': raw_mb / compress_seconds if compress_seconds else 0,
+        'decompress_mb_s': raw_mb / decompress_seconds if decompress_seconds else 0,
+    })
+
+    print(f"\n✅ Compressione completata!")
+    print(f"📦 Archivio: {archive_path}")
+    print(f"📊 File compressi: {stats['documents']}")
+    print(f"💾 Dimensione originale: {raw_mb:.2f} MB")
+    print(f"📉 Dimensione compressa: {stats['file_bytes'] / 1024 / 1024:.2f} MB "
+          f"(rapporto {stats['ratio']:.2f}x, dizionario incluso)")
+    print(f"⚡ Compressione: {stats['compress_mb_s']:.1f} MB/s | Decompressione: {stats['decompress_mb_s']:.1f} MB/s")
+
+    if compare_tar:
+        tar_stats = _benchmark_tar_gz(txt_files)
+        stats['tar_gz'] = tar_stats
+        print(f"\n📊 Confronto tar.gz (stessi TXT):")
+        print(f"   tar.gz: {tar_stats['bytes'] / 1024 / 1024:.2f} MB "
+              f"(rapporto {stats['raw_bytes'] / tar_stats['bytes']:.2f}x) | "
+              f"{raw_mb / tar_stats['compress_seconds']:.1f} MB/s compressione | "
+              f"{raw_mb / tar_stats['decompress_seconds']:.1f} MB/s decompressione")
+        print(f"   stxa:   {stats['file_bytes'] / tar_stats['bytes'] * 100:.0f}% della dimensione tar.gz")
+
+    manifest_path = write_manifest(archive_path, year, 'stxa', members)
+    print(f"🧾 Manifest: {manifest_path}")
+
+    verification = _verify_and_delete(archive_path, txt_files, delete_after)
+    stats.update({'year': str(year), 'verified': verification['ok']})
+
+    return stats
+
+
+# ==================== TUTTI GLI ANNI ====================
+
+def available_years(metadata_dir="metadata"):
+    """Anni con metadata_cassazione_YYYY.json (dal nome file, senza leggere i JSON)"""
+    years = []
+    for json_path in Path(metadata_dir).glob('metadata_cassazione_*.json'):
+        match = re.fullmatch(r'metadata_cassazione_(\d{4})\.json', json_path.name)
+        if match:
+            years.append(match.group(1))
+    return sorted(years)
+
+
+def _compress_year(year, archive_format, options):
+    """Worker del process pool: comprime un anno (il JSON dell'anno è letto una volta)"""
+    if archive_format == 'stxa':
+        return compress_txt_files_stxa(year, **options)
+    return compress_txt_files(year, **options)
+
+
+def compress_all_years(txt_dir="txt", output_dir="txt_compressed", metadata_dir="metadata",
+                       delete_after=False, archive_format='tar.gz', jobs=None, **stxa_options):
+    """
+    Comprime tutti gli anni in parallelo, un processo per anno
+
+    Args:
+        archive_format: 'tar.gz' o 'stxa'
+        jobs: Processi in parallelo (default: CPU disponibili)
+        stxa_options: codec / level / threads / dict_size / compare_tar per il
+            formato stxa (threads di default: CPU divise tra i processi)
+
+    Returns:
+        dict: anno → statistiche (None se l'anno non è stato compresso)
+    """
+    years = available_years(metadata_dir)
+    if not years:
+        print(f"✗ Nessun metadata_cassazione_YYYY.json in {metadata_dir}")
+        return {}
+
+    cpus = os.cpu_count() or 1
+    jobs = min(jobs or cpus, len(years))
+    print(f"🗜️  Compressione anni {', '.join(years)} ({jobs} processi, formato {archive_format})\n")
+
+    options = {
+        'txt_dir': txt_dir,
+        'output_dir': output_dir,
+        'metadata_dir': metadata_dir,
+        'delete_after': delete_after,
+    }
+    if archive_format == 'stxa':
+        # Thread di compressione: quelli richiesti, altrimenti CPU divise tra i processi
+        options.update(stxa_options)
+        options['threads'] = options.get('threads') or max(1, cpus // jobs)
+
+    results = {}
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(_compress_year, year, archive_format, options): year for year in years}
+        for future in as_completed(futures):
+            year = futures[future]
+            try:
+                results[year] = future.result()
+            except Exception as e:
+                print(f"✗ Anno {year}: {e}")
+                results[year] = None
+
+    print(f"\n{'='*80}")
+    print(f"📊 RIEPILOGO ({time.time() - start:.1f}s)")
+    print(f"{'='*80}")
+    for year in years:
+        stats = results.get(year)
+        if not stats:
+            print(f"   {year}: ✗ non compresso")
+            continue
+        status = "✓ verificato" if stats['verified'] else "✗ verifica fallita"
+        print(f"   {year}: {stats['documents']:>6} file | "
+              f"{stats['raw_bytes'] / 1024 / 1024:>8.2f} MB → {stats['file_bytes'] / 1024 / 1024:>7.2f} MB | {status}")
+
+    return results
 
 
 def decompress_archive(archive_path, output_dir="txt"):
     """
-    Decomprime un archivio .tar.gz nella directory specificata
+    Decomprime un archivio .tar.gz (o .stxa) nella directory specificata
 
     Args:
-        archive_path: Percorso archivio .tar.gz
+        archive_path: Percorso archivio .tar.gz o .stxa
         output_dir: Directory output
     """
     archive = Path(archive_path)
@@ -148,6 +585,18 @@ def decompress_archive(archive_path, output_dir="txt"):
     print(f"📦 Decompressione: {archive.name}")
     print(f"📁 Output: {output_dir}\n")
 
+    if archive.suffix == ARCHIVE_SUFFIX:
+        with TxtArchive(archive) as txt_archive:
+            print(f"📊 File nell'archivio: {len(txt_archive)}")
+            for i, (sentenza_id, data) in enumerate(txt_archive.iter_documents(), 1):
+                (output_path / f"{sentenza_id}.txt").write_bytes(data)
+                if i % 100 == 0 or i == len(txt_archive):
+                    print(f"   [{i}/{len(txt_archive)}] file estratti...")
+
+        print(f"\n✅ Decompressione completata!")
+        print(f"📁 File estratti in: {output_path.absolute()}")
+        return
+
     try:
         with tarfile.open(archive, 'r:gz') as tar:
             members = tar.getmembers()
@@ -173,12 +622,23 @@ def main():
 
     # Comando compress
     compress_parser = subparsers.add_parser('compress', help='Comprimi TXT di un anno')
-    compress_parser.add_argument(
+    year_group = compress_parser.add_mutually_exclusive_group(required=True)
+    year_group.add_argument(
         "--year",
         type=str,
-        required=True,
         help="Anno da comprimere (es: 2020)"
     )
+    year_group.add_argument(
+        "--all-years",
+        action="store_true",
+        help="Comprime tutti gli anni con metadata JSON, in parallelo"
+    )
+    compress_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Processi in parallelo con --all-years (default: CPU disponibili)"
+    )
     compress_parser.add_argument(
         "--txt-dir",
         type=str,
@@ -200,7 +660,42 @@ def main():
     compress_parser.add_argument(
         "--delete-after",
         action="store_true",
-        help="Cancella TXT originali dopo compressione"
+        help="Cancella TXT originali dopo compressione (solo se la verifica checksum passa)"
+    )
+    compress_parser.add_argument(
+        "--format",
+        choices=['tar.gz', 'stxa'],
+        default='tar.gz',
+        help="Formato archivio: tar.gz o stxa (dizionario addestrato, accesso per sentenza)"
+    )
+    compress_parser.add_argument(
+        "--codec",
+        choices=['zstd', 'zlib'],
+        default=None,
+        help="Codec stxa (default: zstd se installato, altrimenti zlib)"
+    )
+    compress_parser.add_argument(
+        "--level",
+        type=int,
+        default=None,
+        help="Livello compressione stxa (default: 9)"
+    )
+    compress_parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Thread di compressione stxa (default: CPU disponibili, divise tra i processi con --all-years)"
+    )
+    compress_parser.add_argument(
+        "--dict-size",
+        type=int,
+        default=None,
+        help="Dimensione dizionario in byte (default: in base al campione)"
+    )
+    compress_parser.add_argument(
+        "--compare-tar",
+        action="store_true",
+        help="Confronta dimensione e MB/s con il tar.gz sugli stessi TXT"
     )
 
     # Comando decompress
@@ -209,7 +704,7 @@ def main():
         "--archive",
         type=str,
         required=True,
-        help="Percorso archivio .tar.gz"
+        help="Percorso archivio .tar.gz o .stxa"
     )
     decompress_parser.add_argument(
         "--output-dir",
@@ -218,9 +713,45 @@ def main():
         help="Directory output (default: txt)"
     )
 
+    # Comando verify
+    verify_parser = subparsers.add_parser('verify', help='Verifica archivio contro il manifest')
+    verify_parser.add_argument(
+        "--archive",
+        type=str,
+        required=True,
+        help="Percorso archivio .tar.gz o .stxa"
+    )
+
     args = parser.parse_args()
 
-    if args.command == 'compress':
+    if args.command == 'compress' and args.all_years:
+        compress_all_years(
+            txt_dir=args.txt_dir,
+            output_dir=args.output_dir,
+            metadata_dir=args.metadata_dir,
+            delete_after=args.delete_after,
+            archive_format=args.format,
+            jobs=args.jobs,
+            codec=args.codec,
+            level=args.level,
+            threads=args.threads,
+            dict_size=args.dict_size,
+            compare_tar=args.compare_tar
+        )
+    elif args.command == 'compress' and args.format == 'stxa':
+        compress_txt_files_stxa(
+            year=args.year,
+            txt_dir=args.txt_dir,
+            output_dir=args.output_dir,
+            metadata_dir=args.metadata_dir,
+            delete_after=args.delete_after,
+            codec=args.codec,
+            level=args.level,
+            threads=args.threads,
+            dict_size=args.dict_size,
+            compare_tar=args.compare_tar
+        )
+    elif args.command == 'compress':
         compress_txt_files(
             year=args.year,
             txt_dir=args.txt_dir,
@@ -228,6 +759,15 @@ def main():
             metadata_dir=args.metadata_dir,
             delete_after=args.delete_after
         )
+    elif args.command == 'verify':
+        verification = verify_archive(args.archive)
+        if verification['ok']:
+            print(f"✅ {args.archive}: {verification['checked']} file verificati")
+        else:
+            print(f"✗ {args.archive}: {len(verification['errors'])} errori")
+            for error in verification['errors']:
+                print(f"   - {error}")
+            raise SystemExit(1)
     elif args.command == 'decompress':
         decompress_archive(
             archive_path=args.archive,
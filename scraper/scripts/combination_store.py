@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+MEF SCRAPER - Esiti persistenti delle ricerche per combinazione
+Database SQLite con l'esito di ogni ricerca di mef_scrape_by_combinations,
+chiave (materia, classificazione, anno, ente, massimate), tra anni e run.
+
+Usi:
+- politica di skip: combinazioni vuote negli ultimi K anni già cercati non
+  vengono ripetute (salvo --force)
+- ripresa: un run interrotto riparte da dove si era fermato, le ricerche
+  già fatte vengono rilette dal database (con le sentenze trovate)
+- import dei vecchi zero_results_<anno>_<ts>.json / results_<anno>_<ts>.json(l)
+"""
+
+import re
+import json
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+
+DEFAULT_DB = "scraper/data/mef_combinations/combination_outcomes.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outcomes (
+    materia_code TEXT NOT NULL,
+    classificazione_code TEXT NOT NULL,
+    anno INTEGER NOT NULL,
+    ente TEXT NOT NULL,
+    massimate INTEGER NOT NULL,      -- 0 = fase 1, 1 = fase 2
+    num_risultati INTEGER NOT NULL,  -- -1 = errore
+    error TEXT,
+    result_json TEXT,                -- sentenze + metadata (per la ripresa)
+    run_id TEXT,
+    first_searched_at TEXT NOT NULL,
+    searched_at TEXT NOT NULL,
+    searches INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (materia_code, classificazione_code, anno, ente, massimate)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_outcomes_run ON outcomes(run_id);
+
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT NOT NULL,            -- timestamp del run (anche nei nomi dei file di output)
+    anno INTEGER NOT NULL,
+    ente TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    status TEXT NOT NULL,            -- running / completed
+    PRIMARY KEY (run_id, anno, ente)
+);
+"""
+
+LEGACY_FILE_PATTERN = re.compile(r'^(zero_results|results)_(\d{4})_(\d{8}_\d{6})\.(json|jsonl)$')
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+class CombinationStore:
+    """Esiti ricerche per combinazione (SQLite, thread-safe per il pool di ricerca)"""
+
+    def __init__(self, db_path=DEFAULT_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    # ==================== RUN ====================
+
+    def start_run(self, run_id, anno, ente):
+        """Registra l'inizio di un run (o la ripresa di uno esistente)"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO runs (run_id, anno, ente, started_at, status) VALUES (?, ?, ?, ?, 'running') "
+                "ON CONFLICT(run_id, anno, ente) DO UPDATE SET status = 'running', finished_at = NULL",
+                (run_id, int(anno), ente, _now())
+            )
+
+    def finish_run(self, run_id, anno, ente):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE runs SET status = 'completed', finished_at = ? WHERE run_id = ? AND anno = ? AND ente = ?",
+                (_now(), run_id, int(anno), ente)
+            )
+
+    def interrupted_run(self, anno, ente):
+        """run_id dell'ultimo run non completato per anno/ente (None se non c'è)"""
+        row = self.conn.execute(
+            "SELECT run_id, status FROM runs WHERE anno = ? AND ente = ? ORDER BY started_at DESC, run_id DESC LIMIT 1",
+            (int(anno), ente)
+        ).fetchone()
+        return row[0] if row and row[1] != 'completed' else None
+
+    # ==================== ESITI ====================
+
+    def record(self, materia_code, classificazione_code, anno, ente, massimate, result, run_id=None,
+               searched_at=None):
+        """Salva l'esito di una ricerca (result come da search_combination)"""
+        num_risultati = result['num_risultati']
+        payload = None
+        if num_risultati > 0:
+            payload = json.dumps({
+                'sentenze': result.get('sentenze', []),
+                'metadata': result.get('metadata', {})
+            }, ensure_ascii=False, separators=(',', ':'))
+        searched_at = searched_at or _now()
+
+        with self._lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO outcomes (materia_code, classificazione_code, anno, ente, massimate,
+                                      num_risultati, error, result_json, run_id, first_searched_at, searched_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(materia_code, classificazione_code, anno, ente, massimate) DO UPDATE SET
+                    num_risultati = excluded.num_risultati,
+                    error = excluded.error,
+                    result_json = excluded.result_json,
+                    run_id = excluded.run_id,
+                    searched_at = excluded.searched_at,
+                    searches = searches + 1
+                """,
+                (materia_code, classificazione_code, int(anno), ente, int(bool(massimate)),
+                 num_risultati, result.get('error'), payload, run_id, searched_at, searched_at)
+            )
+
+    def resumed_result(self, materia_code, classificazione_code, anno, ente, massimate, run_id):
+        """
+        Esito già ottenuto nel run indicato (senza errori), nel formato di
+        search_combination; None se la ricerca va fatta
+        """
+        with self._lock:
+            row = self.conn.execute(
+                """
+                SELECT num_risultati, result_json FROM outcomes
+                WHERE materia_code = ? AND classificazione_code = ? AND anno = ? AND ente = ?
+                  AND massimate = ? AND run_id = ? AND num_risultati >= 0
+                """,
+                (materia_code, classificazione_code, int(anno), ente, int(bool(massimate)), run_id)
+            ).fetchone()
+
+        if row is None:
+            return None
+        payload = json.loads(row[1]) if row[1] else {}
+        return {
+            'num_risultati': row[0],
+            'sentenze': payload.get('sentenze', []),
+            'metadata': payload.get('metadata', {}),
+            'resumed': True
+        }
+
+    def empty_in_last_years(self, anno, ente, years):
+        """
+        Combinazioni vuote (fase 1, senza errori) in tutti gli ultimi `years`
+        anni cercati diversi da `anno`
+
+        Returns:
+            dict: {(materia_code, classificazione_code): [anni controllati]}
+        """
+        rows = self.conn.execute(
+            """
+            SELECT materia_code, classificazione_code, anno, num_risultati FROM outcomes
+            WHERE ente = ? AND massimate = 0 AND anno != ? AND error IS NULL AND num_risultati >= 0
+            ORDER BY materia_code, classificazione_code, anno DESC
+            """,
+            (ente, int(anno))
+        ).fetchall()
+
+        history = {}
+        for materia_code, classificazione_code, row_anno, num_risultati in rows:
+            history.setdefault((materia_code, classificazione_code), []).append((row_anno, num_risultati))
+
+        empty = {}
+        for key, outcomes in history.items():
+            recent = outcomes[:years]
+            if len(recent) == years and all(num == 0 for _, num in recent):
+                empty[key] = [row_anno for row_anno, _ in recent]
+        return empty
+
+    # ==================== IMPORT ====================
+
+    def import_legacy(self, output_dir):
+        """
+        Importa gli esiti dai file dei run precedenti (zero_results_*.json,
+        results_*.json con i risultati completi, results_*.jsonl incrementali)
+
+        Un esito già presente più recente non viene sovrascritto.
+        """
+        imported = 0
+        files = sorted(
+            (m.group(3), m.group(1), m.group(2), m.group(4), path)
+            for path in Path(output_dir).glob('*.json*')
+            for m in [LEGACY_FILE_PATTERN.match(path.name)] if m
+        )
+
+        for timestamp, kind, anno, ext, path in files:
+            searched_at = datetime.strptime(timestamp, "%Y%m%d_%H%M%S").isoformat()
+
+            if ext == 'jsonl':
+                outcomes = self._read_result_stream(path)
+            else:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+
+                if kind == 'zero_results':
+                    # L'ente non è nel file: quello di default dello scraper
+                    outcomes = [(zr, 'Corte di Cassazione', False, {'num_risultati': 0}) for zr in data]
+                else:
+                    # Dal JSONL in poi results_*.json è solo il riepilogo (phases senza 'results')
+                    outcomes = [
+                        (r['combination'], data.get('ente', 'Corte di Cassazione'), phase['massime'], r)
+                        for phase in data.get('phases', [])
+                        for r in phase.get('results', [])
+                    ]
+
+            for combo, ente, massimate, result in outcomes:
+                if self._newer_exists(combo, anno, ente, massimate, searched_at):
+                    continue
+                self.record(combo['materia_code'], combo['classificazione_code'], anno, ente,
+                            massimate, result, run_id=f"legacy_{timestamp}", searched_at=searched_at)
+                imported += 1
+
+        return imported
+
+    @staticmethod
+    def _read_result_stream(path):
+        """Esiti da un results_*.jsonl: per ricerca vale l'ultima riga, righe troncate ignorate"""
+        latest = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    r = json.loads(line)
+                except ValueError:
+                    continue
+                combo = r['combination']
+                latest[(combo['materia_code'], combo['classificazione_code'], r['massime'])] = (
+                    combo, r['ente'], r['massime'], r
+                )
+        return list(latest.values())
+
+    def _newer_exists(self, combo, anno, ente, massimate, searched_at):
+        row = self.conn.execute(
+            """
+            SELECT searched_at FROM outcomes
+            WHERE materia_code = ? AND classificazione_code = ? AND anno = ? AND ente = ? AND massimate = ?
+            """,
+            (combo['materia_code'], combo['classificazione_code'], int(anno), ente, int(bool(massimate)))
+        ).fetchone()
+        return row is not None and row[0] >= searched_at
+
+    def stats(self):
+        rows = self.conn.execute(
+            """
+            SELECT anno, ente, massimate, COUNT(*),
+                   SUM(num_risultati = 0), SUM(num_risultati > 0), SUM(num_risultati < 0)
+            FROM outcomes GROUP BY anno, ente, massimate ORDER BY anno, ente, massimate
+            """
+        ).fetchall()
+        return [
+            {'anno': r[0], 'ente': r[1], 'massimate': bool(r[2]), 'combinazioni': r[3],
+             'vuote': r[4], 'con_risultati': r[5], 'errori': r[6]}
+            for r in rows
+        ]
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="MEF SCRAPER - Esiti persistenti delle ricerche per combinazione"
+    )
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"Database esiti (default: {DEFAULT_DB})")
+    subparsers = parser.add_subparsers(dest='command', help='Comando da eseguire')
+
+    import_parser = subparsers.add_parser('import', help='Importa zero_results_*.json e results_*.json(l)')
+    import_parser.add_argument("--dir", default="scraper/data/mef_combinations", help="Directory output scraper")
+
+    skip_parser = subparsers.add_parser('skip-list', help='Combinazioni che la politica di skip salterebbe')
+    skip_parser.add_argument("--anno", type=int, required=True, help="Anno da cercare")
+    skip_parser.add_argument("--ente", default="Corte di Cassazione", help="Autorità emanante")
+    skip_parser.add_argument("--years", type=int, default=3, help="Vuote negli ultimi K anni cercati (default: 3)")
+
+    subparsers.add_parser('stats', help='Esiti per anno/ente/fase')
+
+    args = parser.parse_args()
+
+    if args.command is None:
+        parser.print_help()
+        return
+
+    store = CombinationStore(args.db)
+
+    if args.command == 'import':
+        imported = store.import_legacy(args.dir)
+        print(f"✅ Importati {imported} esiti da {args.dir} → {args.db}")
+
+    elif args.command == 'skip-list':
+        empty = store.empty_in_last_years(args.anno, args.ente, args.years)
+        print(f"⊘ {len(empty)} combinazioni vuote negli ultimi {args.years} anni cercati\n")
+        for (materia_code, classificazione_code), anni in sorted(empty.items()):
+            print(f"   {materia_code}/{classificazione_code}  anni: {', '.join(map(str, anni))}")
+
+    elif args.command == 'stats':
+        for row in store.stats():
+            fase = "massimate" if row['massimate'] else "tutte"
+            print(f"📊 {row['anno']} {row['ente']} ({fase}): {row['combinazioni']} combinazioni, "
+                  f"{row['vuote']} vuote, {row['con_risultati']} con risultati, {row['errori']} errori")
+
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
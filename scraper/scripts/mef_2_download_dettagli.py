@@ -30,6 +30,8 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 
+from urn_parser import parse_urn
+
 
 def setup_driver(headless=True):
     """Configura driver Selenium"""
@@ -114,68 +116,6 @@ def extract_entities_from_html(html_text):
     return entities
 
 
-def parse_urn(urn):
-    """
-    Parse URN per estrarre info strutturate
-
-    Esempi:
-      urn:doctrib::DLG:1995;504_art7 -> {'type': 'normativa', 'kind': 'DLG', 'year': 1995, 'number': 504, 'article': 7}
-      urn:doctrib:CCO:SEN:2020;142 -> {'type': 'giurisprudenza', 'court': 'CCO', 'kind': 'SEN', 'year': 2020, 'number': 142}
-    """
-    parsed = {'raw_urn': urn}
-
-    try:
-        # URN format: urn:doctrib:[...]
-        if not urn.startswith('urn:doctrib'):
-            return parsed
-
-        # Normativa: urn:doctrib::KIND:YEAR;NUMBER_artXX
-        if '::' in urn:
-            parsed['type'] = 'normativa'
-
-            # Estrai kind (DLG, DPR, L, DL, ecc.)
-            kind_match = re.search(r'::([A-Z]+):', urn)
-            if kind_match:
-                parsed['kind'] = kind_match.group(1)
-
-            # Estrai anno e numero
-            year_num_match = re.search(r':(\d{4});(\d+)', urn)
-            if year_num_match:
-                parsed['year'] = int(year_num_match.group(1))
-                parsed['number'] = int(year_num_match.group(2))
-
-            # Estrai articolo
-            art_match = re.search(r'_art(\d+)', urn)
-            if art_match:
-                parsed['article'] = int(art_match.group(1))
-
-            # Estrai comma
-            com_match = re.search(r'-com(\d+)', urn)
-            if com_match:
-                parsed['comma'] = int(com_match.group(1))
-
-        # Giurisprudenza: urn:doctrib:COURT:KIND:YEAR;NUMBER
-        elif ':' in urn and '::' not in urn:
-            parsed['type'] = 'giurisprudenza'
-
-            parts = urn.split(':')
-            if len(parts) >= 4:
-                parsed['court'] = parts[2]  # CCO, CTR, CTP, ecc.
-                parsed['kind'] = parts[3].split(';')[0]  # SEN, ORD, ecc.
-
-                # Estrai anno e numero
-                year_num = parts[3]
-                year_num_match = re.search(r':(\d{4});(\d+)', year_num)
-                if year_num_match:
-                    parsed['year'] = int(year_num_match.group(1))
-                    parsed['number'] = int(year_num_match.group(2))
-
-    except Exception as e:
-        pass
-
-    return parsed
-
-
 def extract_documenti_citati(driver):
     """
     Estrae contenuto del tab 'Documenti citati'
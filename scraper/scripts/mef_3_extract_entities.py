@@ -9,14 +9,24 @@ Analizza tutte le entities estratte e crea:
 - Lista unica di precedenti giurisprudenziali citati
 - Statistiche di utilizzo
 - Grafo delle citazioni
+
+Modalità streaming (--stream) per export MEF multi-anno: le sentenze vengono
+lette una alla volta (ijson) e per ogni chiave si tengono solo contatori e
+un campione di variazioni; opzionale top-K approssimato (space-saving) e
+merge di risultati parziali per anno (--merge).
 """
 
 import json
+import heapq
 import argparse
 from pathlib import Path
 from datetime import datetime
 from collections import Counter, defaultdict
 
+from urn_parser import URN_PREFIX, parse_urn, canonical_key, normativa_key, giurisprudenza_key
+
+MAX_VARIATIONS = 5
+
 
 def aggregate_entities(metadata_file):
     """
@@ -84,11 +94,11 @@ def aggregate_entities(metadata_file):
             etype = entity.get('type', 'unknown')
             urn = entity.get('urn', '')
             text = entity.get('text', '')
-            parsed = entity.get('parsed', {})
+            parsed = _entity_parsed(entity)
 
             # Key univoca basata su URN parsed
             if etype == 'normativa':
-                key = create_normativa_key(parsed)
+                key = canonical_key(entity)
                 normative[key]['count'] += 1
                 normative[key]['sentences'].append(sentence_id)
                 normative[key]['variations'].append(text)
@@ -96,7 +106,7 @@ def aggregate_entities(metadata_file):
                 has_normative = True
 
             elif etype == 'giurisprudenza':
-                key = create_giurisprudenza_key(parsed)
+                key = canonical_key(entity)
                 giurisprudenza[key]['count'] += 1
                 giurisprudenza[key]['sentences'].append(sentence_id)
                 giurisprudenza[key]['variations'].append(text)
@@ -179,15 +189,7 @@ def create_normativa_key(parsed):
 
     Es: "DLG_1995_504" o "DLG_1995_504_art7"
     """
-    kind = parsed.get('kind', 'UNK')
-    year = parsed.get('year', '0')
-    number = parsed.get('number', '0')
-    article = parsed.get('article', '')
-
-    if article:
-        return f"{kind}_{year}_{number}_art{article}"
-    else:
-        return f"{kind}_{year}_{number}"
+    return normativa_key(parsed)
 
 
 def create_giurisprudenza_key(parsed):
@@ -196,12 +198,254 @@ def create_giurisprudenza_key(parsed):
 
     Es: "CCO_SEN_2020_142"
     """
-    court = parsed.get('court', 'UNK')
-    kind = parsed.get('kind', 'UNK')
-    year = parsed.get('year', '0')
-    number = parsed.get('number', '0')
+    return giurisprudenza_key(parsed)
+
+
+def _entity_parsed(entity):
+    """Parsed dall'URN (memoizzato) se presente, altrimenti quello salvato"""
+    urn = entity.get('urn')
+    if urn and urn.startswith(URN_PREFIX):
+        return parse_urn(urn)
+    return entity.get('parsed', {})
+
+
+# ==================== MODALITÀ STREAMING ====================
+
+def iter_sentences(metadata_file):
+    """Sentenze del metadata JSON una alla volta, senza caricare il file intero"""
+    try:
+        import ijson
+    except ImportError:
+        raise ImportError("Installa: pip install ijson")
+
+    with open(metadata_file, 'rb') as f:
+        for sentence in ijson.items(f, 'sentences.item'):
+            yield sentence
+
+
+class EntityCounter:
+    """
+    Contatori per chiave con memoria limitata
+
+    Per ogni chiave: menzioni, sentenze distinte (contate una volta per
+    sentenza, senza tenere gli ID), al massimo MAX_VARIATIONS variazioni e il
+    parsed. Con capacity attiva l'algoritmo space-saving: restano le
+    `capacity` chiavi più frequenti, 'error' è la sovrastima massima di count.
+    """
+
+    def __init__(self, capacity=None, max_variations=MAX_VARIATIONS):
+        self.capacity = capacity
+        self.max_variations = max_variations
+        self.entries = {}
+        self._heap = []
+
+    def add(self, key, texts, parsed, count=1, sentences=1, error=0):
+        entry = self.entries.get(key)
+
+        if entry is None:
+            base = 0
+            if self.capacity and len(self.entries) >= self.capacity:
+                base = self._evict_min()
+            entry = {'count': base, 'sentences_count': base, 'error': base,
+                     'variations': [], 'parsed': parsed}
+            self.entries[key] = entry
+
+        entry['count'] += count
+        entry['sentences_count'] += sentences
+        entry['error'] += error
+        for text in texts:
+            if len(entry['variations']) >= self.max_variations:
+                break
+            if text and text not in entry['variations']:
+                entry['variations'].append(text)
+
+        if self.capacity:
+            heapq.heappush(self._heap, (entry['count'], key))
+            if len(self._heap) > 4 * self.capacity:
+                self._heap = [(e['count'], k) for k, e in self.entries.items()]
+                heapq.heapify(self._heap)
+
+    def _evict_min(self):
+        """Rimuove la chiave con count minimo (voci del heap obsolete ignorate)"""
+        while self._heap:
+            count, key = heapq.heappop(self._heap)
+            entry = self.entries.get(key)
+            if entry is not None and entry['count'] == count:
+                del self.entries[key]
+                return count
+        key = min(self.entries, key=lambda k: self.entries[k]['count'])
+        return self.entries.pop(key)['count']
+
+    def merge(self, entries):
+        """Somma le voci di un risultato parziale (streaming o classico)"""
+        for key, entry in entries.items():
+            sentences = entry.get('sentences_count', len(set(entry.get('sentences', []))))
+            self.add(key, entry.get('variations', []), entry.get('parsed', {}),
+                     entry['count'], sentences, entry.get('error', 0))
+
+    def top(self, n):
+        return sorted(self.entries.items(), key=lambda x: x[1]['count'], reverse=True)[:n]
+
+    def summary(self, n=20):
+        return {
+            'all': self.entries,
+            'top_20': [
+                {
+                    'key': key,
+                    'count': val['count'],
+                    'parsed': val['parsed'],
+                    'variations': val['variations'],
+                    'sentences_count': val['sentences_count']
+                }
+                for key, val in self.top(n)
+            ]
+        }
+
+
+def _empty_statistics():
+    return {
+        'total_entities': 0,
+        'sentences_with_entities': 0,
+        'sentences_with_normative': 0,
+        'sentences_with_giurisprudenza': 0,
+    }
+
+
+def _build_stream_result(normative, giurisprudenza, stats, total_sentences, sources, top_k):
+    """Risultato nello stesso formato di aggregate_entities (senza by_sentence)"""
+    statistics = dict(stats)
+    statistics.update({
+        'total_unique_normative': len(normative.entries),
+        'total_unique_giurisprudenza': len(giurisprudenza.entries),
+        'avg_entities_per_sentence': round(stats['total_entities'] / total_sentences, 2) if total_sentences > 0 else 0
+    })
+
+    return {
+        'metadata': {
+            'generated_at': datetime.now().isoformat(),
+            'source_file': sources,
+            'total_sentences': total_sentences,
+            'sentences_analyzed': total_sentences,
+            'mode': 'stream_topk' if top_k else 'stream',
+            'top_k': top_k
+        },
+        'statistics': statistics,
+        'normative': normative.summary(),
+        'giurisprudenza': giurisprudenza.summary()
+    }
+
+
+def aggregate_entities_streaming(metadata_files, top_k=None, by_sentence_path=None):
+    """
+    Aggrega le entities leggendo le sentenze in streaming
 
-    return f"{court}_{kind}_{year}_{number}"
+    Args:
+        metadata_files: Uno o più metadata JSON (da step 2)
+        top_k: Se indicato, tiene solo le ~top_k chiavi più citate per tipo (space-saving)
+        by_sentence_path: Se indicato, scrive le entities per sentenza in JSONL
+
+    Returns:
+        dict come aggregate_entities; per ogni chiave 'sentences_count' al posto
+        della lista 'sentences' e variazioni distinte (max MAX_VARIATIONS)
+    """
+    print("🔗 MEF SCRAPER - STEP 3: Estrazione Entities (streaming)")
+    print("="*70)
+
+    if isinstance(metadata_files, (str, Path)):
+        metadata_files = [metadata_files]
+
+    normative = EntityCounter(capacity=top_k)
+    giurisprudenza = EntityCounter(capacity=top_k)
+    stats = _empty_statistics()
+    total_sentences = 0
+
+    by_sentence = open(by_sentence_path, 'w', encoding='utf-8') if by_sentence_path else None
+
+    try:
+        for metadata_file in metadata_files:
+            print(f"📋 {metadata_file}")
+
+            for sentence in iter_sentences(metadata_file):
+                total_sentences += 1
+                all_entities = sentence.get('entities_testo', []) + sentence.get('entities_massima', [])
+
+                if not all_entities:
+                    continue
+
+                stats['sentences_with_entities'] += 1
+                stats['total_entities'] += len(all_entities)
+
+                # Menzioni e variazioni per chiave in questa sentenza
+                seen = {}
+                for entity in all_entities:
+                    etype = entity.get('type', 'unknown')
+                    if etype not in ('normativa', 'giurisprudenza'):
+                        continue
+                    key = canonical_key(entity)
+                    item = seen.get((etype, key))
+                    if item is None:
+                        item = seen[(etype, key)] = {'count': 0, 'texts': [], 'parsed': _entity_parsed(entity)}
+                    item['count'] += 1
+                    item['texts'].append(entity.get('text', ''))
+
+                for (etype, key), item in seen.items():
+                    counter = normative if etype == 'normativa' else giurisprudenza
+                    counter.add(key, item['texts'], item['parsed'], item['count'], 1)
+
+                if any(etype == 'normativa' for etype, _ in seen):
+                    stats['sentences_with_normative'] += 1
+                if any(etype == 'giurisprudenza' for etype, _ in seen):
+                    stats['sentences_with_giurisprudenza'] += 1
+
+                if by_sentence:
+                    by_sentence.write(json.dumps({
+                        'sentence_id': sentence['id'],
+                        'estremi': sentence.get('estremi', ''),
+                        'entities': all_entities,
+                        'count': len(all_entities)
+                    }, ensure_ascii=False, default=str) + '\n')
+
+                if total_sentences % 10000 == 0:
+                    print(f"   [{total_sentences}] sentenze, {len(normative.entries)} normative, "
+                          f"{len(giurisprudenza.entries)} precedenti")
+    finally:
+        if by_sentence:
+            by_sentence.close()
+
+    return _build_stream_result(normative, giurisprudenza, stats, total_sentences,
+                                [str(f) for f in metadata_files], top_k)
+
+
+def merge_results(result_files, top_k=None):
+    """
+    Unisce risultati parziali (es. uno per anno) in un unico risultato
+
+    Accetta output di aggregate_entities e di aggregate_entities_streaming.
+    """
+    print("🔗 MEF SCRAPER - STEP 3: Merge risultati parziali")
+    print("="*70)
+
+    normative = EntityCounter(capacity=top_k)
+    giurisprudenza = EntityCounter(capacity=top_k)
+    stats = _empty_statistics()
+    total_sentences = 0
+    sources = []
+
+    for result_file in result_files:
+        print(f"📋 {result_file}")
+        with open(result_file, 'r', encoding='utf-8') as f:
+            partial = json.load(f)
+
+        total_sentences += partial['metadata']['total_sentences']
+        source = partial['metadata'].get('source_file')
+        sources.extend(source if isinstance(source, list) else [source])
+        for name in stats:
+            stats[name] += partial['statistics'][name]
+
+        normative.merge(partial['normative']['all'])
+        giurisprudenza.merge(partial['giurisprudenza']['all'])
+
+    return _build_stream_result(normative, giurisprudenza, stats, total_sentences, sources, top_k)
 
 
 def print_statistics(result):
@@ -210,7 +454,7 @@ def print_statistics(result):
 
     print("\n📊 STATISTICHE ENTITIES")
     print("="*70)
-    print(f"Sentenze analizzate:              {stats['total_sentences']}")
+    print(f"Sentenze analizzate:              {result['metadata']['total_sentences']}")
     print(f"Sentenze con entities:            {stats['sentences_with_entities']}")
     print(f"  - con normativa:                {stats['sentences_with_normative']}")
     print(f"  - con giurisprudenza:           {stats['sentences_with_giurisprudenza']}")
@@ -241,20 +485,35 @@ def print_statistics(result):
         year = parsed.get('year', '?')
         number = parsed.get('number', '?')
 
-        print(f"{i:2d}. {court} {kind} {number}/{year:15s} -> {item['count']:3d} citazioni in {item['sentences_count']:3d} sentenze")
+        print(f"{i:2d}. {court} {kind} {number}/{str(year):15s} -> {item['count']:3d} citazioni in {item['sentences_count']:3d} sentenze")
 
 
 def main():
     parser = argparse.ArgumentParser(
         description="MEF SCRAPER - STEP 3: Estrazione entities aggregate"
     )
-    parser.add_argument("--input", required=True, help="File metadata JSON (da step 2)")
+    parser.add_argument("--input", required=True, nargs='+',
+                        help="File metadata JSON (da step 2); con --merge risultati parziali")
     parser.add_argument("--output", required=True, help="File output entities JSON")
+    parser.add_argument("--stream", action="store_true",
+                        help="Lettura in streaming (ijson), memoria limitata")
+    parser.add_argument("--top-k", type=int, default=None,
+                        help="Top-K approssimato per tipo (space-saving), solo con --stream/--merge")
+    parser.add_argument("--by-sentence", default=None,
+                        help="File JSONL con entities per sentenza (solo con --stream)")
+    parser.add_argument("--merge", action="store_true",
+                        help="Unisce risultati parziali (es. uno per anno)")
 
     args = parser.parse_args()
 
     # Estrai entities
-    result = aggregate_entities(args.input)
+    if args.merge:
+        result = merge_results(args.input, top_k=args.top_k)
+    elif args.stream or len(args.input) > 1:
+        result = aggregate_entities_streaming(args.input, top_k=args.top_k,
+                                              by_sentence_path=args.by_sentence)
+    else:
+        result = aggregate_entities(args.input[0])
 
     # Stampa statistiche
     print_statistics(result)
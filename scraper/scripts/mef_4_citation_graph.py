@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+"""
+MEF SCRAPER - STEP 4: Grafo delle citazioni
+Input: metadata JSON MEF (da step 2) e/o entities LLM (entities/*_entities.json)
+Output: database SQLite con tabelle nodi/archi
+
+Nodi: sentenze, normative (es: DLG_1995_504_art7), precedenti (es: CCO_SEN_2020_142)
+Archi: sentenza → normativa/precedente citato (con numero di menzioni)
+
+Con --linkage (record_linkage.py) le sentenze MEF già presenti su italgiure
+usano l'ID italgiure: citazioni MEF e LLM sullo stesso nodo.
+
+Le chiavi sono quelle canoniche di urn_parser (le stesse di
+mef_3_extract_entities); le norme citate dall'LLM vengono ricondotte allo
+stesso formato.
+
+Query veloci (indici su entrambi i lati degli archi):
+- sentenze che citano una norma / un precedente
+- più citati per anno
+- vicinato a due passi (co-citazioni / sentenze con citazioni in comune)
+"""
+
+import re
+import json
+import time
+import sqlite3
+import argparse
+from pathlib import Path
+from collections import Counter
+
+from mef_3_extract_entities import create_normativa_key, create_giurisprudenza_key
+from urn_parser import canonical_key
+from record_linkage import RecordLinkage
+
+DEFAULT_DB = "citation_graph.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    tipo TEXT NOT NULL,          -- sentenza / normativa / giurisprudenza
+    anno INTEGER,
+    label TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_nodes_tipo_anno ON nodes(tipo, anno);
+
+CREATE TABLE IF NOT EXISTS edges (
+    src INTEGER NOT NULL,        -- sentenza citante
+    dst INTEGER NOT NULL,        -- normativa / precedente citato
+    fonte TEXT NOT NULL,         -- mef / llm
+    count INTEGER NOT NULL,      -- menzioni nel testo
+    PRIMARY KEY (src, dst, fonte)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_edges_dst ON edges(dst, src);
+"""
+
+# Norme citate dall'LLM ("art. 7", "d.lgs. n. 504/1995") → kind MEF
+NORMA_KIND_PATTERNS = [
+    ('DLG', re.compile(r'd\.\s*lgs\.?|decreto\s+legislativo', re.IGNORECASE)),
+    ('DPR', re.compile(r'd\.\s*p\.\s*r\.?|decreto\s+del\s+presidente\s+della\s+repubblica', re.IGNORECASE)),
+    ('DL', re.compile(r'\bd\.\s*l\.(?!\s*gs)|decreto[\s-]+legge', re.IGNORECASE)),
+    ('L', re.compile(r'\bl\.|\blegge\b', re.IGNORECASE)),
+]
+# Codici: chiave senza anno/numero (es: CPC_art360)
+CODICE_PATTERNS = [
+    ('CPC', re.compile(r'c\.\s*p\.\s*c\.|codice\s+di\s+procedura\s+civile', re.IGNORECASE)),
+    ('CC', re.compile(r'\bc\.\s*c\.|codice\s+civile', re.IGNORECASE)),
+]
+ARTICLE_PATTERN = re.compile(
+    r'\bart(?:t)?\.?\s*(\d+)(?:[\s-]*(bis|ter|quater|quinquies|sexies|septies|octies))?',
+    re.IGNORECASE
+)
+NUMBER_YEAR_PATTERNS = [
+    re.compile(r'(\d+)\s*/\s*(\d{4})'),                                   # 504/1995
+    re.compile(r'n\.\s*(\d+)\s+del(?:\s+\d{1,2}\s+\w+)?\s+(\d{4})'),      # n. 504 del 1995
+]
+DATE_NUMBER_PATTERN = re.compile(r'(\d{4})\s*,?\s*n\.\s*(\d+)')          # 31 dicembre 1992, n. 546
+
+
+def norma_key_from_llm(norma):
+    """
+    Chiave normativa da una norma citata dall'LLM (None se non riconosciuta)
+
+    Esempio:
+        {'articolo': 'art. 7', 'legge': 'd.lgs. n. 504/1995'} → 'DLG_1995_504_art7'
+        {'articolo': 'art. 360 c.p.c.'} → 'CPC_art360'
+    """
+    text = ' '.join(str(norma.get(field) or '') for field in ('articolo', 'legge'))
+
+    article = None
+    art_match = ARTICLE_PATTERN.search(text)
+    if art_match:
+        article = art_match.group(1) + (art_match.group(2) or '').lower()
+
+    for code, pattern in CODICE_PATTERNS:
+        if pattern.search(text):
+            return f"{code}_art{article}" if article else None
+
+    parsed = {}
+    for kind, pattern in NORMA_KIND_PATTERNS:
+        if pattern.search(text):
+            parsed['kind'] = kind
+            break
+    else:
+        return None
+
+    for pattern in NUMBER_YEAR_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            parsed['number'], parsed['year'] = int(match.group(1)), int(match.group(2))
+            break
+    else:
+        match = DATE_NUMBER_PATTERN.search(text)
+        if not match:
+            return None
+        parsed['year'], parsed['number'] = int(match.group(1)), int(match.group(2))
+
+    if article:
+        parsed['article'] = article
+
+    return create_normativa_key(parsed)
+
+
+def precedente_key_from_llm(precedente):
+    """Chiave precedente da output LLM (Cassazione se la corte non è indicata)"""
+    numero = re.search(r'\d+', str(precedente.get('numero') or ''))
+    anno = re.search(r'\d{4}', str(precedente.get('anno') or ''))
+    if not numero or not anno:
+        return None
+    return create_giurisprudenza_key({
+        'court': 'CASS', 'kind': 'SEN', 'year': int(anno.group(0)), 'number': int(numero.group(0))
+    })
+
+
+def _anno(value):
+    match = re.search(r'\d{4}', str(value or ''))
+    return int(match.group(0)) if match else None
+
+
+class CitationGraph:
+    """Grafo citazioni persistente (SQLite, archi indicizzati nei due versi)"""
+
+    def __init__(self, db_path=DEFAULT_DB):
+        self.db_path = Path(db_path)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._node_ids = {}
+
+    # ==================== SCRITTURA ====================
+
+    def node_id(self, key, tipo, anno=None, label=None):
+        """ID nodo (creato se non esiste)"""
+        if key in self._node_ids:
+            return self._node_ids[key]
+
+        row = self.conn.execute("SELECT id FROM nodes WHERE key = ?", (key,)).fetchone()
+        if row:
+            node_id = row[0]
+            if anno is not None or label is not None:
+                self.conn.execute(
+                    "UPDATE nodes SET anno = COALESCE(?, anno), label = COALESCE(label, ?) WHERE id = ?",
+                    (anno, label, node_id)
+                )
+        else:
+            node_id = self.conn.execute(
+                "INSERT INTO nodes (key, tipo, anno, label) VALUES (?, ?, ?, ?)",
+                (key, tipo, anno, label)
+            ).lastrowid
+
+        self._node_ids[key] = node_id
+        return node_id
+
+    def set_citations(self, sentenza_id, anno, citations, fonte):
+        """
+        Sostituisce le citazioni di una sentenza per una fonte (idempotente)
+
+        Args:
+            sentenza_id: ID sentenza citante
+            anno: Anno sentenza
+            citations: Counter {(key, tipo, label): menzioni}
+            fonte: 'mef' o 'llm'
+        """
+        src = self.node_id(sentenza_id, 'sentenza', anno)
+        self.conn.execute("DELETE FROM edges WHERE src = ? AND fonte = ?", (src, fonte))
+
+        self.conn.executemany(
+            "INSERT INTO edges (src, dst, fonte, count) VALUES (?, ?, ?, ?)",
+            [(src, self.node_id(key, tipo, label=label), fonte, count)
+             for (key, tipo, label), count in citations.items()]
+        )
+
+    def drop_citations(self, sentenza_id, fonte):
+        """
+        Rimuove le citazioni di una sentenza per una fonte (e il nodo, se resta isolato)
+
+        Returns:
+            Archi rimossi
+        """
+        row = self.conn.execute(
+            "SELECT id FROM nodes WHERE key = ? AND tipo = 'sentenza'", (sentenza_id,)
+        ).fetchone()
+        if not row:
+            return 0
+
+        node_id = row[0]
+        removed = self.conn.execute(
+            "DELETE FROM edges WHERE src = ? AND fonte = ?", (node_id, fonte)
+        ).rowcount
+        linked = self.conn.execute(
+            "SELECT 1 FROM edges WHERE src = ? OR dst = ? LIMIT 1", (node_id, node_id)
+        ).fetchone()
+        if not linked:
+            self.conn.execute("DELETE FROM nodes WHERE id = ?", (node_id,))
+            self._node_ids.pop(sentenza_id, None)
+        return removed
+
+    def ingest_mef(self, metadata_file, canonical=None):
+        """
+        Citazioni dalle entities MEF (entities_testo + entities_massima)
+
+        Args:
+            canonical: {mef_id: italgiure_id} da record_linkage; le sentenze
+                       collegate finiscono sul nodo italgiure (un nodo per decisione)
+                       e gli archi 'mef' già salvati sul nodo MEF da una build
+                       precedente sullo stesso database vengono rimossi
+        """
+        canonical = canonical or {}
+        with open(metadata_file, 'r', encoding='utf-8') as f:
+            sentences = json.load(f).get('sentences', [])
+
+        stats = {'sentences': 0, 'edges': 0, 'relinked': 0}
+
+        for sentence in sentences:
+            citations = Counter()
+            for entity in sentence.get('entities_testo', []) + sentence.get('entities_massima', []):
+                etype = entity.get('type')
+                if etype in ('normativa', 'giurisprudenza'):
+                    citations[(canonical_key(entity), etype, entity.get('text'))] += 1
+
+            citations = self._merge_labels(citations)
+            sentenza_id = canonical.get(sentence['id'], sentence['id'])
+            if sentenza_id != sentence['id'] and self.drop_citations(sentence['id'], 'mef'):
+                # Build precedente senza linkage: niente doppio conteggio
+                stats['relinked'] += 1
+            self.set_citations(sentenza_id, _anno(sentence.get('anno')), citations, 'mef')
+            stats['sentences'] += 1
+            stats['edges'] += len(citations)
+
+        self.conn.commit()
+        return stats
+
+    def ingest_llm(self, entities_dir, metadata_dir=None):
+        """Citazioni da norme_citate / precedenti_citati delle entities LLM"""
+        anni = {}
+        if metadata_dir:
+            for json_path in Path(metadata_dir).glob('metadata_cassazione_*.json'):
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    for s in json.load(f).get('sentences', []):
+                        anni[s['id']] = _anno(s.get('anno'))
+
+        stats = {'sentences': 0, 'edges': 0, 'unresolved': 0}
+
+        for path in sorted(Path(entities_dir).glob('*_entities.json')):
+            sentenza_id = path.name[:-len('_entities.json')]
+            with open(path, 'r', encoding='utf-8') as f:
+                entities = json.load(f)
+
+            citations = Counter()
+            for norma in entities.get('norme_citate') or []:
+                key = norma_key_from_llm(norma)
+                if key:
+                    citations[(key, 'normativa', norma.get('articolo'))] += 1
+                else:
+                    stats['unresolved'] += 1
+            for precedente in entities.get('precedenti_citati') or []:
+                key = precedente_key_from_llm(precedente)
+                if key:
+                    citations[(key, 'giurisprudenza', None)] += 1
+                else:
+                    stats['unresolved'] += 1
+
+            if not citations:
+                continue
+
+            anno = anni.get(sentenza_id) or _anno(sentenza_id[5:9])
+            citations = self._merge_labels(citations)
+            self.set_citations(sentenza_id, anno, citations, 'llm')
+            stats['sentences'] += 1
+            stats['edges'] += len(citations)
+
+        self.conn.commit()
+        return stats
+
+    @staticmethod
+    def _merge_labels(citations):
+        """Una sola etichetta per chiave (la prima), menzioni sommate"""
+        merged = Counter()
+        labels = {}
+        for (key, tipo, label), count in citations.items():
+            labels.setdefault((key, tipo), label)
+            merged[(key, tipo)] += count
+        return Counter({(key, tipo, labels[(key, tipo)]): count for (key, tipo), count in merged.items()})
+
+    # ==================== QUERY ====================
+
+    def cited_by(self, key, anno=None, include_articles=False):
+        """
+        Sentenze che citano una norma o un precedente
+
+        Args:
+            key: Chiave (es: DLG_1995_504_art7)
+            anno: Solo sentenze di questo anno
+            include_articles: Con key di un atto (DLG_1995_504) include tutti i suoi articoli
+        """
+        sql = (
+            "SELECT s.key, s.anno, SUM(e.count) FROM nodes n "
+            "JOIN edges e ON e.dst = n.id JOIN nodes s ON s.id = e.src "
+            "WHERE (n.key = ?"
+        )
+        params = [key]
+        if include_articles:
+            sql += " OR n.key LIKE ?"
+            params.append(key.replace('_', r'\_') + r'\_art%')
+            sql += " ESCAPE '\\'"
+        sql += ")"
+        if anno is not None:
+            sql += " AND s.anno = ?"
+            params.append(anno)
+        sql += " GROUP BY s.id ORDER BY s.anno DESC, s.key"
+
+        return [{'sentenza_id': r[0], 'anno': r[1], 'menzioni': r[2]}
+                for r in self.conn.execute(sql, params)]
+
+    def most_cited(self, tipo='giurisprudenza', anno=None, limit=20):
+        """Norme o precedenti più citati (per numero di sentenze citanti)"""
+        sql = (
+            "SELECT n.key, n.label, COUNT(DISTINCT e.src) AS sentenze, SUM(e.count) "
+            "FROM edges e JOIN nodes n ON n.id = e.dst"
+        )
+        params = []
+        if anno is not None:
+            sql += " JOIN nodes s ON s.id = e.src WHERE n.tipo = ? AND s.anno = ?"
+            params += [tipo, anno]
+        else:
+            sql += " WHERE n.tipo = ?"
+            params.append(tipo)
+        sql += " GROUP BY e.dst ORDER BY sentenze DESC LIMIT ?"
+        params.append(limit)
+
+        return [{'key': r[0], 'label': r[1], 'sentenze': r[2], 'menzioni': r[3]}
+                for r in self.conn.execute(sql, params)]
+
+    def neighbourhood(self, key, limit=20):
+        """
+        Vicinato a due passi
+
+        - Sentenza: citazioni (1 passo) e sentenze con citazioni in comune (2 passi)
+        - Norma/precedente: sentenze citanti (1 passo) e chiavi co-citate (2 passi)
+        """
+        row = self.conn.execute("SELECT id, tipo FROM nodes WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        node_id, tipo = row
+
+        if tipo == 'sentenza':
+            hop1 = self.conn.execute(
+                "SELECT n.key, n.tipo FROM edges e JOIN nodes n ON n.id = e.dst "
+                "WHERE e.src = ? GROUP BY e.dst", (node_id,)
+            ).fetchall()
+            hop2 = self.conn.execute(
+                "SELECT n.key, COUNT(DISTINCT e2.dst) AS comuni FROM edges e1 "
+                "JOIN edges e2 ON e2.dst = e1.dst AND e2.src != e1.src "
+                "JOIN nodes n ON n.id = e2.src "
+                "WHERE e1.src = ? GROUP BY e2.src ORDER BY comuni DESC LIMIT ?",
+                (node_id, limit)
+            ).fetchall()
+        else:
+            hop1 = self.conn.execute(
+                "SELECT n.key, n.tipo FROM edges e JOIN nodes n ON n.id = e.src "
+                "WHERE e.dst = ? GROUP BY e.src", (node_id,)
+            ).fetchall()
+            hop2 = self.conn.execute(
+                "SELECT n.key, COUNT(DISTINCT e2.src) AS comuni FROM edges e1 "
+                "JOIN edges e2 ON e2.src = e1.src AND e2.dst != e1.dst "
+                "JOIN nodes n ON n.id = e2.dst "
+                "WHERE e1.dst = ? GROUP BY e2.dst ORDER BY comuni DESC LIMIT ?",
+                (node_id, limit)
+            ).fetchall()
+
+        return {
+            'key': key,
+            'tipo': tipo,
+            'hop1': [{'key': k, 'tipo': t} for k, t in hop1],
+            'hop2': [{'key': k, 'comuni': c} for k, c in hop2],
+        }
+
+    def stats(self):
+        nodes = dict(self.conn.execute("SELECT tipo, COUNT(*) FROM nodes GROUP BY tipo").fetchall())
+        edges = self.conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+        return {'nodes': nodes, 'edges': edges}
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="MEF SCRAPER - STEP 4: Grafo delle citazioni (SQLite)"
+    )
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"Database grafo (default: {DEFAULT_DB})")
+    subparsers = parser.add_subparsers(dest='command', help='Comando da eseguire')
+
+    build_parser = subparsers.add_parser('build', help='Importa citazioni')
+    build_parser.add_argument("--mef", nargs='*', default=[], help="File metadata JSON MEF (da step 2)")
+    build_parser.add_argument("--entities-dir", default=None, help="Directory entities LLM (norme_citate / precedenti_citati)")
+    build_parser.add_argument("--metadata-dir", default=None, help="Directory metadata italgiure (anno delle sentenze)")
+    build_parser.add_argument("--linkage", default=None,
+                              help="Database record_linkage: sentenze MEF collegate sul nodo italgiure")
+
+    cited_parser = subparsers.add_parser('cited-by', help='Sentenze che citano una chiave')
+    cited_parser.add_argument("key", help="Chiave (es: DLG_1995_504_art7)")
+    cited_parser.add_argument("--anno", type=int, default=None, help="Filtro anno sentenze")
+    cited_parser.add_argument("--articles", action="store_true", help="Include tutti gli articoli dell'atto")
+
+    top_parser = subparsers.add_parser('top', help='Più citati')
+    top_parser.add_argument("--tipo", choices=['normativa', 'giurisprudenza'], default='giurisprudenza')
+    top_parser.add_argument("--anno", type=int, default=None, help="Anno delle sentenze citanti")
+    top_parser.add_argument("--limit", type=int, default=20)
+
+    neigh_parser = subparsers.add_parser('neighbours', help='Vicinato a due passi')
+    neigh_parser.add_argument("key", help="Chiave nodo (sentenza, norma o precedente)")
+    neigh_parser.add_argument("--limit", type=int, default=20)
+
+    subparsers.add_parser('stats', help='Statistiche grafo')
+
+    args = parser.parse_args()
+
+    if args.command is None:
+        parser.print_help()
+        return
+
+    graph = CitationGraph(args.db)
+    start = time.perf_counter()
+
+    if args.command == 'build':
+        print("🔗 MEF SCRAPER - STEP 4: Grafo citazioni")
+        print("="*70)
+        canonical = None
+        if args.linkage:
+            linkage = RecordLinkage(args.linkage)
+            canonical = linkage.canonical_map()
+            linkage.close()
+            print(f"✓ {args.linkage}: {len(canonical)} sentenze MEF collegate a italgiure")
+        for metadata_file in args.mef:
+            stats = graph.ingest_mef(metadata_file, canonical)
+            print(f"✓ {metadata_file}: {stats['sentences']} sentenze, {stats['edges']} archi"
+                  + (f" ({stats['relinked']} nodi MEF spostati su italgiure)" if stats['relinked'] else ""))
+        if args.entities_dir:
+            stats = graph.ingest_llm(args.entities_dir, args.metadata_dir)
+            print(f"✓ {args.entities_dir}: {stats['sentences']} sentenze, {stats['edges']} archi "
+                  f"({stats['unresolved']} citazioni non riconosciute)")
+        stats = graph.stats()
+        print(f"\n✅ Grafo: {sum(stats['nodes'].values())} nodi {stats['nodes']}, {stats['edges']} archi")
+
+    elif args.command == 'cited-by':
+        results = graph.cited_by(args.key, anno=args.anno, include_articles=args.articles)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"📋 {len(results)} sentenze citano {args.key} ({elapsed:.1f} ms)\n")
+        for r in results:
+            print(f"   {r['sentenza_id']} ({r['anno']}) - {r['menzioni']} menzioni")
+
+    elif args.command == 'top':
+        results = graph.most_cited(args.tipo, anno=args.anno, limit=args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        anno_str = f" nel {args.anno}" if args.anno else ""
+        print(f"🏆 {args.tipo} più citate{anno_str} ({elapsed:.1f} ms)\n")
+        for i, r in enumerate(results, 1):
+            print(f"{i:2d}. {r['key']:<30} {r['sentenze']:4d} sentenze ({r['menzioni']} menzioni)  {r['label'] or ''}")
+
+    elif args.command == 'neighbours':
+        result = graph.neighbourhood(args.key, limit=args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        if result is None:
+            print(f"✗ Nodo non trovato: {args.key}")
+        else:
+            print(f"🕸️  {result['key']} ({result['tipo']}) - {elapsed:.1f} ms")
+            print(f"\n1 passo: {len(result['hop1'])} nodi")
+            for n in result['hop1'][:args.limit]:
+                print(f"   {n['key']} ({n['tipo']})")
+            print(f"\n2 passi (top {args.limit}):")
+            for n in result['hop2']:
+                print(f"   {n['key']} - {n['comuni']} in comune")
+
+    elif args.command == 'stats':
+        stats = graph.stats()
+        print(f"📊 Nodi: {stats['nodes']}")
+        print(f"📊 Archi: {stats['edges']}")
+
+    graph.close()
+
+
+if __name__ == "__main__":
+    main()
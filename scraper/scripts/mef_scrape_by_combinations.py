@@ -10,16 +10,36 @@ PROCESSO IN DUE FASI:
 
 OTTIMIZZAZIONE:
 Se una combinazione dà 0 risultati con massime=false, viene saltata nella fase con massime=true
+
+MODALITÀ POOL (--workers N):
+N browser in parallelo con un rate limiter globale (intervallo minimo tra
+l'avvio di due ricerche, condiviso da tutti i worker). Le fasi sono in
+pipeline: la ricerca massimate di una combinazione parte appena la sua
+ricerca di fase 1 dà risultati, senza aspettare la fine della fase 1.
+
+ESITI PERSISTENTI (combination_store.py):
+Ogni ricerca viene salvata in SQLite per (materia, classificazione, anno,
+ente, massimate). Un run interrotto riprende da dove si era fermato e, con
+--skip-empty-years K, le combinazioni vuote negli ultimi K anni già cercati
+vengono saltate (salvo --force).
+
+OUTPUT INCREMENTALE:
+results_<anno>_<ts>.jsonl riceve una riga per ricerca appena finisce (con le
+sentenze), results_<anno>_<ts>.json solo il riepilogo a fine run: memoria
+limitata e nessun risultato perso se il run si interrompe.
 """
 
 import os
 import re
 import json
 import time
+import queue
 import argparse
+import threading
 from pathlib import Path
 from datetime import datetime
 from xml.etree import ElementTree as ET
+from combination_store import CombinationStore
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
@@ -224,6 +244,244 @@ def search_combination(driver, materia_code, classificazione_code, anno, ente, s
         return {'num_risultati': -1, 'sentenze': [], 'metadata': {}, 'error': str(e)}
 
 
+# ==================== OUTPUT INCREMENTALE ====================
+
+class ResultStream:
+    """
+    Risultati in JSONL: una riga per ricerca, scritta e flushata appena finisce
+
+    Le sentenze non restano in memoria e un crash perde al massimo la riga
+    in scrittura. In ripresa (stesso file) le ricerche già scritte non vengono
+    ripetute nel file e un'ultima riga troncata viene scartata. Una ricerca
+    finita in errore e ripetuta compare due volte: vale l'ultima riga.
+    """
+
+    def __init__(self, path, anno, ente):
+        self.path = Path(path)
+        self.anno = anno
+        self.ente = ente
+        self.written = set()
+        if self.path.exists():
+            self._load_existing()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def _key(phase, combo):
+        return (phase, combo['materia_code'], combo['classificazione_code'])
+
+    def _load_existing(self):
+        valid_size = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                # Ogni riga è scritta con il suo '\n': senza è troncata
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                valid_size += len(line)
+                if record['num_risultati'] >= 0:
+                    self.written.add(self._key(record['phase'], record['combination']))
+
+        if valid_size < self.path.stat().st_size:
+            print(f"      ⚠️  {self.path.name}: scartata riga incompleta del run interrotto")
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_size)
+
+    def write(self, phase, record):
+        """Accoda il risultato di una ricerca (record come in run_search_pool)"""
+        key = self._key(phase, record['combination'])
+        if key in self.written:
+            return
+        line = json.dumps({
+            'phase': phase,
+            'massime': phase == 2,
+            'anno': self.anno,
+            'ente': self.ente,
+            **record
+        }, ensure_ascii=False, separators=(',', ':'))
+        self._file.write(line + '\n')
+        self._file.flush()
+        if record['num_risultati'] >= 0:
+            self.written.add(key)
+
+    def close(self):
+        self._file.close()
+
+
+def _new_counts():
+    return {'total_tested': 0, 'zero_results_count': 0, 'with_results': 0, 'errors': 0, 'sentenze': 0}
+
+
+def _count(counts, num_risultati):
+    """Aggiorna i contatori di una fase con l'esito di una ricerca"""
+    counts['total_tested'] += 1
+    if num_risultati > 0:
+        counts['with_results'] += 1
+        counts['sentenze'] += num_risultati
+    elif num_risultati == 0:
+        counts['zero_results_count'] += 1
+    else:
+        counts['errors'] += 1
+
+
+# ==================== POOL DI RICERCA ====================
+
+class RateLimiter:
+    """Intervallo minimo globale tra l'avvio di due ricerche (thread-safe)"""
+
+    def __init__(self, min_interval=1.0):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        """Blocca fino al prossimo slot libero (gli slot sono assegnati in ordine di arrivo)"""
+        with self._lock:
+            slot = max(time.monotonic(), self._next_slot)
+            self._next_slot = slot + self.min_interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+# Priorità coda: le ricerche di fase 2 passano davanti a quelle di fase 1,
+# così i risultati massimati arrivano mentre la fase 1 è ancora in corso
+_PRIORITY_PHASE2 = 0
+_PRIORITY_PHASE1 = 1
+_PRIORITY_STOP = 2
+
+# Errori consecutivi dopo cui un worker riavvia il proprio browser
+MAX_CONSECUTIVE_ERRORS = 3
+
+
+def run_search_pool(combinations, anno, ente, workers=4, headless=True, min_interval=1.0,
+                    on_result=None, search=None, driver_factory=None, lookup=None):
+    """
+    Ricerca parallela delle combinazioni con fasi in pipeline
+
+    Ogni worker ha il proprio browser; tutti condividono la coda e il rate
+    limiter. Una combinazione con risultati != 0 in fase 1 (errori inclusi,
+    come nella modalità sequenziale) viene subito accodata per la fase 2.
+
+    Args:
+        combinations: Lista combinazioni (load_combinations)
+        workers: Numero di browser in parallelo
+        min_interval: Secondi minimi tra l'avvio di due ricerche (globale)
+        on_result: Callback(phase, index, record, progress) chiamata sotto lock;
+                   è l'unico punto in cui il record completo (con sentenze) è disponibile
+        search / driver_factory: Funzioni di ricerca e creazione browser
+                                 (default: search_combination, setup_driver)
+        lookup: Callback(combo, solo_massimate) con l'esito già noto (ripresa)
+                o None; gli esiti noti non consumano slot del rate limiter
+
+    Returns:
+        dict: {'phase1': {index: num_risultati}, 'phase2': {index: num_risultati},
+               'phase1_seconds': float, 'phase2_seconds': float, 'incomplete': int}
+    """
+    search = search or search_combination
+    driver_factory = driver_factory or setup_driver
+    tasks = queue.PriorityQueue()
+    limiter = RateLimiter(min_interval)
+    lock = threading.Lock()
+    stop = threading.Event()
+    start = time.time()
+
+    state = {'phase1': {}, 'phase2': {}, 'phase1_end': start, 'phase2_end': start, 'phase2_queued': 0}
+
+    for index in range(len(combinations)):
+        tasks.put((_PRIORITY_PHASE1, index, 1))
+
+    def run_task(driver, index, phase):
+        combo = combinations[index]
+        result = lookup(combo, phase == 2) if lookup else None
+        if result is None:
+            limiter.wait()
+            result = search(
+                driver,
+                combo['materia_code'],
+                combo['classificazione_code'],
+                anno,
+                ente,
+                solo_massimate=(phase == 2)
+            )
+        record = {
+            'combination': combo,
+            'num_risultati': result['num_risultati'],
+            'sentenze': result.get('sentenze', []),
+            'metadata': result.get('metadata', {}),
+            'error': result.get('error')
+        }
+
+        with lock:
+            state[f'phase{phase}'][index] = record['num_risultati']
+            state[f'phase{phase}_end'] = time.time()
+            if phase == 1 and record['num_risultati'] != 0:
+                state['phase2_queued'] += 1
+                tasks.put((_PRIORITY_PHASE2, index, 2))
+            if on_result:
+                progress = {
+                    'phase1_done': len(state['phase1']),
+                    'phase1_total': len(combinations),
+                    'phase2_done': len(state['phase2']),
+                    'phase2_queued': state['phase2_queued'],
+                }
+                on_result(phase, index, record, progress)
+        return record
+
+    def worker(worker_id):
+        try:
+            driver = driver_factory(headless)
+        except Exception as e:
+            print(f"      ✗ Worker {worker_id}: browser non avviato ({e})")
+            return
+
+        errors = 0
+        try:
+            while not stop.is_set():
+                _, index, phase = tasks.get()
+                try:
+                    if phase == 0:
+                        break
+                    record = run_task(driver, index, phase)
+                    errors = errors + 1 if record['num_risultati'] < 0 else 0
+                    if errors >= MAX_CONSECUTIVE_ERRORS:
+                        print(f"      ↻ Worker {worker_id}: {errors} errori consecutivi, riavvio browser")
+                        driver.quit()
+                        driver = driver_factory(headless)
+                        errors = 0
+                finally:
+                    tasks.task_done()
+        except Exception as e:
+            print(f"      ✗ Worker {worker_id} terminato: {e}")
+        finally:
+            driver.quit()
+
+    threads = [threading.Thread(target=worker, args=(i + 1,), daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        # Attende la coda vuota finché almeno un worker è vivo
+        while tasks.unfinished_tasks and any(t.is_alive() for t in threads):
+            time.sleep(0.2)
+    finally:
+        stop.set()
+        for _ in threads:
+            tasks.put((_PRIORITY_STOP, -1, 0))
+        for thread in threads:
+            thread.join(timeout=60)
+
+    return {
+        'phase1': state['phase1'],
+        'phase2': state['phase2'],
+        'phase1_seconds': state['phase1_end'] - start,
+        'phase2_seconds': state['phase2_end'] - start if state['phase2'] else 0,
+        'incomplete': len(combinations) - len(state['phase1']) + state['phase2_queued'] - len(state['phase2']),
+    }
+
+
 def load_combinations(json_file):
     """
     Carica tutte le combinazioni Materia+Classificazione dal JSON
@@ -261,12 +519,99 @@ def load_combinations(json_file):
     return combinations
 
 
+def _scrape_with_pool(combinations, anno, ente, workers, headless, min_interval,
+                      zero_results_file, stream, summary, search=None, lookup=None):
+    """
+    Fasi 1 e 2 con run_search_pool (stesso formato risultati della modalità sequenziale)
+
+    Returns:
+        tuple: (zero_results, phase1_counts, phase2_counts, phase1_duration, phase2_duration)
+    """
+    total_combinations = len(combinations)
+    zero_results = []
+    counts = {1: _new_counts(), 2: _new_counts()}
+
+    print("="*80)
+    print(f"🔍 FASE 1 + FASE 2 in pipeline ({workers} worker)")
+    print("="*80)
+
+    def on_result(phase, index, record, progress):
+        combo = record['combination']
+        num_risultati = record['num_risultati']
+        label = f"F{phase} [{progress['phase1_done']}/{progress['phase1_total']} | " \
+                f"{progress['phase2_done']}/{progress['phase2_queued']}]"
+
+        if num_risultati > 0:
+            outcome = f"✓ {num_risultati}" + (" massimate" if phase == 2 else "")
+        elif num_risultati == 0:
+            outcome = "⊘ 0" + (" (saltata in fase 2)" if phase == 1 else " massimate")
+        else:
+            outcome = "✗ errore"
+        print(f"{label} {combo['materia_desc'][:30]} / {combo['classificazione_desc'][:30]}: {outcome}")
+
+        stream.write(phase, record)
+        _count(counts[phase], num_risultati)
+
+        if phase == 1 and num_risultati == 0:
+            zero_results.append((index, {
+                'materia_code': combo['materia_code'],
+                'materia_desc': combo['materia_desc'],
+                'classificazione_code': combo['classificazione_code'],
+                'classificazione_desc': combo['classificazione_desc']
+            }))
+
+        # Salva progressivamente
+        if phase == 1 and progress['phase1_done'] % 50 == 0:
+            with open(zero_results_file, 'w', encoding='utf-8') as f:
+                json.dump([zr for _, zr in sorted(zero_results)], f, ensure_ascii=False, indent=2)
+
+    pool = run_search_pool(combinations, anno, ente, workers=workers, headless=headless,
+                           min_interval=min_interval, on_result=on_result, search=search, lookup=lookup)
+
+    # Ordine delle combinazioni, come nella modalità sequenziale
+    zero_results = [zr for _, zr in sorted(zero_results, key=lambda x: x[0])]
+
+    with open(zero_results_file, 'w', encoding='utf-8') as f:
+        json.dump(zero_results, f, ensure_ascii=False, indent=2)
+
+    if pool['incomplete']:
+        print(f"\n⚠️  Ricerche non completate: {pool['incomplete']}")
+    print(f"\n✅ FASE 1 completata in {pool['phase1_seconds']/60:.1f} minuti")
+    print(f"✅ FASE 2 completata in {pool['phase2_seconds']/60:.1f} minuti (dall'avvio, in pipeline)")
+    print(f"📊 Combinazioni con 0 risultati: {len(zero_results)}/{total_combinations}")
+    print(f"💾 File zero results: {zero_results_file}")
+
+    summary['workers'] = workers
+    summary['incomplete'] = pool['incomplete']
+    summary['phases'].append({
+        'phase': 1,
+        'massime': False,
+        'duration_seconds': pool['phase1_seconds'],
+        **counts[1]
+    })
+    summary['phases'].append({
+        'phase': 2,
+        'massime': True,
+        'pipelined': True,
+        'duration_seconds': pool['phase2_seconds'],
+        'skipped_zero_results': len(zero_results),
+        **counts[2]
+    })
+
+    return zero_results, counts[1], counts[2], pool['phase1_seconds'], pool['phase2_seconds']
+
+
 def scrape_by_combinations(
     combinations_file,
     anno,
     ente="Corte di Cassazione",
     output_dir="scraper/data/mef_combinations",
-    headless=True
+    headless=True,
+    workers=1,
+    min_interval=1.0,
+    store_path=None,
+    skip_empty_years=0,
+    force=False
 ):
     """
     Main function: esegue scraping per tutte le combinazioni in DUE FASI
@@ -282,18 +627,34 @@ def scrape_by_combinations(
         ente: Autorità emanante
         output_dir: Directory output
         headless: Modalità headless
+        workers: Browser in parallelo (>1: pool con fasi in pipeline)
+        min_interval: Secondi minimi tra l'avvio di due ricerche (pool)
+        store_path: Database esiti (default: <output_dir>/combination_outcomes.db, False = disattivato)
+        skip_empty_years: Salta le combinazioni vuote negli ultimi K anni cercati (0 = mai)
+        force: Ignora politica di skip e ripresa (cerca tutto)
+
+    Returns:
+        dict: Riepilogo del run (contatori per fase, senza sentenze)
     """
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    store = None
+    if store_path is not False:
+        store = CombinationStore(store_path or output_path / "combination_outcomes.db")
+
+    # Ripresa: stesso run_id (e stessi file di output) del run interrotto
+    resumed_run = store.interrupted_run(anno, ente) if store and not force else None
+    timestamp = resumed_run or datetime.now().strftime("%Y%m%d_%H%M%S")
 
     print("🚀 MEF SCRAPER - Ricerca per Combinazioni Materia+Classificazione")
     print("="*80)
     print(f"📁 Output: {output_path.absolute()}")
     print(f"📅 Anno: {anno}")
     print(f"🏛️  Ente: {ente}")
-    print(f"🕐 Timestamp: {timestamp}\n")
+    if workers > 1:
+        print(f"⚡ Pool: {workers} browser, una ricerca ogni {min_interval:g}s al massimo")
+    print(f"🕐 Timestamp: {timestamp}" + (" (ripresa run interrotto)" if resumed_run else "") + "\n")
 
     # Carica combinazioni
     print("📋 Caricamento combinazioni...")
@@ -301,182 +662,234 @@ def scrape_by_combinations(
     total_combinations = len(combinations)
     print(f"✓ Caricate {total_combinations} combinazioni\n")
 
+    # Politica di skip: vuote in tutti gli ultimi K anni già cercati
+    skipped_by_policy = []
+    if store and skip_empty_years and not force:
+        empty = store.empty_in_last_years(anno, ente, skip_empty_years)
+        skipped_by_policy = [
+            dict(combo, anni_vuoti=empty[(combo['materia_code'], combo['classificazione_code'])])
+            for combo in combinations
+            if (combo['materia_code'], combo['classificazione_code']) in empty
+        ]
+        combinations = [
+            combo for combo in combinations
+            if (combo['materia_code'], combo['classificazione_code']) not in empty
+        ]
+        print(f"⏭️  Saltate {len(skipped_by_policy)} combinazioni vuote negli ultimi "
+              f"{skip_empty_years} anni cercati (--force per cercarle)\n")
+
+    def search(driver, materia_code, classificazione_code, anno, ente, solo_massimate):
+        """search_combination + salvataggio esito"""
+        result = search_combination(driver, materia_code, classificazione_code, anno, ente, solo_massimate)
+        if store:
+            store.record(materia_code, classificazione_code, anno, ente, solo_massimate, result, run_id=timestamp)
+        return result
+
+    def lookup(combo, solo_massimate):
+        """Esito già ottenuto nel run interrotto"""
+        if not resumed_run:
+            return None
+        return store.resumed_result(combo['materia_code'], combo['classificazione_code'],
+                                    anno, ente, solo_massimate, resumed_run)
+
+    if store:
+        store.start_run(timestamp, anno, ente)
+
     # File per tracciare combinazioni con 0 risultati
     zero_results_file = output_path / f"zero_results_{anno}_{timestamp}.json"
     zero_results = []
 
-    # File risultati finali
+    # Risultati: JSONL incrementale + riepilogo compatto a fine run
+    results_stream_file = output_path / f"results_{anno}_{timestamp}.jsonl"
     results_file = output_path / f"results_{anno}_{timestamp}.json"
-    all_results = {
+    stream = ResultStream(results_stream_file, anno, ente)
+    summary = {
         'timestamp': timestamp,
         'anno': anno,
         'ente': ente,
         'total_combinations': total_combinations,
+        'results_file': results_stream_file.name,
+        'skipped_by_policy': skipped_by_policy,
         'phases': []
     }
 
     driver = None
 
     try:
-        driver = setup_driver(headless)
-
-        # ============================================================
-        # FASE 1: massime=false
-        # ============================================================
-        print("="*80)
-        print("🔍 FASE 1: Ricerca con massime=false")
-        print("="*80)
-
-        phase1_results = []
-        phase1_start = time.time()
-
-        for i, combo in enumerate(combinations, 1):
-            print(f"\n[{i}/{total_combinations}] Materia: {combo['materia_desc'][:40]}")
-            print(f"              Classificazione: {combo['classificazione_desc'][:40]}")
-
-            result = search_combination(
-                driver,
-                combo['materia_code'],
-                combo['classificazione_code'],
-                anno,
-                ente,
-                solo_massimate=False
+        if workers > 1:
+            (zero_results, phase1_counts, phase2_counts,
+             phase1_duration, phase2_duration) = _scrape_with_pool(
+                combinations, anno, ente, workers, headless, min_interval,
+                zero_results_file, stream, summary, search=search, lookup=lookup
             )
-
-            num_risultati = result['num_risultati']
-
-            if num_risultati == 0:
-                print(f"              ⊘ 0 risultati (verrà saltata in fase 2)")
-                zero_results.append({
-                    'materia_code': combo['materia_code'],
-                    'materia_desc': combo['materia_desc'],
-                    'classificazione_code': combo['classificazione_code'],
-                    'classificazione_desc': combo['classificazione_desc']
+            total_phase2 = phase2_counts['total_tested']
+        else:
+            driver = setup_driver(headless)
+
+            # ============================================================
+            # FASE 1: massime=false
+            # ============================================================
+            print("="*80)
+            print("🔍 FASE 1: Ricerca con massime=false")
+            print("="*80)
+
+            phase1_counts = _new_counts()
+            phase1_start = time.time()
+
+            for i, combo in enumerate(combinations, 1):
+                print(f"\n[{i}/{total_combinations}] Materia: {combo['materia_desc'][:40]}")
+                print(f"              Classificazione: {combo['classificazione_desc'][:40]}")
+
+                result = lookup(combo, False) or search(
+                    driver,
+                    combo['materia_code'],
+                    combo['classificazione_code'],
+                    anno,
+                    ente,
+                    solo_massimate=False
+                )
+
+                num_risultati = result['num_risultati']
+
+                if num_risultati == 0:
+                    print(f"              ⊘ 0 risultati (verrà saltata in fase 2)")
+                    zero_results.append({
+                        'materia_code': combo['materia_code'],
+                        'materia_desc': combo['materia_desc'],
+                        'classificazione_code': combo['classificazione_code'],
+                        'classificazione_desc': combo['classificazione_desc']
+                    })
+                elif num_risultati > 0:
+                    print(f"              ✓ {num_risultati} risultati trovati")
+                else:
+                    print(f"              ✗ Errore nella ricerca")
+
+                stream.write(1, {
+                    'combination': combo,
+                    'num_risultati': num_risultati,
+                    'sentenze': result.get('sentenze', []),
+                    'metadata': result.get('metadata', {}),
+                    'error': result.get('error')
                 })
-            elif num_risultati > 0:
-                print(f"              ✓ {num_risultati} risultati trovati")
-            else:
-                print(f"              ✗ Errore nella ricerca")
-
-            phase1_results.append({
-                'combination': combo,
-                'num_risultati': num_risultati,
-                'sentenze': result.get('sentenze', []),
-                'metadata': result.get('metadata', {}),
-                'error': result.get('error')
-            })
-
-            # Salva progressivamente
-            if i % 50 == 0:
-                print(f"\n💾 Salvataggio intermedio (processate {i}/{total_combinations})...")
-                with open(zero_results_file, 'w', encoding='utf-8') as f:
-                    json.dump(zero_results, f, ensure_ascii=False, indent=2)
-
-            time.sleep(1)  # Pausa tra ricerche
+                _count(phase1_counts, num_risultati)
 
-        phase1_duration = time.time() - phase1_start
+                # Salva progressivamente
+                if i % 50 == 0:
+                    print(f"\n💾 Salvataggio intermedio (processate {i}/{total_combinations})...")
+                    with open(zero_results_file, 'w', encoding='utf-8') as f:
+                        json.dump(zero_results, f, ensure_ascii=False, indent=2)
 
-        # Salva risultati fase 1
-        with open(zero_results_file, 'w', encoding='utf-8') as f:
-            json.dump(zero_results, f, ensure_ascii=False, indent=2)
+                if not result.get('resumed'):
+                    time.sleep(1)  # Pausa tra ricerche
 
-        print(f"\n✅ FASE 1 completata in {phase1_duration/60:.1f} minuti")
-        print(f"📊 Combinazioni con 0 risultati: {len(zero_results)}/{total_combinations}")
-        print(f"📊 Combinazioni con risultati: {total_combinations - len(zero_results)}")
-        print(f"💾 File zero results: {zero_results_file}")
+            phase1_duration = time.time() - phase1_start
 
-        all_results['phases'].append({
-            'phase': 1,
-            'massime': False,
-            'duration_seconds': phase1_duration,
-            'total_tested': total_combinations,
-            'zero_results_count': len(zero_results),
-            'results': phase1_results
-        })
+            # Salva risultati fase 1
+            with open(zero_results_file, 'w', encoding='utf-8') as f:
+                json.dump(zero_results, f, ensure_ascii=False, indent=2)
 
-        # ============================================================
-        # FASE 2: massime=true (SOLO per combinazioni con risultati)
-        # ============================================================
-        print("\n" + "="*80)
-        print("🔍 FASE 2: Ricerca con massime=true (solo combinazioni con risultati)")
-        print("="*80)
+            print(f"\n✅ FASE 1 completata in {phase1_duration/60:.1f} minuti")
+            print(f"📊 Combinazioni con 0 risultati: {len(zero_results)}/{total_combinations}")
+            print(f"📊 Combinazioni con risultati: {total_combinations - len(zero_results)}")
+            print(f"💾 File zero results: {zero_results_file}")
 
-        # Filtra combinazioni: ESCLUDI quelle con 0 risultati
-        zero_results_keys = {
-            (zr['materia_code'], zr['classificazione_code'])
-            for zr in zero_results
-        }
+            summary['phases'].append({
+                'phase': 1,
+                'massime': False,
+                'duration_seconds': phase1_duration,
+                **phase1_counts
+            })
 
-        combinations_with_results = [
-            combo for combo in combinations
-            if (combo['materia_code'], combo['classificazione_code']) not in zero_results_keys
-        ]
+            # ============================================================
+            # FASE 2: massime=true (SOLO per combinazioni con risultati)
+            # ============================================================
+            print("\n" + "="*80)
+            print("🔍 FASE 2: Ricerca con massime=true (solo combinazioni con risultati)")
+            print("="*80)
+
+            # Filtra combinazioni: ESCLUDI quelle con 0 risultati
+            zero_results_keys = {
+                (zr['materia_code'], zr['classificazione_code'])
+                for zr in zero_results
+            }
+
+            combinations_with_results = [
+                combo for combo in combinations
+                if (combo['materia_code'], combo['classificazione_code']) not in zero_results_keys
+            ]
+
+            total_phase2 = len(combinations_with_results)
+            print(f"📋 Combinazioni da testare in fase 2: {total_phase2}\n")
+
+            phase2_counts = _new_counts()
+            phase2_start = time.time()
+
+            for i, combo in enumerate(combinations_with_results, 1):
+                print(f"\n[{i}/{total_phase2}] Materia: {combo['materia_desc'][:40]}")
+                print(f"              Classificazione: {combo['classificazione_desc'][:40]}")
+
+                result = lookup(combo, True) or search(
+                    driver,
+                    combo['materia_code'],
+                    combo['classificazione_code'],
+                    anno,
+                    ente,
+                    solo_massimate=True
+                )
+
+                num_risultati = result['num_risultati']
+
+                if num_risultati > 0:
+                    print(f"              ✓ {num_risultati} risultati (massimate) trovati")
+                elif num_risultati == 0:
+                    print(f"              ⊘ 0 risultati (massimate)")
+                else:
+                    print(f"              ✗ Errore nella ricerca")
+
+                stream.write(2, {
+                    'combination': combo,
+                    'num_risultati': num_risultati,
+                    'sentenze': result.get('sentenze', []),
+                    'metadata': result.get('metadata', {}),
+                    'error': result.get('error')
+                })
+                _count(phase2_counts, num_risultati)
 
-        total_phase2 = len(combinations_with_results)
-        print(f"📋 Combinazioni da testare in fase 2: {total_phase2}\n")
+                if not result.get('resumed'):
+                    time.sleep(1)
 
-        phase2_results = []
-        phase2_start = time.time()
+            phase2_duration = time.time() - phase2_start
 
-        for i, combo in enumerate(combinations_with_results, 1):
-            print(f"\n[{i}/{total_phase2}] Materia: {combo['materia_desc'][:40]}")
-            print(f"              Classificazione: {combo['classificazione_desc'][:40]}")
+            print(f"\n✅ FASE 2 completata in {phase2_duration/60:.1f} minuti")
+            print(f"📊 Combinazioni testate: {total_phase2}")
 
-            result = search_combination(
-                driver,
-                combo['materia_code'],
-                combo['classificazione_code'],
-                anno,
-                ente,
-                solo_massimate=True
-            )
-
-            num_risultati = result['num_risultati']
-
-            if num_risultati > 0:
-                print(f"              ✓ {num_risultati} risultati (massimate) trovati")
-            elif num_risultati == 0:
-                print(f"              ⊘ 0 risultati (massimate)")
-            else:
-                print(f"              ✗ Errore nella ricerca")
-
-            phase2_results.append({
-                'combination': combo,
-                'num_risultati': num_risultati,
-                'sentenze': result.get('sentenze', []),
-                'metadata': result.get('metadata', {}),
-                'error': result.get('error')
+            summary['phases'].append({
+                'phase': 2,
+                'massime': True,
+                'duration_seconds': phase2_duration,
+                'skipped_zero_results': len(zero_results),
+                **phase2_counts
             })
 
-            time.sleep(1)
-
-        phase2_duration = time.time() - phase2_start
-
-        print(f"\n✅ FASE 2 completata in {phase2_duration/60:.1f} minuti")
-        print(f"📊 Combinazioni testate: {total_phase2}")
-
-        all_results['phases'].append({
-            'phase': 2,
-            'massime': True,
-            'duration_seconds': phase2_duration,
-            'total_tested': total_phase2,
-            'skipped_zero_results': len(zero_results),
-            'results': phase2_results
-        })
-
         # ============================================================
-        # Salvataggio finale
+        # Riepilogo finale (i risultati sono già nel JSONL)
         # ============================================================
         print("\n" + "="*80)
-        print("💾 Salvataggio risultati finali...")
+        print("💾 Salvataggio riepilogo...")
 
         with open(results_file, 'w', encoding='utf-8') as f:
-            json.dump(all_results, f, ensure_ascii=False, indent=2)
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+        print(f"✓ File risultati: {results_stream_file}")
+        print(f"✓ File riepilogo: {results_file}")
 
-        print(f"✓ File risultati: {results_file}")
+        # Run completo: il prossimo avvio per questo anno/ente non riprende
+        if store and not summary.get('incomplete'):
+            store.finish_run(timestamp, anno, ente)
 
         # Statistiche finali
-        total_duration = phase1_duration + phase2_duration
+        # In pipeline le durate partono entrambe dall'avvio: conta la più lunga
+        total_duration = max(phase1_duration, phase2_duration) if workers > 1 else phase1_duration + phase2_duration
 
         print("\n" + "="*80)
         print("📊 STATISTICHE FINALI")
@@ -487,24 +900,24 @@ def scrape_by_combinations(
         print(f"✓  Combinazioni con risultati: {total_phase2}")
         print(f"⚡ Ricerche risparmiate: {len(zero_results)} ({len(zero_results)/total_combinations*100:.1f}%)")
 
-        # Conta sentenze totali
-        total_sentenze_fase1 = sum(r['num_risultati'] for r in phase1_results if r['num_risultati'] > 0)
-        total_sentenze_fase2 = sum(r['num_risultati'] for r in phase2_results if r['num_risultati'] > 0)
-
-        print(f"\n📄 Sentenze trovate fase 1 (massime=false): {total_sentenze_fase1}")
-        print(f"📄 Sentenze trovate fase 2 (massime=true): {total_sentenze_fase2}")
+        print(f"\n📄 Sentenze trovate fase 1 (massime=false): {phase1_counts['sentenze']}")
+        print(f"📄 Sentenze trovate fase 2 (massime=true): {phase2_counts['sentenze']}")
 
     except KeyboardInterrupt:
         print("\n⚠️  Interrotto dall'utente")
+        print(f"💾 Risultati fin qui: {results_stream_file}")
     except Exception as e:
         print(f"\n✗ Errore: {e}")
         import traceback
         traceback.print_exc()
     finally:
+        stream.close()
         if driver:
             driver.quit()
+        if store:
+            store.close()
 
-    return all_results
+    return summary
 
 
 def main():
@@ -540,6 +953,40 @@ def main():
         action="store_true",
         help="Mostra browser"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Browser in parallelo (default: 1, sequenziale; >1: pool con fasi in pipeline)"
+    )
+    parser.add_argument(
+        "--store",
+        type=str,
+        default=None,
+        help="Database esiti ricerche (default: <output>/combination_outcomes.db)"
+    )
+    parser.add_argument(
+        "--no-store",
+        action="store_true",
+        help="Non salvare gli esiti (niente ripresa né skip)"
+    )
+    parser.add_argument(
+        "--skip-empty-years",
+        type=int,
+        default=0,
+        help="Salta combinazioni vuote negli ultimi K anni già cercati (default: 0, mai)"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Ignora skip e ripresa: cerca tutte le combinazioni"
+    )
+    parser.add_argument(
+        "--min-interval",
+        type=float,
+        default=1.0,
+        help="Secondi minimi tra l'avvio di due ricerche, globale per tutti i worker (default: 1.0)"
+    )
 
     args = parser.parse_args()
 
@@ -548,7 +995,12 @@ def main():
         anno=args.anno,
         ente=args.ente,
         output_dir=args.output,
-        headless=not args.no_headless
+        headless=not args.no_headless,
+        workers=args.workers,
+        min_interval=args.min_interval,
+        store_path=False if args.no_store else args.store,
+        skip_empty_years=args.skip_empty_years,
+        force=args.force
     )
 
 
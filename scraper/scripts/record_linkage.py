@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+RECORD LINKAGE - Stesse decisioni da italgiure e MEF
+
+La stessa decisione della Cassazione arriva da italgiure (snciv2022538131S,
+metadata_cassazione_*.json / _all_sentenze.json) e dal MEF DocTrib
+(mef2022538131S, metadata_mef_*.json di step 2 con i campi di parse_estremi).
+L'indice SQLite collega i due record con chiave (sezione, numero, anno,
+data deposito); a valle l'ID canonico è quello italgiure.
+
+Blocking (indici SQL, nessun confronto tutti-contro-tutti):
+1. (anno, numero): il numero è progressivo per anno, di norma un solo candidato
+2. (data deposito, sezione) per i record rimasti: numero diverso per una
+   cifra (sostituita, mancante o due adiacenti scambiate) negli estremi
+
+Punteggio pesato su numero, anno, data, sezione e tipo (i campi mancanti non
+contano); collegamenti uno-a-uno, greedy per punteggio:
+  >= MATCH_THRESHOLD  -> match (stessa decisione)
+  >= REVIEW_THRESHOLD -> review (da controllare, non usato a valle)
+
+Uso:
+  python3 scraper/scripts/record_linkage.py --db metadata/record_linkage.db build \\
+    --italgiure metadata/metadata_cassazione*.json --mef metadata/metadata_mef_*.json
+  python3 scraper/scripts/record_linkage.py --db metadata/record_linkage.db lookup mef2022538131S
+"""
+
+import re
+import json
+import time
+import sqlite3
+import argparse
+from pathlib import Path
+from datetime import date, datetime
+
+DEFAULT_DB = "record_linkage.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    source TEXT NOT NULL,            -- italgiure / mef
+    record_id TEXT NOT NULL,
+    anno INTEGER,
+    numero TEXT,                     -- senza zeri iniziali
+    sezione TEXT,                    -- 1..7, L (lavoro), U (unite)
+    data_deposito TEXT,              -- YYYY-MM-DD
+    data_decisione TEXT,             -- YYYY-MM-DD (udienza / camera di consiglio)
+    tipo TEXT,                       -- S / O / D
+    label TEXT,
+    PRIMARY KEY (source, record_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_records_anno_numero ON records(anno, numero);
+CREATE INDEX IF NOT EXISTS idx_records_data_sezione ON records(data_deposito, sezione);
+
+CREATE TABLE IF NOT EXISTS links (
+    mef_id TEXT PRIMARY KEY,
+    italgiure_id TEXT UNIQUE NOT NULL,
+    score REAL NOT NULL,
+    metodo TEXT NOT NULL,            -- numero / data_sezione (blocco che ha trovato il candidato)
+    status TEXT NOT NULL             -- match / review
+);
+"""
+
+# Pesi dei campi nel punteggio (normalizzato sui campi presenti in entrambi i record)
+WEIGHTS = {'numero': 0.4, 'anno': 0.2, 'data': 0.25, 'sezione': 0.1, 'tipo': 0.05}
+MATCH_THRESHOLD = 0.8
+REVIEW_THRESHOLD = 0.6
+DATE_TOLERANCE_DAYS = 3
+
+SEZIONI = {
+    'PRIMA': '1', 'SECONDA': '2', 'TERZA': '3', 'QUARTA': '4', 'QUINTA': '5',
+    'SESTA': '6', 'SETTIMA': '7', 'LAVORO': 'L', 'UNITE': 'U',
+    'TRIBUTARIA': '5',  # la sezione tributaria è la quinta civile
+}
+ROMAN_PATTERN = re.compile(r'^[IVX]+$')
+ROMAN_VALUES = {'I': 1, 'V': 5, 'X': 10}
+
+# Campi MEF riportati nel record italgiure collegato (merge)
+MEF_MERGE_FIELDS = (
+    'id', 'id_mef_guid', 'url', 'estremi', 'intitolazione', 'has_massima', 'massima',
+    'entities_count', 'entities_testo', 'entities_massima', 'documenti_citati_count', 'metadata'
+)
+
+
+# ==================== NORMALIZZAZIONE ====================
+
+def _roman_to_int(value):
+    total = 0
+    for i, char in enumerate(value):
+        current = ROMAN_VALUES[char]
+        if i + 1 < len(value) and ROMAN_VALUES[value[i + 1]] > current:
+            total -= current
+        else:
+            total += current
+    return total
+
+
+def normalize_sezione(value):
+    """
+    Sezione in forma canonica
+
+    Esempi: "QUINTA" -> "5", "5" -> "5", "V" -> "5", "Sezioni Unite" -> "U"
+    """
+    text = str(value or '').strip().upper()
+    if not text:
+        return None
+    if text.isdigit():
+        return str(int(text))
+    if ROMAN_PATTERN.match(text):
+        return str(_roman_to_int(text))
+    for word, code in SEZIONI.items():
+        if word in text:
+            return code
+    return None
+
+
+def normalize_data(value):
+    """Data "dd/mm/yyyy" o "yyyy-mm-dd" -> "yyyy-mm-dd" (None se non valida)"""
+    text = str(value or '').strip()
+    for fmt in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text[:10], fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_numero(value):
+    digits = re.sub(r'\D', '', str(value or ''))
+    return str(int(digits)) if digits else None
+
+
+def _tipo(value):
+    text = str(value or '').strip().upper()
+    return text[0] if text else None
+
+
+def _anno(value, data=None):
+    match = re.search(r'\d{4}', str(value or ''))
+    if match:
+        return int(match.group(0))
+    return int(data[:4]) if data else None
+
+
+def record_from_italgiure(entry):
+    """Record normalizzato da una voce metadata italgiure"""
+    data_deposito = normalize_data(entry.get('data_pubblicazione') or entry.get('data_deposito'))
+    numero = normalize_numero(entry.get('numero'))
+    return {
+        'source': 'italgiure',
+        'record_id': entry['id'],
+        'anno': _anno(entry.get('anno'), data_deposito),
+        'numero': numero,
+        'sezione': normalize_sezione(entry.get('sezione')),
+        'data_deposito': data_deposito,
+        'data_decisione': normalize_data(entry.get('data_udienza') or entry.get('data_decisione')),
+        'tipo': _tipo(entry.get('tipo_provvedimento')),
+        'label': f"{entry.get('tipo_provvedimento', '')} n. {numero}/{entry.get('anno', '')}".strip(),
+    }
+
+
+def record_from_mef(entry):
+    """Record normalizzato da una voce metadata MEF (campi di parse_estremi, step 2)"""
+    data_deposito = normalize_data(entry.get('data_pubblicazione'))
+    return {
+        'source': 'mef',
+        'record_id': entry['id'],
+        'anno': _anno(entry.get('anno'), data_deposito),
+        'numero': normalize_numero(entry.get('numero')),
+        'sezione': normalize_sezione(entry.get('sezione')),
+        'data_deposito': data_deposito,
+        'data_decisione': None,
+        'tipo': _tipo(entry.get('tipo_provvedimento')),
+        'label': entry.get('estremi', ''),
+    }
+
+
+def load_sentences(metadata_file):
+    """Voci di un file metadata ({'sentences': [...]} o lista come _all_sentenze.json)"""
+    with open(metadata_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return data.get('sentences', []) if isinstance(data, dict) else data
+
+
+# ==================== CONFRONTO ====================
+
+def numero_close(a, b):
+    """Numeri uguali o diversi per una cifra (sostituita, mancante/in più, adiacenti scambiate)"""
+    if a == b:
+        return True
+    if len(a) == len(b):
+        diff = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return (len(diff) == 2 and diff[1] == diff[0] + 1
+                and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]])
+    if abs(len(a) - len(b)) != 1:
+        return False
+    short, long_ = (a, b) if len(a) < len(b) else (b, a)
+    return any(long_[:i] + long_[i + 1:] == short for i in range(len(long_)))
+
+
+def _data_similarity(mef, italgiure):
+    """1 = stesso deposito, 0.75 = data MEF uguale alla data di decisione, 0.5 = deposito entro pochi giorni"""
+    if mef['data_deposito'] == italgiure['data_deposito']:
+        return 1.0
+    if mef['data_deposito'] == italgiure['data_decisione']:
+        return 0.75
+    delta = abs(date.fromisoformat(mef['data_deposito']) - date.fromisoformat(italgiure['data_deposito']))
+    return 0.5 if delta.days <= DATE_TOLERANCE_DAYS else 0.0
+
+
+def score_pair(mef, italgiure):
+    """Punteggio 0-1 tra un record MEF e uno italgiure (solo campi presenti in entrambi)"""
+    similarities = {}
+    if mef['numero'] and italgiure['numero']:
+        if mef['numero'] == italgiure['numero']:
+            similarities['numero'] = 1.0
+        else:
+            similarities['numero'] = 0.5 if numero_close(mef['numero'], italgiure['numero']) else 0.0
+    if mef['anno'] and italgiure['anno']:
+        similarities['anno'] = float(mef['anno'] == italgiure['anno'])
+    if mef['data_deposito'] and italgiure['data_deposito']:
+        similarities['data'] = _data_similarity(mef, italgiure)
+    if mef['sezione'] and italgiure['sezione']:
+        similarities['sezione'] = float(mef['sezione'] == italgiure['sezione'])
+    if mef['tipo'] and italgiure['tipo']:
+        similarities['tipo'] = float(mef['tipo'] == italgiure['tipo'])
+
+    # Senza numero non c'è chiave: nessun collegamento
+    if 'numero' not in similarities:
+        return 0.0
+    total = sum(WEIGHTS[field] for field in similarities)
+    return sum(WEIGHTS[field] * value for field, value in similarities.items()) / total
+
+
+# ==================== INDICE ====================
+
+class RecordLinkage:
+    """Indice di collegamento italgiure ↔ MEF (SQLite)"""
+
+    def __init__(self, db_path=DEFAULT_DB):
+        self.db_path = Path(db_path)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    # ==================== SCRITTURA ====================
+
+    def add_records(self, records):
+        """Inserisce/aggiorna record normalizzati (idempotente)"""
+        self.conn.executemany(
+            """
+            INSERT OR REPLACE INTO records
+                (source, record_id, anno, numero, sezione, data_deposito, data_decisione, tipo, label)
+            VALUES (:source, :record_id, :anno, :numero, :sezione, :data_deposito, :data_decisione, :tipo, :label)
+            """,
+            records
+        )
+        self.conn.commit()
+        return len(records)
+
+    def ingest_italgiure(self, metadata_file):
+        return self.add_records([record_from_italgiure(s) for s in load_sentences(metadata_file)])
+
+    def ingest_mef(self, metadata_file):
+        return self.add_records([record_from_mef(s) for s in load_sentences(metadata_file)])
+
+    def link(self):
+        """
+        Ricalcola tutti i collegamenti (due passate di blocking, assegnazione uno-a-uno)
+
+        Returns:
+            dict: {'match': int, 'review': int, 'numero': int, 'data_sezione': int, 'candidates': int}
+        """
+        stats = {'match': 0, 'review': 0, 'numero': 0, 'data_sezione': 0, 'candidates': 0}
+        linked_mef, linked_italgiure, links = set(), set(), []
+
+        # Passata 1: stesso (anno, numero)
+        rows = self.conn.execute(
+            """
+            SELECT m.*, i.record_id AS i_record_id, i.anno AS i_anno, i.numero AS i_numero,
+                   i.sezione AS i_sezione, i.data_deposito AS i_data_deposito,
+                   i.data_decisione AS i_data_decisione, i.tipo AS i_tipo
+            FROM records m
+            JOIN records i ON i.source = 'italgiure' AND i.anno = m.anno AND i.numero = m.numero
+            WHERE m.source = 'mef'
+            """
+        ).fetchall()
+        self._assign(rows, 'numero', linked_mef, linked_italgiure, links, stats)
+
+        # Passata 2: stesso (data deposito, sezione), numero con una cifra diversa
+        rows = [
+            row for row in self.conn.execute(
+                """
+                SELECT m.*, i.record_id AS i_record_id, i.anno AS i_anno, i.numero AS i_numero,
+                       i.sezione AS i_sezione, i.data_deposito AS i_data_deposito,
+                       i.data_decisione AS i_data_decisione, i.tipo AS i_tipo
+                FROM records m
+                JOIN records i ON i.source = 'italgiure' AND i.data_deposito = m.data_deposito
+                              AND i.sezione = m.sezione
+                WHERE m.source = 'mef' AND m.numero IS NOT NULL AND i.numero IS NOT NULL
+                  AND m.numero != i.numero
+                """
+            )
+            if row['record_id'] not in linked_mef and row['i_record_id'] not in linked_italgiure
+            and numero_close(row['numero'], row['i_numero'])
+        ]
+        self._assign(rows, 'data_sezione', linked_mef, linked_italgiure, links, stats)
+
+        with self.conn:
+            self.conn.execute("DELETE FROM links")
+            self.conn.executemany(
+                "INSERT INTO links (mef_id, italgiure_id, score, metodo, status) VALUES (?, ?, ?, ?, ?)",
+                links
+            )
+        return stats
+
+    @staticmethod
+    def _assign(rows, metodo, linked_mef, linked_italgiure, links, stats):
+        """
+        Greedy per punteggio decrescente: ogni record collegato al più una volta
+
+        Più candidati con lo stesso punteggio migliore (es. numeri consecutivi
+        depositati lo stesso giorno) non danno un match ma solo una review.
+        """
+        candidates = []
+        best = {}
+        for row in rows:
+            mef = {k: row[k] for k in ('numero', 'anno', 'sezione', 'data_deposito', 'tipo')}
+            italgiure = {k: row[f'i_{k}'] for k in ('numero', 'anno', 'sezione', 'data_deposito',
+                                                    'data_decisione', 'tipo')}
+            score = score_pair(mef, italgiure)
+            candidates.append((score, row['record_id'], row['i_record_id']))
+            top, ties = best.get(row['record_id'], (-1.0, 0))
+            best[row['record_id']] = (score, 1) if score > top else (top, ties + (score == top))
+        stats['candidates'] += len(candidates)
+
+        for score, mef_id, italgiure_id in sorted(candidates, reverse=True):
+            if score < REVIEW_THRESHOLD:
+                break
+            if mef_id in linked_mef or italgiure_id in linked_italgiure:
+                continue
+            ambiguous = best[mef_id][1] > 1
+            status = 'match' if score >= MATCH_THRESHOLD and not ambiguous else 'review'
+            links.append((mef_id, italgiure_id, round(score, 4), metodo, status))
+            linked_mef.add(mef_id)
+            linked_italgiure.add(italgiure_id)
+            stats[status] += 1
+            stats[metodo] += 1
+
+    # ==================== QUERY ====================
+
+    def canonical_map(self):
+        """{mef_id: italgiure_id} per i collegamenti certi (status = match)"""
+        return dict(self.conn.execute("SELECT mef_id, italgiure_id FROM links WHERE status = 'match'").fetchall())
+
+    def canonical_id(self, record_id):
+        """ID italgiure se il record MEF è collegato, altrimenti l'ID stesso"""
+        row = self.conn.execute(
+            "SELECT italgiure_id FROM links WHERE mef_id = ? AND status = 'match'", (record_id,)
+        ).fetchone()
+        return row[0] if row else record_id
+
+    def lookup(self, record_id):
+        """Record e collegamento (da ID italgiure o MEF)"""
+        records = [dict(r) for r in self.conn.execute("SELECT * FROM records WHERE record_id = ?", (record_id,))]
+        link = self.conn.execute(
+            "SELECT * FROM links WHERE mef_id = ? OR italgiure_id = ?", (record_id, record_id)
+        ).fetchone()
+        if link:
+            other = link['italgiure_id'] if link['mef_id'] == record_id else link['mef_id']
+            records += [dict(r) for r in self.conn.execute("SELECT * FROM records WHERE record_id = ?", (other,))]
+        return {'records': records, 'link': dict(link) if link else None}
+
+    def links(self, status=None):
+        query = ("SELECT l.*, m.label AS mef_label, i.label AS italgiure_label FROM links l "
+                 "JOIN records m ON m.source = 'mef' AND m.record_id = l.mef_id "
+                 "JOIN records i ON i.source = 'italgiure' AND i.record_id = l.italgiure_id")
+        params = ()
+        if status:
+            query += " WHERE l.status = ?"
+            params = (status,)
+        return [dict(r) for r in self.conn.execute(query + " ORDER BY l.score, l.mef_id", params)]
+
+    def stats(self):
+        records = dict(self.conn.execute("SELECT source, COUNT(*) FROM records GROUP BY source").fetchall())
+        links = dict(self.conn.execute("SELECT status, COUNT(*) FROM links GROUP BY status").fetchall())
+        return {'records': records, 'links': links,
+                'mef_unlinked': records.get('mef', 0) - sum(links.values())}
+
+    def close(self):
+        self.conn.close()
+
+
+# ==================== MERGE ====================
+
+def merge_metadata(linkage, italgiure_files, mef_files, output_file):
+    """
+    Metadata unificati: una voce per decisione
+
+    Le voci italgiure collegate ricevono i campi MEF (massima, entities, ...)
+    in 'mef'; le voci MEF senza collegamento restano come sono.
+    """
+    canonical = linkage.canonical_map()
+
+    italgiure = {}
+    for metadata_file in italgiure_files:
+        for entry in load_sentences(metadata_file):
+            italgiure[entry['id']] = {**italgiure.get(entry['id'], {}), **entry}
+
+    mef_only = []
+    for metadata_file in mef_files:
+        for entry in load_sentences(metadata_file):
+            italgiure_id = canonical.get(entry['id'])
+            if italgiure_id in italgiure:
+                merged = italgiure[italgiure_id]
+                merged['fonti'] = ['italgiure', 'mef']
+                merged['mef'] = {k: entry[k] for k in MEF_MERGE_FIELDS if k in entry}
+            else:
+                mef_only.append(dict(entry, fonti=['mef']))
+
+    sentences = [dict(entry, fonti=entry.get('fonti', ['italgiure'])) for entry in italgiure.values()] + mef_only
+    linked = sum(1 for entry in italgiure.values() if 'mef' in entry)
+
+    output = {
+        'metadata': {
+            'generated_at': datetime.now().isoformat(),
+            'total_sentences': len(sentences),
+            'linked': linked,
+            'source': 'italgiure.giustizia.it + def.finanze.it',
+        },
+        'sentences': sentences
+    }
+    Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+
+    return {'sentences': len(sentences), 'linked': linked, 'mef_only': len(mef_only)}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="RECORD LINKAGE - Stesse decisioni da italgiure e MEF"
+    )
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"Database linkage (default: {DEFAULT_DB})")
+    subparsers = parser.add_subparsers(dest='command', help='Comando da eseguire')
+
+    build_parser = subparsers.add_parser('build', help='Importa metadata e ricalcola i collegamenti')
+    build_parser.add_argument("--italgiure", nargs='*', default=[],
+                              help="Metadata italgiure (metadata_cassazione*.json, _all_sentenze.json)")
+    build_parser.add_argument("--mef", nargs='*', default=[], help="Metadata MEF (metadata_mef_*.json, da step 2)")
+
+    lookup_parser = subparsers.add_parser('lookup', help='Record e collegamento di un ID')
+    lookup_parser.add_argument("record_id", help="ID italgiure o MEF (es: mef2022538131S)")
+
+    links_parser = subparsers.add_parser('links', help='Elenco collegamenti')
+    links_parser.add_argument("--status", choices=['match', 'review'], default=None)
+
+    merge_parser = subparsers.add_parser('merge', help='Metadata unificati (una voce per decisione)')
+    merge_parser.add_argument("--italgiure", nargs='+', required=True, help="Metadata italgiure")
+    merge_parser.add_argument("--mef", nargs='+', required=True, help="Metadata MEF")
+    merge_parser.add_argument("--output", default="metadata/metadata_unificati.json", help="File output")
+
+    subparsers.add_parser('stats', help='Statistiche')
+
+    args = parser.parse_args()
+
+    if args.command is None:
+        parser.print_help()
+        return
+
+    linkage = RecordLinkage(args.db)
+    start = time.perf_counter()
+
+    if args.command == 'build':
+        print("🔗 RECORD LINKAGE - italgiure ↔ MEF")
+        print("="*70)
+        for metadata_file in args.italgiure:
+            print(f"✓ {metadata_file}: {linkage.ingest_italgiure(metadata_file)} record italgiure")
+        for metadata_file in args.mef:
+            print(f"✓ {metadata_file}: {linkage.ingest_mef(metadata_file)} record MEF")
+        stats = linkage.link()
+        elapsed = time.perf_counter() - start
+        print(f"\n✅ {stats['match']} match, {stats['review']} da controllare "
+              f"({stats['candidates']} candidati, {elapsed:.2f} s)")
+        print(f"   Blocco (anno, numero): {stats['numero']}")
+        print(f"   Blocco (data deposito, sezione): {stats['data_sezione']}")
+
+    elif args.command == 'lookup':
+        result = linkage.lookup(args.record_id)
+        if not result['records']:
+            print(f"✗ Record non trovato: {args.record_id}")
+        else:
+            for record in result['records']:
+                print(f"📄 {record['source']:<9} {record['record_id']}  sez. {record['sezione']} "
+                      f"n. {record['numero']}/{record['anno']} dep. {record['data_deposito']}  {record['label']}")
+            link = result['link']
+            if link:
+                print(f"\n🔗 {link['status']} ({link['score']:.2f}, blocco {link['metodo']})")
+            else:
+                print("\n⊘ Nessun collegamento")
+
+    elif args.command == 'links':
+        for link in linkage.links(args.status):
+            print(f"{link['score']:.2f} {link['status']:<6} {link['mef_id']} → {link['italgiure_id']}  "
+                  f"{link['mef_label'][:60]}")
+
+    elif args.command == 'merge':
+        stats = merge_metadata(linkage, args.italgiure, args.mef, args.output)
+        print(f"✅ {stats['sentences']} decisioni ({stats['linked']} italgiure + MEF, "
+              f"{stats['mef_only']} solo MEF) → {args.output}")
+
+    elif args.command == 'stats':
+        stats = linkage.stats()
+        print(f"📊 Record: {stats['records']}")
+        print(f"📊 Collegamenti: {stats['links']}")
+        print(f"📊 MEF senza collegamento: {stats['mef_unlinked']}")
+
+    linkage.close()
+
+
+if __name__ == "__main__":
+    main()
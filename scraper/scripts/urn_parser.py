@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+URN PARSER - Parsing URN doctrib condiviso (MEF step 2, 3, 4)
+
+Le stesse URN normative (es. urn:doctrib::DLG:1995;504_art7) ricorrono
+migliaia di volte tra le sentenze: pattern precompilati e risultati
+memoizzati (lru_cache) per URN, più la chiave canonica usata per aggregare
+normative e precedenti.
+
+Formati:
+  urn:doctrib::DLG:1995;504_art7-com2  -> normativa
+  urn:doctrib:CCO:SEN:2020;142         -> giurisprudenza
+
+Benchmark:
+  python3 scraper/scripts/urn_parser.py --size 200000
+"""
+
+import re
+import argparse
+from functools import lru_cache
+
+URN_PREFIX = 'urn:doctrib'
+CACHE_SIZE = 65536
+
+# ==================== PATTERN ====================
+
+NORMATIVA_KIND_PATTERN = re.compile(r'::([A-Z]+):')
+YEAR_NUMBER_PATTERN = re.compile(r':(\d{4});(\d+)')
+ARTICLE_PATTERN = re.compile(r'_art(\d+)')
+COMMA_PATTERN = re.compile(r'-com(\d+)')
+
+
+# ==================== PARSING ====================
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_cached(urn):
+    """Parsing effettivo (risultato condiviso nella cache: non modificarlo)"""
+    parsed = {'raw_urn': urn}
+
+    if not urn.startswith(URN_PREFIX):
+        return parsed
+
+    # Normativa: urn:doctrib::KIND:YEAR;NUMBER_artXX-comYY
+    if '::' in urn:
+        parsed['type'] = 'normativa'
+
+        kind_match = NORMATIVA_KIND_PATTERN.search(urn)
+        if kind_match:
+            parsed['kind'] = kind_match.group(1)
+
+        year_num_match = YEAR_NUMBER_PATTERN.search(urn)
+        if year_num_match:
+            parsed['year'] = int(year_num_match.group(1))
+            parsed['number'] = int(year_num_match.group(2))
+
+        art_match = ARTICLE_PATTERN.search(urn)
+        if art_match:
+            parsed['article'] = int(art_match.group(1))
+
+        com_match = COMMA_PATTERN.search(urn)
+        if com_match:
+            parsed['comma'] = int(com_match.group(1))
+
+    # Giurisprudenza: urn:doctrib:COURT:KIND:YEAR;NUMBER
+    elif ':' in urn:
+        parsed['type'] = 'giurisprudenza'
+
+        parts = urn.split(':')
+        if len(parts) >= 4:
+            parsed['court'] = parts[2]  # CCO, CTR, CTP, ecc.
+            parsed['kind'] = parts[3].split(';')[0]  # SEN, ORD, ecc.
+
+            # Anno e numero sono nell'ultimo segmento (YEAR;NUMBER)
+            year_num_match = YEAR_NUMBER_PATTERN.search(urn)
+            if year_num_match:
+                parsed['year'] = int(year_num_match.group(1))
+                parsed['number'] = int(year_num_match.group(2))
+
+    return parsed
+
+
+def parse_urn(urn):
+    """
+    Parse URN per estrarre info strutturate (memoizzato)
+
+    Esempi:
+      urn:doctrib::DLG:1995;504_art7 -> {'type': 'normativa', 'kind': 'DLG', 'year': 1995, 'number': 504, 'article': 7}
+      urn:doctrib:CCO:SEN:2020;142 -> {'type': 'giurisprudenza', 'court': 'CCO', 'kind': 'SEN', 'year': 2020, 'number': 142}
+
+    Returns:
+        dict: copia del risultato in cache (il chiamante può modificarla)
+    """
+    return dict(_parse_cached(urn))
+
+
+def cache_info():
+    """Statistiche della cache (hits, misses, currsize)"""
+    return _parse_cached.cache_info()
+
+
+# ==================== CHIAVE CANONICA ====================
+
+def normativa_key(parsed):
+    """
+    Chiave univoca per normativa
+
+    Es: "DLG_1995_504" o "DLG_1995_504_art7"
+    """
+    kind = parsed.get('kind', 'UNK')
+    year = parsed.get('year', '0')
+    number = parsed.get('number', '0')
+    article = parsed.get('article', '')
+
+    if article:
+        return f"{kind}_{year}_{number}_art{article}"
+    else:
+        return f"{kind}_{year}_{number}"
+
+
+def giurisprudenza_key(parsed):
+    """
+    Chiave univoca per giurisprudenza
+
+    Es: "CCO_SEN_2020_142"
+    """
+    court = parsed.get('court', 'UNK')
+    kind = parsed.get('kind', 'UNK')
+    year = parsed.get('year', '0')
+    number = parsed.get('number', '0')
+
+    return f"{court}_{kind}_{year}_{number}"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def urn_key(urn):
+    """Chiave canonica di una URN (None se non è normativa né giurisprudenza)"""
+    parsed = _parse_cached(urn)
+    etype = parsed.get('type')
+    if etype == 'normativa':
+        return normativa_key(parsed)
+    if etype == 'giurisprudenza':
+        return giurisprudenza_key(parsed)
+    return None
+
+
+def canonical_key(entity):
+    """
+    Chiave canonica di un'entity di step 2
+
+    Se c'è l'URN la chiave viene ricalcolata da lì (memoizzata), così anche i
+    metadata scaricati prima della correzione anno/numero dei precedenti
+    producono le stesse chiavi; altrimenti si usa il parsed salvato.
+    """
+    urn = entity.get('urn')
+    if urn and urn.startswith(URN_PREFIX):
+        return urn_key(urn)
+
+    parsed = entity.get('parsed', {})
+    if entity.get('type') == 'normativa':
+        return normativa_key(parsed)
+    if entity.get('type') == 'giurisprudenza':
+        return giurisprudenza_key(parsed)
+    return None
+
+
+# ==================== BENCHMARK ====================
+
+def _legacy_parse_urn(urn):
+    """Parsing precedente di mef_2 (regex non compilate, solo per il benchmark)"""
+    parsed = {'raw_urn': urn}
+
+    try:
+        if not urn.startswith('urn:doctrib'):
+            return parsed
+
+        if '::' in urn:
+            parsed['type'] = 'normativa'
+
+            kind_match = re.search(r'::([A-Z]+):', urn)
+            if kind_match:
+                parsed['kind'] = kind_match.group(1)
+
+            year_num_match = re.search(r':(\d{4});(\d+)', urn)
+            if year_num_match:
+                parsed['year'] = int(year_num_match.group(1))
+                parsed['number'] = int(year_num_match.group(2))
+
+            art_match = re.search(r'_art(\d+)', urn)
+            if art_match:
+                parsed['article'] = int(art_match.group(1))
+
+            com_match = re.search(r'-com(\d+)', urn)
+            if com_match:
+                parsed['comma'] = int(com_match.group(1))
+
+        elif ':' in urn and '::' not in urn:
+            parsed['type'] = 'giurisprudenza'
+
+            parts = urn.split(':')
+            if len(parts) >= 4:
+                parsed['court'] = parts[2]
+                parsed['kind'] = parts[3].split(';')[0]
+
+                year_num = parts[3]
+                year_num_match = re.search(r':(\d{4});(\d+)', year_num)
+                if year_num_match:
+                    parsed['year'] = int(year_num_match.group(1))
+                    parsed['number'] = int(year_num_match.group(2))
+
+    except Exception as e:
+        pass
+
+    return parsed
+
+
+# Atti tributari più citati (kind, anno, numero, articoli frequenti)
+_BENCH_ACTS = [
+    ('DPR', 1973, 600, [32, 36, 37, 38, 39, 41, 42, 43]),
+    ('DPR', 1972, 633, [17, 19, 21, 52, 54, 55, 57]),
+    ('DLG', 1992, 546, [2, 7, 12, 19, 21, 36, 53, 62]),
+    ('DLG', 1997, 472, [6, 7, 12, 16]),
+    ('DLG', 1997, 471, [1, 5, 6, 13]),
+    ('DPR', 1986, 917, [9, 51, 109]),
+    ('L', 2000, 212, [6, 7, 10, 12]),
+    ('DLG', 1995, 504, [2, 7, 8]),
+    ('DPR', 1990, 131, [20, 52]),
+    ('DL', 2006, 223, [35]),
+]
+_BENCH_COURTS = [('CASS', 'SEN'), ('CASS', 'ORD'), ('CCO', 'SEN'), ('CCO', 'ORD'), ('CTR', 'SEN'), ('CTP', 'SEN')]
+
+
+def build_bench_corpus(size=200000, seed=42):
+    """
+    Corpus URN realistico: normative con distribuzione Zipf sugli atti e
+    sugli articoli (poche URN ripetute molto), precedenti quasi tutti distinti
+    """
+    import random
+
+    rng = random.Random(seed)
+    act_weights = [1 / (rank + 1) for rank in range(len(_BENCH_ACTS))]
+    corpus = []
+
+    for _ in range(size):
+        if rng.random() < 0.75:
+            kind, year, number, articles = rng.choices(_BENCH_ACTS, weights=act_weights)[0]
+            urn = f"urn:doctrib::{kind}:{year};{number}"
+            if rng.random() < 0.85:
+                urn += f"_art{rng.choices(articles, weights=[1 / (i + 1) for i in range(len(articles))])[0]}"
+                if rng.random() < 0.4:
+                    urn += f"-com{rng.randint(1, 6)}"
+        else:
+            court, kind = rng.choice(_BENCH_COURTS)
+            urn = f"urn:doctrib:{court}:{kind}:{rng.randint(1990, 2025)};{rng.randint(1, 30000)}"
+        corpus.append(urn)
+
+    return corpus
+
+
+def benchmark(size=200000, repeat=3):
+    """
+    Micro-benchmark: parsing precedente vs parse_urn memoizzato
+
+    Riporta anche le differenze di output: sulle normative devono essere 0,
+    sui precedenti il parsing precedente non estraeva mai anno e numero.
+    """
+    import timeit
+
+    corpus = build_bench_corpus(size)
+    distinct = len(set(corpus))
+
+    normativa_mismatches = 0
+    giurisprudenza_fixed = 0
+    for urn in set(corpus):
+        old, new = _legacy_parse_urn(urn), parse_urn(urn)
+        if new.get('type') == 'normativa':
+            normativa_mismatches += old != new
+        elif 'year' in new and 'year' not in old:
+            giurisprudenza_fixed += 1
+
+    legacy = min(timeit.repeat(lambda: [_legacy_parse_urn(u) for u in corpus], number=1, repeat=repeat))
+
+    def cold():
+        _parse_cached.cache_clear()
+        urn_key.cache_clear()
+        return [parse_urn(u) for u in corpus]
+
+    memoized = min(timeit.repeat(cold, number=1, repeat=repeat))
+    info = cache_info()
+    keys = min(timeit.repeat(lambda: [urn_key(u) for u in corpus], number=1, repeat=repeat))
+
+    return {
+        'urns': len(corpus),
+        'distinct': distinct,
+        'normativa_mismatches': normativa_mismatches,
+        'giurisprudenza_fixed': giurisprudenza_fixed,
+        'legacy_us': legacy / len(corpus) * 1e6,
+        'memoized_us': memoized / len(corpus) * 1e6,
+        'key_us': keys / len(corpus) * 1e6,
+        'hit_rate': info.hits / (info.hits + info.misses) if info.hits + info.misses else 0,
+        'speedup': legacy / memoized if memoized else 0,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="URN Parser - micro-benchmark")
+    parser.add_argument("--size", type=int, default=200000, help="URN nel corpus sintetico (default: 200000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Ripetizioni (default: 3)")
+    args = parser.parse_args()
+
+    stats = benchmark(args.size, args.repeat)
+
+    print("="*80)
+    print("URN PARSER - Benchmark")
+    print("="*80)
+    print(f"URN:                      {stats['urns']:,} ({stats['distinct']:,} distinte)")
+    print(f"Differenze normative:     {stats['normativa_mismatches']}")
+    print(f"Precedenti corretti:      {stats['giurisprudenza_fixed']:,} (anno/numero ora estratti)")
+    print(f"Regex non compilate:      {stats['legacy_us']:.2f} µs/URN")
+    print(f"Compilato + memoizzato:   {stats['memoized_us']:.2f} µs/URN (hit rate {stats['hit_rate']:.1%})")
+    print(f"Solo chiave canonica:     {stats['key_us']:.2f} µs/URN")
+    print(f"Speedup:                  {stats['speedup']:.1f}x")
+    print("="*80)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Akoma Ntoso Export - Step 3 Batch
+Esporta le sentenze di un anno in un unico archivio ZIP (un membro XML per
+sentenza) invece di migliaia di file in akoma_ntoso/.
+
+- Una sentenza alla volta: l'XML è generato in memoria e scritto nel membro
+  ZIP solo se completo (nessun membro parziale in caso di errore)
+- Accesso diretto per ID sentenza (directory centrale ZIP + _index.json)
+- Validazione XSD opzionale in parallelo su più processi
+"""
+
+import io
+import json
+import zipfile
+import argparse
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+from akoma_ntoso_generator import AkomaNtosoGenerator
+
+INDEX_MEMBER = '_index.json'
+
+
+def member_name(sentenza_id: str) -> str:
+    """Nome membro ZIP per una sentenza"""
+    return f"{sentenza_id}_akoma_ntoso.xml"
+
+
+def load_year_items(year: str, metadata_dir: Path, txt_dir: Path, entities_dir: Path) -> List:
+    """
+    Sentenze di un anno con TXT ed entities disponibili
+
+    Returns:
+        Lista di (txt_path, entities_path, sentenza_id)
+    """
+    json_path = metadata_dir / f"metadata_cassazione_{year}.json"
+    if not json_path.exists():
+        print(f"✗ JSON non trovato: {json_path}")
+        return []
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        sentences = json.load(f).get('sentences', [])
+
+    items = []
+    missing = 0
+    for sentence in sentences:
+        sentenza_id = sentence['id']
+        txt_path = txt_dir / f"{sentenza_id}.txt"
+        entities_path = entities_dir / f"{sentenza_id}_entities.json"
+
+        if txt_path.exists() and entities_path.exists():
+            items.append((txt_path, entities_path, sentenza_id))
+        else:
+            missing += 1
+
+    print(f"📊 Sentenze anno {year}: {len(sentences)} ({missing} senza TXT/entities)")
+    return items
+
+
+def export_collection(items: List, output_path: Path, compresslevel: int = 6) -> Dict:
+    """
+    Scrive le sentenze in un archivio ZIP, una alla volta
+
+    Args:
+        items: Lista di (txt_path, entities_path, sentenza_id)
+        output_path: File .zip di output
+        compresslevel: Livello deflate (0-9)
+
+    Returns:
+        Statistiche export
+    """
+    generator = AkomaNtosoGenerator()
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    index = {}
+    errors = 0
+
+    with zipfile.ZipFile(output_path, 'w', compression=zipfile.ZIP_DEFLATED,
+                         compresslevel=compresslevel) as zf:
+        for i, (txt_path, entities_path, sentenza_id) in enumerate(items, 1):
+            name = member_name(sentenza_id)
+            try:
+                buffer = io.BytesIO()
+                generator.stream_xml(txt_path, entities_path, sentenza_id, buffer)
+                zf.writestr(name, buffer.getvalue())
+                index[sentenza_id] = name
+            except Exception as e:
+                print(f"   ✗ {sentenza_id}: {e}")
+                errors += 1
+
+            if i % 100 == 0 or i == len(items):
+                print(f"   [{i}/{len(items)}] sentenze esportate...")
+
+        zf.writestr(INDEX_MEMBER, json.dumps({
+            'generated_at': datetime.now().isoformat(),
+            'total': len(index),
+            'members': index
+        }, ensure_ascii=False))
+
+    return {
+        'exported': len(index),
+        'errors': errors,
+        'output_file': str(output_path),
+        'file_size': output_path.stat().st_size
+    }
+
+
+def read_from_collection(archive_path: Path, sentenza_id: str) -> bytes:
+    """XML di una singola sentenza (accesso diretto, senza estrarre l'archivio)"""
+    with zipfile.ZipFile(archive_path) as zf:
+        return zf.read(member_name(sentenza_id))
+
+
+def _validate_members(archive_path: str, xsd_path: str, names: List[str]) -> List[Dict]:
+    """Worker: valida un gruppo di membri contro lo schema XSD"""
+    from lxml import etree
+
+    schema = etree.XMLSchema(etree.parse(xsd_path))
+    results = []
+
+    with zipfile.ZipFile(archive_path) as zf:
+        for name in names:
+            try:
+                with zf.open(name) as member:
+                    doc = etree.parse(member)
+            except etree.XMLSyntaxError as e:
+                # Stringa, non l'error log lxml (non serializzabile verso il processo padre)
+                results.append({'member': name, 'valid': False, 'errors': [str(e)]})
+                continue
+            valid = schema.validate(doc)
+            results.append({
+                'member': name,
+                'valid': valid,
+                'errors': [str(err) for err in schema.error_log][:5] if not valid else []
+            })
+
+    return results
+
+
+def validate_collection(archive_path: Path, xsd_path: Path, workers: int = 4,
+                        batch_size: int = 200) -> Dict:
+    """
+    Validazione XSD dei membri dell'archivio su più processi
+
+    Args:
+        archive_path: Archivio ZIP
+        xsd_path: Schema Akoma Ntoso (akomantoso30.xsd)
+        workers: Processi paralleli
+        batch_size: Membri per task
+
+    Returns:
+        Statistiche validazione con elenco invalidi
+    """
+    with zipfile.ZipFile(archive_path) as zf:
+        names = [n for n in zf.namelist() if n != INDEX_MEMBER]
+
+    print(f"🔎 Validazione XSD: {len(names)} documenti ({workers} processi)")
+
+    invalid = []
+    checked = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_validate_members, str(archive_path), str(xsd_path), names[i:i + batch_size])
+            for i in range(0, len(names), batch_size)
+        ]
+        for future in as_completed(futures):
+            for result in future.result():
+                checked += 1
+                if not result['valid']:
+                    invalid.append(result)
+            print(f"   [{checked}/{len(names)}] validati...")
+
+    return {
+        'checked': checked,
+        'valid': checked - len(invalid),
+        'invalid': invalid
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="STEP 3 Batch: Export Akoma Ntoso per anno in un archivio ZIP"
+    )
+    subparsers = parser.add_subparsers(dest='command', help='Comando da eseguire')
+
+    export_parser = subparsers.add_parser('export', help='Esporta un anno')
+    export_parser.add_argument("--year", type=str, required=True, help="Anno da esportare (es: 2020)")
+    export_parser.add_argument("--metadata-dir", type=str, default="metadata", help="Directory metadata JSON (default: metadata)")
+    export_parser.add_argument("--txt-dir", type=str, default="txt", help="Directory TXT (default: txt)")
+    export_parser.add_argument("--entities-dir", type=str, default="entities", help="Directory entities (default: entities)")
+    export_parser.add_argument("--output-dir", type=str, default="akoma_ntoso", help="Directory output (default: akoma_ntoso)")
+    export_parser.add_argument("--xsd", type=str, default=None, help="Schema XSD per validazione (opzionale)")
+    export_parser.add_argument("--workers", type=int, default=4, help="Processi per validazione (default: 4)")
+
+    get_parser = subparsers.add_parser('get', help='Estrae una sentenza dall\'archivio')
+    get_parser.add_argument("--archive", type=str, required=True, help="Archivio ZIP")
+    get_parser.add_argument("--id", type=str, required=True, help="ID sentenza")
+
+    validate_parser = subparsers.add_parser('validate', help='Valida un archivio esistente')
+    validate_parser.add_argument("--archive", type=str, required=True, help="Archivio ZIP")
+    validate_parser.add_argument("--xsd", type=str, required=True, help="Schema XSD")
+    validate_parser.add_argument("--workers", type=int, default=4, help="Processi paralleli (default: 4)")
+
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        items = load_year_items(args.year, Path(args.metadata_dir), Path(args.txt_dir), Path(args.entities_dir))
+        if not items:
+            print("✗ Nessuna sentenza da esportare")
+            return
+
+        output_path = Path(args.output_dir) / f"{args.year}_akoma_ntoso.zip"
+        print(f"📦 Export: {output_path}")
+        stats = export_collection(items, output_path)
+
+        print(f"\n✅ Export completato!")
+        print(f"📊 Sentenze: {stats['exported']} (errori: {stats['errors']})")
+        print(f"💾 Dimensione: {stats['file_size'] / 1024 / 1024:.2f} MB")
+
+        if args.xsd:
+            result = validate_collection(output_path, Path(args.xsd), workers=args.workers)
+            print(f"✓ Validi: {result['valid']}/{result['checked']}")
+            for item in result['invalid'][:10]:
+                print(f"   ✗ {item['member']}: {item['errors'][:1]}")
+
+    elif args.command == 'get':
+        print(read_from_collection(Path(args.archive), args.id).decode('utf-8'))
+
+    elif args.command == 'validate':
+        result = validate_collection(Path(args.archive), Path(args.xsd), workers=args.workers)
+        print(f"\n✓ Validi: {result['valid']}/{result['checked']}")
+        for item in result['invalid'][:10]:
+            print(f"   ✗ {item['member']}: {item['errors'][:1]}")
+
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
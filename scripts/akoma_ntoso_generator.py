@@ -11,6 +11,9 @@ from datetime import datetime
 from lxml import etree
 from typing import Dict, List, Optional
 
+from section_segmenter import segment_sections, section_text
+from header_parser import HeaderMetadata, parse_header
+
 class AkomaNtosoGenerator:
     """Genera Akoma Ntoso XML da sentenza estratta + entities"""
 
@@ -18,7 +21,9 @@ class AkomaNtosoGenerator:
         self.ns = "http://docs.oasis-open.org/legaldocml/ns/akn/3.0"
         self.nsmap = {None: self.ns}
 
-    def generate(self, txt_path: Path, entities_path: Path, sentenza_id: str) -> etree.Element:
+    def generate(self, txt_path: Path, entities_path: Path, sentenza_id: str,
+                 sections: Optional[Dict] = None,
+                 header: Optional[HeaderMetadata] = None) -> etree.Element:
         """
         Genera documento Akoma Ntoso completo
 
@@ -26,6 +31,8 @@ class AkomaNtosoGenerator:
             txt_path: Path al TXT estratto
             entities_path: Path al JSON entities
             sentenza_id: ID sentenza (es: snciv2025530039O)
+            sections: Span da segment_sections (calcolati qui se assenti)
+            header: Metadata da parse_header (calcolati qui se assenti)
 
         Returns:
             XML Element root
@@ -38,7 +45,7 @@ class AkomaNtosoGenerator:
             entities_data = json.load(f)
 
         # Estrai metadata dal testo
-        metadata = self._extract_metadata(text, sentenza_id)
+        metadata = self._extract_metadata(text, sentenza_id, header)
 
         # Costruisci XML
         root = etree.Element("{%s}akomaNtoso" % self.ns, nsmap=self.nsmap)
@@ -51,63 +58,22 @@ class AkomaNtosoGenerator:
         header = self._build_header(judgment, metadata, entities_data)
 
         # 3. Judgment Body
-        body = self._build_body(judgment, text, metadata)
+        body = self._build_body(judgment, text, metadata, sections)
 
         # 4. Conclusions
         conclusions = self._build_conclusions(judgment, metadata)
 
         return root
 
-    def _extract_metadata(self, text: str, sentenza_id: str) -> Dict:
+    def _extract_metadata(self, text: str, sentenza_id: str,
+                          header: Optional[HeaderMetadata] = None) -> Dict:
         """Estrae metadata dalla prima parte del testo"""
 
-        metadata = {'id': sentenza_id}
+        # Header parsing (prime righe), condiviso con markdown_generator
+        header = header or parse_header(text)
 
-        # Header parsing (prime righe)
-        lines = text.split('\n')
-
-        for line in lines[:20]:
-            # Sezione
-            if 'Sez.' in line:
-                match = re.search(r'Sez\.\s+(\d+|[A-Z]+)', line)
-                if match:
-                    metadata['sezione'] = match.group(1)
-
-            # Numero sentenza
-            if 'Num.' in line:
-                match = re.search(r'Num\.\s+(\d+)', line)
-                if match:
-                    metadata['numero'] = match.group(1)
-
-            # Anno
-            if 'Anno' in line:
-                match = re.search(r'Anno\s+(\d{4})', line)
-                if match:
-                    metadata['anno'] = match.group(1)
-
-            # Presidente
-            if 'Presidente:' in line:
-                metadata['presidente'] = line.split('Presidente:')[1].strip()
-
-            # Relatore
-            if 'Relatore:' in line:
-                metadata['relatore'] = line.split('Relatore:')[1].strip()
-
-            # Data pubblicazione
-            if 'Data pubblicazione:' in line or 'del' in line:
-                match = re.search(r'(\d{1,2}/\d{1,2}/\d{4})', line)
-                if match:
-                    metadata['data_pubblicazione'] = match.group(1)
-
-            # Registro
-            if 'Registro:' in line or 'R.G.' in line:
-                match = re.search(r'n\.\s*([\d/]+)', line)
-                if match:
-                    metadata['registro'] = match.group(1)
-
-            # Oggetto
-            if 'Oggetto:' in line:
-                metadata['oggetto'] = line.split('Oggetto:')[1].strip()
+        metadata = {'id': sentenza_id}
+        metadata.update(header.to_dict())
 
         # Determina tipo archivio da ID
         if sentenza_id.startswith('snciv'):
@@ -250,13 +216,14 @@ class AkomaNtosoGenerator:
 
         return header
 
-    def _build_body(self, parent: etree.Element, text: str, metadata: Dict) -> etree.Element:
+    def _build_body(self, parent: etree.Element, text: str, metadata: Dict,
+                    sections: Optional[Dict] = None) -> etree.Element:
         """Costruisce <judgmentBody>"""
 
         body = etree.SubElement(parent, "{%s}judgmentBody" % self.ns)
 
-        # Dividi testo in sezioni (euristica semplice)
-        sections = self._split_sections(text)
+        # Dividi testo in sezioni
+        sections = self._split_sections(text, sections)
 
         # Introduction (fatti)
         if 'fatti' in sections:
@@ -302,28 +269,19 @@ class AkomaNtosoGenerator:
 
         return conclusions
 
-    def _split_sections(self, text: str) -> Dict[str, str]:
-        """Divide testo in sezioni (euristica base)"""
-
-        sections = {}
+    def _split_sections(self, text: str, sections: Optional[Dict] = None) -> Dict[str, str]:
+        """Testo delle sezioni fatti / motivazione / decisione (da section_segmenter)"""
 
-        # Cerca marker comuni
-        if 'FATTI DI CAUSA' in text:
-            start = text.find('FATTI DI CAUSA')
-            end = text.find('P.Q.M.', start) if 'P.Q.M.' in text[start:] else len(text)
-            sections['fatti'] = text[start:end].strip()
+        if sections is None:
+            sections = segment_sections(text)
 
-        if 'MOTIVI DELLA DECISIONE' in text or 'RAGIONI DELLA DECISIONE' in text:
-            marker = 'MOTIVI DELLA DECISIONE' if 'MOTIVI DELLA DECISIONE' in text else 'RAGIONI DELLA DECISIONE'
-            start = text.find(marker)
-            end = text.find('P.Q.M.', start) if 'P.Q.M.' in text[start:] else len(text)
-            sections['motivazione'] = text[start:end].strip()
+        names = {'fatti': 'fatti', 'motivazione': 'motivazione', 'dispositivo': 'decisione'}
 
-        if 'P.Q.M.' in text:
-            start = text.find('P.Q.M.')
-            sections['decisione'] = text[start:].strip()
-
-        return sections
+        return {
+            name: section_text(text, sections[key])
+            for key, name in names.items()
+            if key in sections
+        }
 
     def _format_date(self, date_str: str) -> str:
         """Converte data italiana (DD/MM/YYYY) in ISO (YYYY-MM-DD)"""
@@ -357,18 +315,155 @@ class AkomaNtosoGenerator:
         print(f"✓ Salvato: {output_path}")
 
 
+    # ------------------------------------------------------------------
+    # Modalità streaming (etree.xmlfile): nessun albero completo in memoria
+    # ------------------------------------------------------------------
+
+    def _write_section(self, xf, builder, *args):
+        """
+        Costruisce una singola sezione e la scrive subito nello stream
+
+        I builder aggiungono la sezione come SubElement: si usa un
+        <judgment> temporaneo come contenitore, eliminato dopo la scrittura.
+        """
+        holder = etree.Element("{%s}judgment" % self.ns, nsmap=self.nsmap)
+        section = builder(holder, *args)
+        xf.write(section, pretty_print=True)
+        xf.flush()
+
+    def write_judgment(self, xf, text: str, entities_data: Dict, sentenza_id: str,
+                       sections: Optional[Dict] = None,
+                       header: Optional[HeaderMetadata] = None):
+        """
+        Scrive <judgment> in un etree.xmlfile aperto, sezione per sezione
+
+        Args:
+            xf: Contesto etree.xmlfile
+            text: Testo sentenza
+            entities_data: Entities JSON
+            sentenza_id: ID sentenza
+            sections: Span da segment_sections (opzionale)
+            header: Metadata da parse_header (opzionale)
+        """
+        metadata = self._extract_metadata(text, sentenza_id, header)
+
+        with xf.element("{%s}judgment" % self.ns, name="sentenza"):
+            self._write_section(xf, self._build_meta, metadata, entities_data)
+            self._write_section(xf, self._build_header, metadata, entities_data)
+            self._write_section(xf, self._build_body, text, metadata, sections)
+            self._write_section(xf, self._build_conclusions, metadata)
+
+    def stream_xml(self, txt_path: Path, entities_path: Path, sentenza_id: str,
+                   output, sections: Optional[Dict] = None,
+                   header: Optional[HeaderMetadata] = None):
+        """
+        Genera e scrive Akoma Ntoso in streaming (equivalente a generate + save_xml)
+
+        Args:
+            txt_path: Path al TXT estratto
+            entities_path: Path al JSON entities
+            sentenza_id: ID sentenza
+            output: Path o file binario aperto in scrittura
+            sections: Span da segment_sections (opzionale)
+            header: Metadata da parse_header (opzionale)
+        """
+        with open(txt_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+
+        with open(entities_path, 'r', encoding='utf-8') as f:
+            entities_data = json.load(f)
+
+        with etree.xmlfile(str(output) if isinstance(output, Path) else output, encoding='UTF-8') as xf:
+            xf.write_declaration()
+            with xf.element("{%s}akomaNtoso" % self.ns, nsmap=self.nsmap):
+                self.write_judgment(xf, text, entities_data, sentenza_id, sections, header)
+
+    def stream_collection(self, items, output, name: str = "raccolta") -> int:
+        """
+        Scrive molte sentenze in un unico <documentCollection> in streaming
+
+        Ogni sentenza diventa un <component>: viene letta, scritta e
+        rilasciata prima di passare alla successiva, quindi la memoria resta
+        costante qualunque sia il numero (o la lunghezza) delle sentenze.
+
+        Args:
+            items: Iterabile di (txt_path, entities_path, sentenza_id)
+            output: Path o file binario aperto in scrittura
+            name: Nome della raccolta (es. anno)
+
+        Returns:
+            Numero di sentenze scritte
+        """
+        count = 0
+
+        with etree.xmlfile(str(output) if isinstance(output, Path) else output, encoding='UTF-8') as xf:
+            xf.write_declaration()
+            with xf.element("{%s}akomaNtoso" % self.ns, nsmap=self.nsmap):
+                with xf.element("{%s}documentCollection" % self.ns, name=name):
+                    self._write_section(xf, self._build_collection_meta, name)
+
+                    with xf.element("{%s}collectionBody" % self.ns):
+                        for txt_path, entities_path, sentenza_id in items:
+                            with open(txt_path, 'r', encoding='utf-8') as f:
+                                text = f.read()
+                            with open(entities_path, 'r', encoding='utf-8') as f:
+                                entities_data = json.load(f)
+
+                            with xf.element("{%s}component" % self.ns, eId=f"cmp_{sentenza_id}"):
+                                self.write_judgment(xf, text, entities_data, sentenza_id)
+                            count += 1
+
+        return count
+
+    def _build_collection_meta(self, parent: etree.Element, name: str) -> etree.Element:
+        """<meta> minimale della raccolta"""
+
+        meta = etree.SubElement(parent, "{%s}meta" % self.ns)
+        identification = etree.SubElement(meta, "{%s}identification" % self.ns, source="#source")
+        FRBRWork = etree.SubElement(identification, "{%s}FRBRWork" % self.ns)
+
+        work_uri = f"/akn/it/documentCollection/cassazione/{name}/ita@"
+
+        etree.SubElement(FRBRWork, "{%s}FRBRthis" % self.ns, value=work_uri)
+        etree.SubElement(FRBRWork, "{%s}FRBRuri" % self.ns, value=work_uri)
+        etree.SubElement(FRBRWork, "{%s}FRBRdate" % self.ns,
+                        date=datetime.now().strftime('%Y-%m-%d'),
+                        name="generazione")
+        etree.SubElement(FRBRWork, "{%s}FRBRauthor" % self.ns, href="#cassazione")
+        etree.SubElement(FRBRWork, "{%s}FRBRcountry" % self.ns, value="it")
+
+        return meta
+
+
 def process_sentenza_akoma_ntoso(txt_path: Path, entities_path: Path,
-                                  sentenza_id: str, output_dir: Path) -> Dict:
+                                  sentenza_id: str, output_dir: Path,
+                                  sections: Optional[Dict] = None,
+                                  header: Optional[HeaderMetadata] = None,
+                                  streaming: bool = False) -> Dict:
     """Processa una sentenza e genera Akoma Ntoso XML"""
 
     generator = AkomaNtosoGenerator()
+    output_path = output_dir / f"{sentenza_id}_akoma_ntoso.xml"
+
+    if streaming:
+        # Scrittura incrementale senza albero in memoria
+        print(f"Generazione Akoma Ntoso (streaming) per {sentenza_id}...")
+        generator.stream_xml(txt_path, entities_path, sentenza_id, output_path,
+                             sections=sections, header=header)
+        print(f"✓ Salvato: {output_path}")
+
+        return {
+            'sentenza_id': sentenza_id,
+            'output_file': str(output_path),
+            'xml_size': output_path.stat().st_size,
+            'is_valid_xml': True
+        }
 
     # Genera XML
     print(f"Generazione Akoma Ntoso per {sentenza_id}...")
-    root = generator.generate(txt_path, entities_path, sentenza_id)
+    root = generator.generate(txt_path, entities_path, sentenza_id, sections=sections, header=header)
 
     # Salva
-    output_path = output_dir / f"{sentenza_id}_akoma_ntoso.xml"
     generator.save_xml(root, output_path)
 
     # Valida
@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+"""
+Categorizer - Categorizzazione sentenze (pattern/STRATEGIA_CATEGORIZZAZIONE.md)
+Livelli 1-2 deterministici con l'indice delle tassonomie, livello 3 (LLM)
+solo per le sentenze che i match non decidono.
+
+    1. match whitelist/blacklist/graylist + tassonomie MEF (taxonomy_index)
+    2. whitelist o blacklist nettamente prevalenti → decisione senza LLM,
+       materie e classificazioni dai codici MEF dei termini trovati
+    3. casi ambigui → prompt a lotti (più sentenze per chiamata) con solo
+       i candidati emersi dai match e un estratto attorno ai termini
+       ambigui, invece di testo completo + tassonomia intera per sentenza
+    4. risposte in cache (JSONL) per sentenza + candidati + versione prompt
+
+Output: una riga JSON per sentenza (materie_mef, classificazioni_mef,
+keywords_cassazione, is_tributaria, metodo).
+"""
+
+import json
+import time
+import hashlib
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from taxonomy_index import DEFAULT_INDEX_PATH, load_matcher
+from taxonomy_matcher import PATTERN_DIR, TaxonomyMatcher
+from txt_archive import DEFAULT_ARCHIVE_DIR, list_sentenza_ids, read_sentenza_text
+
+DEFAULT_OUTPUT_PATH = Path('categorization/categorie.jsonl')
+DEFAULT_CACHE_PATH = Path('categorization/llm_cache.jsonl')
+
+# Cambiare se cambia il prompt: invalida la cache
+PROMPT_VERSION = 1
+
+# Decisione deterministica: almeno MIN_EVIDENCE match whitelist+blacklist
+# di termini che non sono anche in graylist ('exclusive' del matcher), una
+# delle due liste ad almeno DOMINANCE del totale e match graylist non oltre
+# GRAYLIST_RATIO volte l'evidenza. La graylist (21.410 termini) è in gran
+# parte lessico processuale generico: sulle sentenze tributarie di txt/ la
+# mediana è ~19 match graylist per match whitelist specifico
+MIN_EVIDENCE = 5
+DOMINANCE = 0.9
+GRAYLIST_RATIO = 20
+
+BATCH_SIZE = 8
+MAX_MATERIE = 8
+MAX_CLASSIFICAZIONI = 12
+MAX_KEYWORDS = 20
+
+# Estratto per il prompt: intestazione + finestre attorno ai termini ambigui
+HEAD_CHARS = 600
+WINDOW_CHARS = 160
+EXCERPT_CHARS = 2500
+
+# Stima del prompt "ingenuo" di STRATEGIA_CATEGORIZZAZIONE.md (una chiamata
+# per sentenza: testo fino a 15000 caratteri + 100 materie + 500 keywords)
+BASELINE_TEXT_CHARS = 15000
+BASELINE_MATERIE = 100
+BASELINE_KEYWORDS = 500
+
+
+# ==================== LIVELLI 1-2 ====================
+
+def _top(counts: Dict[str, int], limit: int) -> List[str]:
+    return [k for k, _ in sorted(counts.items(), key=lambda x: (-x[1], x[0]))[:limit]]
+
+
+def _materia_codes(match: Dict) -> Dict[str, int]:
+    """Codici materia: materie trovate + materia delle classificazioni (D040/0500 → D040)"""
+    codes = dict(match['mef_materia']['codes'])
+    for code, count in match['mef_classificazione']['codes'].items():
+        materia = code.split('/')[0]
+        codes[materia] = codes.get(materia, 0) + count
+    return codes
+
+
+def candidates(match: Dict) -> Dict[str, List[str]]:
+    """Candidati emersi dai match (lista corta al posto della tassonomia intera)"""
+    materie = dict(match['mef_materia']['terms'])
+    for term, count in match['giustizia_tributaria']['terms'].items():
+        materie[term] = materie.get(term, 0) + count
+
+    keywords = dict(match['whitelist']['terms'])
+    for term, count in match['graylist']['terms'].items():
+        keywords[term] = keywords.get(term, 0) + count
+
+    return {
+        'materie': _top(materie, MAX_MATERIE),
+        'classificazioni': _top(match['mef_classificazione']['terms'], MAX_CLASSIFICAZIONI),
+        'keywords': _top(keywords, MAX_KEYWORDS),
+    }
+
+
+def excerpt(text: str, match: Dict) -> str:
+    """Intestazione + finestre attorno ai match graylist/blacklist (unite, max EXCERPT_CHARS)"""
+    windows = [(0, min(HEAD_CHARS, len(text)))]
+    positions = sorted(match['blacklist']['positions'] + match['graylist']['positions'])
+    for start, end, _ in positions:
+        windows.append((max(0, start - WINDOW_CHARS), min(len(text), end + WINDOW_CHARS)))
+
+    merged = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    parts = []
+    size = 0
+    for start, end in merged:
+        part = ' '.join(text[start:end].split())
+        if size + len(part) > EXCERPT_CHARS:
+            part = part[:EXCERPT_CHARS - size]
+        parts.append(part)
+        size += len(part)
+        if size >= EXCERPT_CHARS:
+            break
+    return ' [...] '.join(p for p in parts if p)
+
+
+def prefilter(sentenza_id: str, text: str, matcher: TaxonomyMatcher) -> Dict:
+    """
+    Livelli 1-2: decisione deterministica o caso ambiguo
+
+    Returns:
+        Risultato con 'metodo' = whitelist | blacklist | nessun_match | ambigua
+        (i casi ambigui portano anche 'candidati' ed 'estratto' per il prompt)
+    """
+    match = matcher.match(text)
+    # Evidenza: solo termini non ambigui ("ricorso", "licenziamento" sono
+    # anche in graylist e non decidono nulla)
+    whitelist = match['whitelist']['exclusive']
+    blacklist = match['blacklist']['exclusive']
+    graylist = match['graylist']['hits']
+    evidence = whitelist + blacklist
+    decided = evidence >= MIN_EVIDENCE and graylist <= GRAYLIST_RATIO * evidence
+
+    result = {
+        'sentenza_id': sentenza_id,
+        'is_tributaria': None,
+        'metodo': 'ambigua',
+        'score': {'whitelist': match['whitelist']['hits'], 'blacklist': match['blacklist']['hits'],
+                  'graylist': graylist, 'evidenza': evidence},
+        'materie_mef': [],
+        'classificazioni_mef': [],
+        'keywords_cassazione': [],
+        'codici_materia': _top(_materia_codes(match), MAX_MATERIE),
+        'codici_classificazione': _top(match['mef_classificazione']['codes'], MAX_CLASSIFICAZIONI),
+    }
+
+    if decided and whitelist >= DOMINANCE * evidence:
+        cands = candidates(match)
+        result.update({
+            'is_tributaria': True,
+            'metodo': 'whitelist',
+            'materie_mef': cands['materie'][:3],
+            'classificazioni_mef': cands['classificazioni'][:5],
+            'keywords_cassazione': _top(match['whitelist']['terms'], 10),
+        })
+    elif decided and blacklist >= DOMINANCE * evidence:
+        result.update({
+            'is_tributaria': False,
+            'metodo': 'blacklist',
+            'codici_materia': [],
+            'codici_classificazione': [],
+        })
+    elif match['whitelist']['hits'] + match['blacklist']['hits'] + graylist == 0:
+        result.update({'is_tributaria': False, 'metodo': 'nessun_match'})
+    else:
+        result['candidati'] = candidates(match)
+        result['estratto'] = excerpt(text, match)
+        result['text_sha256'] = hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    return result
+
+
+# ==================== LIVELLO 3: LLM A LOTTI ====================
+
+PROMPT_HEADER = """Sei un esperto di diritto tributario. Per ciascuna sentenza della Cassazione
+qui sotto decidi se è tributaria e scegli le categorie SOLO tra i candidati
+indicati per quella sentenza (non inventare termini).
+
+Per ogni sentenza:
+- is_tributaria: true/false
+- materie_mef: max 3 tra i candidati "materie"
+- classificazioni_mef: max 5 tra i candidati "classificazioni"
+- keywords_cassazione: max 10 tra i candidati "keywords"
+
+"""
+
+PROMPT_FOOTER = """
+OUTPUT: un solo oggetto JSON con una chiave per ID sentenza:
+{"<id>": {"is_tributaria": true, "materie_mef": [], "classificazioni_mef": [], "keywords_cassazione": []}}
+
+Rispondi SOLO con il JSON, senza altre spiegazioni."""
+
+
+def build_prompt(decisions: List[Dict]) -> str:
+    """Prompt unico per un lotto di sentenze ambigue"""
+    blocks = []
+    for decision in decisions:
+        cands = decision['candidati']
+        blocks.append(
+            f"### {decision['sentenza_id']}\n"
+            f"materie: {json.dumps(cands['materie'], ensure_ascii=False)}\n"
+            f"classificazioni: {json.dumps(cands['classificazioni'], ensure_ascii=False)}\n"
+            f"keywords: {json.dumps(cands['keywords'], ensure_ascii=False)}\n"
+            f"estratto: {decision['estratto']}\n"
+        )
+    return PROMPT_HEADER + '\n'.join(blocks) + PROMPT_FOOTER
+
+
+def parse_response(response: str) -> Dict:
+    """JSON della risposta (anche dentro blocchi ```json)"""
+    if "```json" in response:
+        response = response.split("```json")[1].split("```")[0]
+    elif "```" in response:
+        response = response.split("```")[1].split("```")[0]
+    return json.loads(response.strip())
+
+
+def _restrict(values, allowed: List[str], limit: int) -> List[str]:
+    """Solo valori presenti tra i candidati (confronto senza maiuscole)"""
+    by_lower = {a.lower(): a for a in allowed}
+    selected = []
+    for value in values if isinstance(values, list) else []:
+        canonical = by_lower.get(str(value).strip().lower())
+        if canonical and canonical not in selected:
+            selected.append(canonical)
+    return selected[:limit]
+
+
+def apply_answer(decision: Dict, answer: Dict) -> Dict:
+    """Risposta LLM validata contro i candidati della sentenza"""
+    cands = decision['candidati']
+    return {
+        'is_tributaria': bool(answer.get('is_tributaria')),
+        'materie_mef': _restrict(answer.get('materie_mef'), cands['materie'], 3),
+        'classificazioni_mef': _restrict(answer.get('classificazioni_mef'), cands['classificazioni'], 5),
+        'keywords_cassazione': _restrict(answer.get('keywords_cassazione'), cands['keywords'], 10),
+    }
+
+
+def cache_key(decision: Dict, backend: str) -> str:
+    """Chiave cache: testo sentenza + candidati + versione prompt + backend"""
+    payload = json.dumps([PROMPT_VERSION, backend, decision['text_sha256'], decision['candidati']],
+                         ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """Cache risposte per sentenza (JSONL append-only, ultima riga vince)"""
+
+    def __init__(self, path: Optional[Path] = DEFAULT_CACHE_PATH):
+        self.path = Path(path) if path else None
+        self._entries: Dict[str, Dict] = {}
+        if self.path and self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry['key']] = entry['result']
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self._entries.get(key)
+
+    def put(self, key: str, result: Dict):
+        self._entries[key] = result
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'key': key, 'result': result}, ensure_ascii=False) + '\n')
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Categorizer:
+    """Livelli 1-2 deterministici + LLM a lotti con cache per i casi ambigui"""
+
+    def __init__(self, matcher: Optional[TaxonomyMatcher] = None,
+                 llm: Optional[Callable[[str], str]] = None, backend: str = 'none',
+                 cache_path: Optional[Path] = DEFAULT_CACHE_PATH,
+                 batch_size: int = BATCH_SIZE, max_retries: int = 3):
+        """
+        Args:
+            matcher: Matcher con tutte le liste (default: indice compilato)
+            llm: Funzione prompt → risposta (None: i casi ambigui restano da verificare)
+            backend: Nome backend (entra nella chiave cache)
+            cache_path: Cache JSONL delle risposte (None: solo in memoria)
+            batch_size: Sentenze ambigue per prompt
+        """
+        self.matcher = matcher or load_matcher(DEFAULT_INDEX_PATH, PATTERN_DIR)
+        self.llm = llm
+        self.backend = backend
+        self.cache = LLMCache(cache_path)
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.stats = {
+            'documents': 0, 'whitelist': 0, 'blacklist': 0, 'nessun_match': 0,
+            'ambigue': 0, 'cache_hits': 0, 'llm_calls': 0, 'llm_failed': 0,
+            'prompt_chars': 0, 'baseline_text_chars': 0,
+        }
+
+    def _resolve(self, pending: List[Dict]):
+        """Prompt a lotti per le decisioni ambigue non in cache"""
+        attempt = 0
+        while pending and attempt < self.max_retries:
+            retry = []
+            for i in range(0, len(pending), self.batch_size):
+                batch = pending[i:i + self.batch_size]
+                prompt = build_prompt(batch)
+                self.stats['llm_calls'] += 1
+                self.stats['prompt_chars'] += len(prompt)
+
+                try:
+                    answers = parse_response(self.llm(prompt))
+                except Exception as e:
+                    print(f"  ⚠️  Lotto di {len(batch)} sentenze fallito: {e}")
+                    retry.extend(batch)
+                    continue
+
+                for decision in batch:
+                    answer = answers.get(decision['sentenza_id']) if isinstance(answers, dict) else None
+                    if not isinstance(answer, dict):
+                        retry.append(decision)
+                        continue
+                    result = apply_answer(decision, answer)
+                    self.cache.put(decision['_cache_key'], result)
+                    decision.update(result, metodo='llm')
+
+            pending = retry
+            attempt += 1
+            if pending and attempt < self.max_retries:
+                time.sleep(2 ** (attempt - 1))  # Exponential backoff
+
+        for decision in pending:
+            decision['metodo'] = 'llm_fallito'
+            self.stats['llm_failed'] += 1
+
+    def categorize(self, items: Iterable[Tuple[str, str]]) -> List[Dict]:
+        """
+        Categorizza (sentenza_id, testo)
+
+        Returns:
+            Risultati nell'ordine di input
+        """
+        results = []
+        pending = []
+
+        for sentenza_id, text in items:
+            decision = prefilter(sentenza_id, text, self.matcher)
+            self.stats['documents'] += 1
+            self.stats['baseline_text_chars'] += min(len(text), BASELINE_TEXT_CHARS)
+            results.append(decision)
+
+            if decision['metodo'] != 'ambigua':
+                self.stats[decision['metodo']] += 1
+                continue
+
+            self.stats['ambigue'] += 1
+            key = cache_key(decision, self.backend)
+            cached = self.cache.get(key)
+            if cached is not None:
+                decision.update(cached, metodo='llm_cache')
+                self.stats['cache_hits'] += 1
+            elif self.llm:
+                decision['_cache_key'] = key
+                pending.append(decision)
+            else:
+                decision['metodo'] = 'da_verificare'
+
+        if pending:
+            self._resolve(pending)
+
+        for decision in results:
+            for field in ('estratto', 'text_sha256', '_cache_key'):
+                decision.pop(field, None)
+            if decision['metodo'] != 'da_verificare':
+                decision.pop('candidati', None)
+
+        return results
+
+    def summary(self, baseline_overhead: Optional[int] = None) -> Dict:
+        """
+        Statistiche del run
+
+        Args:
+            baseline_overhead: Caratteri fissi del prompt baseline (baseline_overhead());
+                               None: niente confronto sui caratteri
+        """
+        stats = dict(self.stats)
+        stats['baseline_calls'] = stats['documents']
+        stats['call_reduction'] = stats['documents'] / stats['llm_calls'] if stats['llm_calls'] else None
+        stats['baseline_chars'] = None
+        stats['char_reduction'] = None
+        if baseline_overhead is not None:
+            stats['baseline_chars'] = stats['baseline_text_chars'] + stats['documents'] * baseline_overhead
+            if stats['prompt_chars']:
+                stats['char_reduction'] = stats['baseline_chars'] / stats['prompt_chars']
+        return stats
+
+
+def baseline_overhead(pattern_dir: Path = PATTERN_DIR) -> int:
+    """
+    Caratteri fissi del prompt per-sentenza con tassonomia intera (solo per
+    il confronto nel report: legge le tassonomie sorgente da pattern_dir)
+    """
+    from taxonomy_index import mef_materia_terms
+    from taxonomy_matcher import TAXONOMY_LISTS
+    materie = [term for term, _ in mef_materia_terms(Path(pattern_dir))][:BASELINE_MATERIE]
+    with open(Path(pattern_dir) / TAXONOMY_LISTS['whitelist'], 'r', encoding='utf-8') as f:
+        keywords = [line.strip() for line in f if line.strip()][:BASELINE_KEYWORDS]
+    return len(', '.join(materie)) + len(', '.join(keywords)) + 600
+
+
+def llm_from_backend(backend: str) -> Callable[[str], str]:
+    """Funzione prompt → risposta dai backend di llm_entity_extractor"""
+    from llm_entity_extractor import LLMEntityExtractor
+    return LLMEntityExtractor(backend=backend).complete
+
+
+def save_results(results: List[Dict], output_path: Path = DEFAULT_OUTPUT_PATH):
+    """Aggiorna il JSONL di output (una riga per sentenza, le nuove sostituiscono le vecchie)"""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    existing = {}
+    if output_path.exists():
+        with open(output_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    existing[row['sentenza_id']] = row
+    for row in results:
+        existing[row['sentenza_id']] = row
+
+    tmp_path = output_path.with_suffix(output_path.suffix + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for sentenza_id in sorted(existing):
+            f.write(json.dumps(existing[sentenza_id], ensure_ascii=False) + '\n')
+    tmp_path.replace(output_path)
+
+
+def process_categorization(sentenza_ids: List[str], txt_dir: Path = Path('txt'),
+                           output_path: Path = DEFAULT_OUTPUT_PATH, backend: Optional[str] = None,
+                           archive_dir: Path = DEFAULT_ARCHIVE_DIR,
+                           categorizer: Optional[Categorizer] = None, save: bool = True,
+                           baseline: bool = False) -> Dict:
+    """
+    Step pipeline: categorizza un gruppo di sentenze (TXT o archivi compressi)
+
+    Args:
+        backend: "gemini", "claude", "ollama" o None (solo livelli 1-2)
+        baseline: Confronto caratteri con il prompt baseline (legge pattern/)
+
+    Returns:
+        Statistiche (decisioni per metodo, chiamate LLM, riduzione vs baseline)
+    """
+    if categorizer is None:
+        llm = llm_from_backend(backend) if backend else None
+        categorizer = Categorizer(llm=llm, backend=backend or 'none')
+
+    def texts():
+        for sentenza_id in sentenza_ids:
+            text = read_sentenza_text(sentenza_id, txt_dir, archive_dir)
+            if text is not None:
+                yield sentenza_id, text
+
+    results = categorizer.categorize(texts())
+    if save:
+        save_results(results, output_path)
+    overhead = baseline_overhead(PATTERN_DIR) if baseline else None
+    return {**categorizer.summary(overhead), 'output_file': str(output_path) if save else None}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Categorizer - livelli 1-2 deterministici + LLM a lotti per i casi ambigui")
+    parser.add_argument("--txt-dir", type=str, default="txt", help="Directory TXT (default: txt)")
+    parser.add_argument("--archive-dir", type=str, default=str(DEFAULT_ARCHIVE_DIR), help="Directory archivi .stxa")
+    parser.add_argument("--output", type=str, default=str(DEFAULT_OUTPUT_PATH), help=f"JSONL output (default: {DEFAULT_OUTPUT_PATH})")
+    parser.add_argument("--cache", type=str, default=str(DEFAULT_CACHE_PATH), help=f"Cache risposte LLM (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--index", type=str, default=str(DEFAULT_INDEX_PATH), help=f"Indice tassonomie (default: {DEFAULT_INDEX_PATH})")
+    parser.add_argument("--backend", choices=['gemini', 'claude', 'ollama'], default=None,
+                        help="Backend LLM per i casi ambigui (default: nessuno, restano da verificare)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help=f"Sentenze per prompt (default: {BATCH_SIZE})")
+    parser.add_argument("--dry-run", action="store_true", help="Costruisce i prompt senza chiamare l'LLM (stima chiamate)")
+    parser.add_argument("--limit", type=int, default=None, help="Solo le prime N sentenze")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        # Risposta vuota: conta lotti e caratteri senza usare quota API
+        llm = lambda prompt: '{}'
+        backend = 'dry-run'
+    else:
+        llm = llm_from_backend(args.backend) if args.backend else None
+        backend = args.backend or 'none'
+
+    categorizer = Categorizer(
+        matcher=load_matcher(Path(args.index), PATTERN_DIR),
+        llm=llm, backend=backend,
+        cache_path=None if args.dry_run else Path(args.cache),
+        batch_size=args.batch_size,
+        max_retries=1 if args.dry_run else 3,
+    )
+
+    sentenza_ids = list_sentenza_ids(Path(args.txt_dir), Path(args.archive_dir))[:args.limit]
+    start = time.time()
+    stats = process_categorization(sentenza_ids, Path(args.txt_dir),
+                                   Path(args.output), archive_dir=Path(args.archive_dir),
+                                   categorizer=categorizer, save=not args.dry_run,
+                                   baseline=args.dry_run)
+    elapsed = time.time() - start
+
+    print("="*80)
+    print("CATEGORIZZAZIONE" + (" (dry run)" if args.dry_run else ""))
+    print("="*80)
+    print(f"Sentenze:             {stats['documents']} ({elapsed:.1f}s)")
+    print(f"  ✅ Whitelist:        {stats['whitelist']}")
+    print(f"  ❌ Blacklist:        {stats['blacklist']}")
+    print(f"  ∅  Nessun match:     {stats['nessun_match']}")
+    print(f"  ❓ Ambigue:          {stats['ambigue']} (cache {stats['cache_hits']})")
+    print(f"Chiamate LLM:         {stats['llm_calls']} (baseline: {stats['baseline_calls']}, "
+          f"una per sentenza con tassonomia intera)")
+    if stats['char_reduction']:
+        print(f"Caratteri prompt:     {stats['prompt_chars']:,} (baseline: {stats['baseline_chars']:,}, "
+              f"{stats['char_reduction']:.0f}x in meno)")
+    if stats['llm_failed'] and not args.dry_run:
+        print(f"⚠️  LLM fallito:       {stats['llm_failed']}")
+    if stats['output_file']:
+        print(f"✓ Output: {stats['output_file']}")
+    print("="*80)
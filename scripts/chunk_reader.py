@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Chunk Reader - Lettura chunks senza contenuto duplicato
+I chunks JSON salvano solo gli span (start_byte/end_byte): il testo viene
+ricavato dal TXT originale tramite memory map, senza leggerlo tutto
+(o dall'archivio compresso txt_compressed/*.stxa se il TXT non è estratto).
+"""
+
+import json
+import mmap
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class TxtSlicer:
+    """Accesso per span a un TXT UTF-8 tramite memory map"""
+
+    def __init__(self, txt_path: Path):
+        self.txt_path = Path(txt_path)
+        self._file = open(self.txt_path, 'rb')
+        # mmap non supporta file vuoti
+        if self.txt_path.stat().st_size > 0:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._mm = b''
+
+    def slice(self, start_byte: int, end_byte: int) -> str:
+        """Testo compreso tra due offset in byte"""
+        return self._mm[start_byte:end_byte].decode('utf-8')
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def resolve_txt_path(chunks_data: Dict) -> Path:
+    """
+    Trova il TXT di riferimento dei chunks
+
+    Ordine: campo txt_file nel JSON, poi txt/<sentenza_id>.txt
+    """
+    txt_file = chunks_data.get('txt_file')
+    if txt_file and Path(txt_file).exists():
+        return Path(txt_file)
+    return Path('txt') / f"{chunks_data['sentenza_id']}.txt"
+
+
+def fill_chunk_contents(chunks_data: Dict, txt_path: Optional[Path] = None) -> Dict:
+    """
+    Ricostruisce 'content' dei chunks che hanno solo gli span
+
+    I chunks che hanno già 'content' (formato precedente) restano invariati.
+    Se il TXT non è su disco il testo viene letto dall'archivio .stxa.
+    """
+    all_chunks = chunks_data.get('semantic_chunks', []) + chunks_data.get('fixed_chunks', [])
+    missing = [c for c in all_chunks if 'content' not in c]
+
+    if not missing:
+        return chunks_data
+
+    txt_path = Path(txt_path or resolve_txt_path(chunks_data))
+
+    if not txt_path.exists():
+        # TXT non estratto: frame della sentenza dall'archivio compresso
+        from txt_archive import read_sentenza_bytes
+
+        data = read_sentenza_bytes(chunks_data['sentenza_id'], txt_path.parent)
+        if data is None:
+            raise FileNotFoundError(txt_path)
+        for chunk in missing:
+            chunk['content'] = data[chunk['start_byte']:chunk['end_byte']].decode('utf-8')
+        return chunks_data
+
+    with TxtSlicer(txt_path) as slicer:
+        for chunk in missing:
+            chunk['content'] = slicer.slice(chunk['start_byte'], chunk['end_byte'])
+
+    return chunks_data
+
+
+def load_chunks(chunks_path: Path, txt_path: Optional[Path] = None,
+                sentenza_id: Optional[str] = None) -> Dict:
+    """
+    Carica chunks con 'content' sempre disponibile
+
+    Args:
+        chunks_path: Path al JSON chunks oppure a un chunk store (.schk)
+        txt_path: TXT originale (default: campo txt_file o txt/<id>.txt)
+        sentenza_id: ID sentenza (obbligatorio per chunk store)
+
+    Returns:
+        Dict chunks come prodotto da ChunkingProcessor.process_text
+    """
+    if Path(chunks_path).suffix == '.schk':
+        from chunk_store import ChunkStore
+
+        with ChunkStore(chunks_path) as store:
+            chunks_data = store.load(sentenza_id)
+    else:
+        with open(chunks_path, 'r', encoding='utf-8') as f:
+            chunks_data = json.load(f)
+
+    return fill_chunk_contents(chunks_data, txt_path)
+
+
+def load_chunks_many(sentenza_ids: List[str], chunks_source: Path) -> Dict:
+    """
+    Chunks (solo span, senza 'content') di molte sentenze in una volta
+
+    Args:
+        sentenza_ids: ID sentenze
+        chunks_source: Directory chunks JSON oppure chunk store (.schk)
+
+    Returns:
+        Dict sentenza_id → chunks (sentenze senza chunks omesse)
+    """
+    chunks_source = Path(chunks_source)
+
+    if chunks_source.suffix == '.schk':
+        from chunk_store import ChunkStore
+
+        with ChunkStore(chunks_source) as store:
+            available = set(store.sentenza_ids)
+            return {sid: store.load(sid) for sid in sentenza_ids if sid in available}
+
+    chunks = {}
+    for sid in sentenza_ids:
+        path = chunks_source / f"{sid}_chunks.json"
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                chunks[sid] = json.load(f)
+    return chunks
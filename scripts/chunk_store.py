@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Chunk Store - Archivio colonnare compatto per i chunks
+Sostituisce i chunks/<id>_chunks.json (indent=2, testo duplicato) con un
+unico file binario per molte sentenze: solo span, tipi e token count,
+più il riferimento al TXT originale.
+
+Formato file:
+    MAGIC
+    colonna_1 (segmenti per sentenza) | indice offset colonna_1
+    ...
+    footer JSON (sentenze, dizionari, posizione colonne)
+    lunghezza footer (8 byte little-endian) | MAGIC
+
+Codifiche colonne:
+- dict:   codice varint in un dizionario (kind, chunk_id, type)
+- uvarint: intero varint (token_count)
+- delta:  differenza zigzag-varint dal valore precedente, azzerata a ogni
+          sentenza (start_pos, end_pos, start_byte, end_byte)
+
+Ogni colonna è divisa in segmenti per sentenza con indice di offset:
+i lettori caricano solo le colonne richieste, eventualmente di una sola
+sentenza, senza decodificare il resto del file.
+"""
+
+import json
+import mmap
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from chunk_reader import fill_chunk_contents
+
+MAGIC = b'SCHK1\n'
+
+COLUMNS = {
+    'kind': 'dict',
+    'chunk_id': 'dict',
+    'type': 'dict',
+    'start_pos': 'delta',
+    'end_pos': 'delta',
+    'start_byte': 'delta',
+    'end_byte': 'delta',
+    'token_count': 'uvarint',
+}
+
+
+def _write_uvarint(buf: bytearray, value: int):
+    """Accoda intero non negativo in formato varint (LEB128)"""
+    while value >= 0x80:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _read_uvarints(data, pos: int, count: int) -> Tuple[List[int], int]:
+    """Decodifica `count` varint da `data` a partire da `pos`"""
+    values = []
+    for _ in range(count):
+        result = 0
+        shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        values.append(result)
+    return values, pos
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+
+def _unzigzag(value: int) -> int:
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+
+class ChunkStoreWriter:
+    """Scrive chunks di molte sentenze in un unico file colonnare"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._data = {name: bytearray() for name in COLUMNS}
+        self._index = {name: [0] for name in COLUMNS}
+        self._dicts = {name: {} for name, codec in COLUMNS.items() if codec == 'dict'}
+        self._documents = {'sentenza_id': [], 'txt_file': [], 'rows': []}
+        self._n_rows = 0
+
+    def add(self, chunks_data: Dict):
+        """
+        Aggiunge una sentenza
+
+        Args:
+            chunks_data: Output di ChunkingProcessor.process_text (con txt_file)
+        """
+        rows = (
+            [('semantic', c) for c in chunks_data.get('semantic_chunks', [])] +
+            [('fixed', c) for c in chunks_data.get('fixed_chunks', [])]
+        )
+
+        previous = {name: 0 for name, codec in COLUMNS.items() if codec == 'delta'}
+
+        for kind, chunk in rows:
+            values = {
+                'kind': kind,
+                'chunk_id': chunk['chunk_id'],
+                'type': chunk.get('type', 'fixed'),
+                'start_pos': chunk['start_pos'],
+                'end_pos': chunk['end_pos'],
+                'start_byte': chunk['start_byte'],
+                'end_byte': chunk['end_byte'],
+                'token_count': chunk['token_count'],
+            }
+
+            for name, codec in COLUMNS.items():
+                value = values[name]
+                if codec == 'dict':
+                    value = self._dicts[name].setdefault(value, len(self._dicts[name]))
+                elif codec == 'delta':
+                    value, previous[name] = _zigzag(value - previous[name]), value
+                _write_uvarint(self._data[name], value)
+
+        for name in COLUMNS:
+            self._index[name].append(len(self._data[name]))
+
+        self._documents['sentenza_id'].append(chunks_data['sentenza_id'])
+        self._documents['txt_file'].append(chunks_data.get('txt_file', ''))
+        self._documents['rows'].append(len(rows))
+        self._n_rows += len(rows)
+
+    def close(self):
+        """Scrive colonne, indici e footer su disco (file temporaneo + rename)"""
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+
+        try:
+            self._write(tmp_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        # Il path finale esiste solo completo di footer
+        tmp_path.replace(self.path)
+
+    def _write(self, tmp_path: Path):
+        columns = {}
+
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+
+            for name, codec in COLUMNS.items():
+                offset = f.tell()
+                f.write(self._data[name])
+
+                index = bytearray()
+                previous = 0
+                for pos in self._index[name]:
+                    _write_uvarint(index, pos - previous)
+                    previous = pos
+                index_offset = f.tell()
+                f.write(index)
+
+                columns[name] = {
+                    'codec': codec,
+                    'offset': offset,
+                    'length': len(self._data[name]),
+                    'index_offset': index_offset,
+                    'index_length': len(index),
+                }
+                if codec == 'dict':
+                    columns[name]['dictionary'] = list(self._dicts[name])
+
+            footer = json.dumps({
+                'version': 1,
+                'n_rows': self._n_rows,
+                'documents': self._documents,
+                'columns': columns,
+            }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+            f.write(footer)
+            f.write(struct.pack('<Q', len(footer)))
+            f.write(MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Errore durante add: nessun file scritto
+        if exc_type is None:
+            self.close()
+
+
+class ChunkStore:
+    """Lettura colonnare (memory map) di un file scritto da ChunkStoreWriter"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        trailer = len(MAGIC) + 8
+        if self._mm[:len(MAGIC)] != MAGIC or self._mm[-len(MAGIC):] != MAGIC:
+            raise ValueError(f"File chunk store non valido: {self.path}")
+
+        footer_len = struct.unpack('<Q', self._mm[-trailer:-len(MAGIC)])[0]
+        footer_start = len(self._mm) - trailer - footer_len
+        footer = json.loads(self._mm[footer_start:footer_start + footer_len].decode('utf-8'))
+
+        self.n_rows = footer['n_rows']
+        self.columns = footer['columns']
+        self.documents = footer['documents']
+        self._doc_pos = {sid: i for i, sid in enumerate(self.documents['sentenza_id'])}
+        self._indexes = {}
+
+    @property
+    def sentenza_ids(self) -> List[str]:
+        return self.documents['sentenza_id']
+
+    def _column_index(self, name: str) -> List[int]:
+        """Offset (assoluti nel file) dei segmenti per sentenza di una colonna"""
+        if name not in self._indexes:
+            col = self.columns[name]
+            deltas, _ = _read_uvarints(self._mm, col['index_offset'], len(self.documents['rows']) + 1)
+            index = []
+            pos = col['offset']
+            for delta in deltas:
+                pos += delta
+                index.append(pos)
+            self._indexes[name] = index
+        return self._indexes[name]
+
+    def _decode(self, name: str, doc_positions: Iterable[int]) -> List:
+        """Decodifica una colonna per le sentenze indicate"""
+        col = self.columns[name]
+        codec = col['codec']
+        index = self._column_index(name)
+        rows = self.documents['rows']
+
+        values = []
+        for doc in doc_positions:
+            raw, _ = _read_uvarints(self._mm, index[doc], rows[doc])
+            if codec == 'dict':
+                dictionary = col['dictionary']
+                values.extend(dictionary[v] for v in raw)
+            elif codec == 'delta':
+                current = 0
+                for v in raw:
+                    current += _unzigzag(v)
+                    values.append(current)
+            else:
+                values.extend(raw)
+        return values
+
+    def read_columns(self, columns: List[str], sentenza_ids: Optional[List[str]] = None) -> Dict[str, List]:
+        """
+        Legge solo le colonne richieste
+
+        Args:
+            columns: Nomi colonne (COLUMNS più 'sentenza_id' e 'txt_file')
+            sentenza_ids: Limita alle sentenze indicate (default: tutte)
+
+        Returns:
+            Dict colonna → lista valori (una riga per chunk)
+        """
+        if sentenza_ids is None:
+            doc_positions = range(len(self.documents['rows']))
+        else:
+            doc_positions = [self._doc_pos[sid] for sid in sentenza_ids]
+
+        result = {}
+        for name in columns:
+            if name in ('sentenza_id', 'txt_file'):
+                result[name] = [
+                    self.documents[name][doc]
+                    for doc in doc_positions
+                    for _ in range(self.documents['rows'][doc])
+                ]
+            else:
+                result[name] = self._decode(name, doc_positions)
+        return result
+
+    def load(self, sentenza_id: str, with_content: bool = False) -> Dict:
+        """
+        Ricostruisce i chunks di una sentenza nel formato di process_text
+
+        Args:
+            sentenza_id: ID sentenza
+            with_content: Se True ricava anche il testo dal TXT (memory map)
+        """
+        doc = self._doc_pos[sentenza_id]
+        data = self.read_columns(list(COLUMNS), [sentenza_id])
+
+        semantic_chunks = []
+        fixed_chunks = []
+        for i in range(self.documents['rows'][doc]):
+            chunk = {name: data[name][i] for name in COLUMNS if name != 'kind'}
+            chunk['char_count'] = chunk['end_pos'] - chunk['start_pos']
+            if data['kind'][i] == 'semantic':
+                semantic_chunks.append(chunk)
+            else:
+                del chunk['type']
+                fixed_chunks.append(chunk)
+
+        chunks_data = {
+            'sentenza_id': sentenza_id,
+            'txt_file': self.documents['txt_file'][doc],
+            'semantic_chunks': semantic_chunks,
+            'fixed_chunks': fixed_chunks,
+            'total_semantic': len(semantic_chunks),
+            'total_fixed': len(fixed_chunks)
+        }
+
+        if with_content:
+            fill_chunk_contents(chunks_data)
+
+        return chunks_data
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_store_from_json(chunks_dir: Path, output_path: Path, txt_dir: Path = Path('txt')) -> Dict:
+    """
+    Converte chunks/<id>_chunks.json in un unico chunk store
+
+    I JSON del formato precedente (senza span in byte) vengono completati
+    leggendo il TXT corrispondente.
+    """
+    json_files = sorted(Path(chunks_dir).glob('*_chunks.json'))
+    print(f"📋 Chunks JSON da convertire: {len(json_files)}")
+
+    json_bytes = 0
+    converted = 0
+    with ChunkStoreWriter(output_path) as writer:
+        for json_file in json_files:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                chunks_data = json.load(f)
+
+            chunks_data.setdefault('txt_file', str(Path(txt_dir) / f"{chunks_data['sentenza_id']}.txt"))
+            try:
+                _ensure_spans(chunks_data)
+            except FileNotFoundError:
+                print(f"   ⚠️  TXT mancante per {json_file.name} (skip)")
+                continue
+
+            writer.add(chunks_data)
+            json_bytes += json_file.stat().st_size
+            converted += 1
+
+    store_bytes = Path(output_path).stat().st_size
+
+    return {
+        'documents': converted,
+        'json_bytes': json_bytes,
+        'store_bytes': store_bytes
+    }
+
+
+def _ensure_spans(chunks_data: Dict):
+    """Completa span mancanti nei chunks JSON del formato precedente"""
+    all_chunks = chunks_data['semantic_chunks'] + chunks_data['fixed_chunks']
+    if all('start_byte' in c for c in all_chunks):
+        return
+
+    with open(chunks_data['txt_file'], 'r', encoding='utf-8', newline='') as f:
+        text = f.read()
+
+    # Ricerca dal chunk precedente della stessa lista: un blocco ripetuto
+    # (boilerplate) non finisce sempre sulla prima occorrenza
+    for chunks in (chunks_data['semantic_chunks'], chunks_data['fixed_chunks']):
+        prev_start, prev_end = -1, 0
+        for chunk in chunks:
+            if 'start_pos' not in chunk:
+                content = chunk['content']
+                start = text.find(content, prev_end)
+                if start == -1:
+                    # Fixed chunks in overlap: iniziano prima della fine del precedente
+                    start = text.find(content, prev_start + 1)
+                if start == -1:
+                    start = text.find(content)
+                chunk['start_pos'] = max(start, 0)
+                chunk['end_pos'] = chunk['start_pos'] + len(content)
+            prev_start, prev_end = chunk['start_pos'], chunk['end_pos']
+
+    for chunk in all_chunks:
+        chunk['start_byte'] = len(text[:chunk['start_pos']].encode('utf-8'))
+        chunk['end_byte'] = chunk['start_byte'] + len(text[chunk['start_pos']:chunk['end_pos']].encode('utf-8'))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Chunk Store - archivio colonnare chunks")
+    subparsers = parser.add_subparsers(dest='command', help='Comando da eseguire')
+
+    build_parser = subparsers.add_parser('build', help='Converte chunks JSON in chunk store')
+    build_parser.add_argument("--chunks-dir", type=str, default="chunks", help="Directory chunks JSON (default: chunks)")
+    build_parser.add_argument("--txt-dir", type=str, default="txt", help="Directory TXT (default: txt)")
+    build_parser.add_argument("--output", type=str, default="chunks/chunks.schk", help="File output (default: chunks/chunks.schk)")
+
+    info_parser = subparsers.add_parser('info', help='Mostra contenuto chunk store')
+    info_parser.add_argument("--store", type=str, default="chunks/chunks.schk", help="File chunk store")
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        stats = build_store_from_json(Path(args.chunks_dir), Path(args.output), Path(args.txt_dir))
+        print(f"\n✅ Chunk store creato: {args.output}")
+        print(f"📊 Sentenze: {stats['documents']}")
+        print(f"💾 JSON: {stats['json_bytes'] / 1024:.1f} KB")
+        print(f"📉 Store: {stats['store_bytes'] / 1024:.1f} KB")
+    elif args.command == 'info':
+        with ChunkStore(Path(args.store)) as store:
+            print(f"📦 {args.store}")
+            print(f"📊 Sentenze: {len(store.sentenza_ids)}")
+            print(f"📊 Chunks: {store.n_rows}")
+            for name, col in store.columns.items():
+                print(f"   {name:12s} {col['codec']:8s} {col['length']:>10,} bytes")
+    else:
+        parser.print_help()
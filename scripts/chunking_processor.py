@@ -5,56 +5,113 @@ Genera chunks semantici + fixed-size con conteggio token reale (tiktoken)
 """
 
 import json
-import re
 import tiktoken
+from bisect import bisect_left, bisect_right
 from pathlib import Path
-from typing import Dict, List
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from typing import Dict, List, Optional, Tuple
+
+from chunk_reader import load_chunks
+from section_segmenter import segment_sections
 
 class ChunkingProcessor:
     """Processa testo in chunks semantici e fixed-size"""
 
-    def __init__(self, model_name: str = "gpt-3.5-turbo"):
+    def __init__(self, model_name: str = "gpt-3.5-turbo",
+                 chunk_size: int = 512, chunk_overlap: int = 50):
         """
         Args:
             model_name: Modello per tiktoken (default: gpt-3.5-turbo)
+            chunk_size: Token massimi per fixed chunk
+            chunk_overlap: Token di sovrapposizione tra fixed chunks
         """
         # Tokenizer per conteggio accurato
         self.tokenizer = tiktoken.encoding_for_model(model_name)
 
-        # Text splitter per fixed-size chunks
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=512,  # Token target
-            chunk_overlap=50,
-            length_function=self._count_tokens,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
+        # Parametri fixed-size chunks (confini agganciati ai separatori,
+        # dal più forte al più debole)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        # I separatori si cercano solo oltre metà chunk: niente chunk da
+        # poche decine di token se l'ultimo "\n\n" è vicino all'inizio
+        self.min_chunk_tokens = chunk_size // 2
+        self.separators = ["\n\n", "\n", ". ", " "]
 
     def _count_tokens(self, text: str) -> int:
         """Conta token reali con tiktoken"""
         return len(self.tokenizer.encode(text))
 
-    def process_text(self, text: str, sentenza_id: str) -> Dict:
+    def _token_offsets(self, text: str) -> List[int]:
+        """
+        Tokenizza il testo UNA sola volta
+
+        Returns:
+            Offset (in caratteri) di inizio di ogni token nel testo
+        """
+        tokens = self.tokenizer.encode(text)
+        _, offsets = self.tokenizer.decode_with_offsets(tokens)
+        return offsets
+
+    @staticmethod
+    def _span_tokens(offsets: List[int], start: int, end: int) -> int:
+        """Numero di token che cadono (anche parzialmente) in text[start:end]"""
+        if end <= start:
+            return 0
+        first = max(bisect_right(offsets, start) - 1, 0)
+        return bisect_left(offsets, end) - first
+
+    @staticmethod
+    def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+        """Equivalente di text[start:end].strip() ma restituisce gli offset"""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
+
+    def _make_chunk(self, text: str, offsets: List[int], start: int, end: int,
+                    chunk_id: str, chunk_type: str) -> Dict:
+        """Costruisce chunk semantico da span (già strippato)"""
+        content = text[start:end]
+        return {
+            'chunk_id': chunk_id,
+            'type': chunk_type,
+            'content': content,
+            'char_count': len(content),
+            'token_count': self._span_tokens(offsets, start, end),
+            'start_pos': start,
+            'end_pos': end
+        }
+
+    def process_text(self, text: str, sentenza_id: str, sections: Optional[Dict] = None) -> Dict:
         """
         Processa testo con chunking semantico + fixed-size
 
         Args:
             text: Testo completo sentenza
             sentenza_id: ID sentenza
+            sections: Span da segment_sections (calcolati qui se assenti)
 
         Returns:
             Dict con semantic_chunks e fixed_chunks
         """
         print(f"Chunking per {sentenza_id}...")
 
+        # 0. Tokenizzazione unica condivisa da tutti i chunk
+        offsets = self._token_offsets(text)
+
         # 1. Semantic chunking
-        semantic_chunks = self._semantic_chunking(text)
+        if sections is None:
+            sections = segment_sections(text)
+        semantic_chunks = self._semantic_chunking(text, offsets, sections)
         print(f"  Semantic chunks: {len(semantic_chunks)}")
 
         # 2. Fixed-size chunking
-        fixed_chunks = self._fixed_size_chunking(text)
+        fixed_chunks = self._fixed_size_chunking(text, offsets)
         print(f"  Fixed chunks: {len(fixed_chunks)}")
 
+        # 3. Offset in byte per lettura diretta dal TXT (memory map)
+        self._add_byte_offsets(text, semantic_chunks + fixed_chunks)
+
         return {
             'sentenza_id': sentenza_id,
             'semantic_chunks': semantic_chunks,
@@ -63,9 +120,9 @@ class ChunkingProcessor:
             'total_fixed': len(fixed_chunks)
         }
 
-    def _semantic_chunking(self, text: str) -> List[Dict]:
+    def _semantic_chunking(self, text: str, offsets: List[int], sections: Dict) -> List[Dict]:
         """
-        Chunking semantico basato su sezioni sentenza
+        Chunking semantico basato su sezioni sentenza (da section_segmenter)
 
         Sezioni:
         1. Metadata + intestazione
@@ -76,158 +133,175 @@ class ChunkingProcessor:
         chunks = []
 
         # Chunk 1: Metadata + intestazione (prime righe fino a ORDINANZA/SENTENZA)
-        header_match = re.search(r'(ORDINANZA|SENTENZA)', text, re.IGNORECASE)
-        if header_match:
-            header_end = header_match.start()
-            header_text = text[:header_end].strip()
-
-            if header_text:
-                chunks.append({
-                    'chunk_id': '001_metadata',
-                    'type': 'metadata',
-                    'content': header_text,
-                    'char_count': len(header_text),
-                    'token_count': self._count_tokens(header_text)
-                })
+        if 'intestazione' in sections:
+            start, end = self._strip_span(text, *sections['intestazione'])
+            if end > start:
+                chunks.append(self._make_chunk(text, offsets, start, end, '001_metadata', 'metadata'))
 
         # Chunk 2: Fatti di causa
-        fatti_match = re.search(r'FATTI DI CAUSA', text, re.IGNORECASE)
-        if fatti_match:
-            start = fatti_match.start()
-
-            # Trova fine (prossima sezione MAIUSCOLA o RAGIONI/MOTIVI)
-            end_match = re.search(
-                r'(RAGIONI DELLA DECISIONE|MOTIVI DELLA DECISIONE|DIRITTO|P\.Q\.M\.)',
-                text[start:],
-                re.IGNORECASE
-            )
-
-            if end_match:
-                end = start + end_match.start()
+        if 'fatti' in sections:
+            start, end = self._strip_span(text, *sections['fatti'])
+            if end > start:
+                chunks.append(self._make_chunk(text, offsets, start, end, '002_fatti', 'fatti'))
+
+        # Chunk 3+: Motivi (numerati "1.-", "2.-", etc. oppure tutto insieme)
+        if 'motivazione' in sections:
+            if sections['motivi']:
+                for motivo_num, motivo_start, motivo_end in sections['motivi']:
+                    start, end = self._strip_span(text, motivo_start, motivo_end)
+                    if end > start:
+                        chunks.append(self._make_chunk(
+                            text, offsets, start, end,
+                            f'{int(motivo_num) + 2:03d}_motivo_{motivo_num}',
+                            f'motivo_{motivo_num}'
+                        ))
             else:
-                # Se non trova, prende fino a metà testo
-                end = start + len(text[start:]) // 2
+                start, end = self._strip_span(text, *sections['motivazione'])
+                if end > start:
+                    chunks.append(self._make_chunk(text, offsets, start, end, '003_motivazione', 'motivazione'))
 
-            fatti_text = text[start:end].strip()
-
-            if fatti_text:
-                chunks.append({
-                    'chunk_id': '002_fatti',
-                    'type': 'fatti',
-                    'content': fatti_text,
-                    'char_count': len(fatti_text),
-                    'token_count': self._count_tokens(fatti_text)
-                })
+        # Chunk finale: Dispositivo (P.Q.M.)
+        if 'dispositivo' in sections:
+            start, end = self._strip_span(text, *sections['dispositivo'])
+            if end > start:
+                chunks.append(self._make_chunk(text, offsets, start, end, '999_dispositivo', 'dispositivo'))
 
-        # Chunk 3+: Motivi (cerca pattern numerati: "1.-", "2.-", etc.)
-        motivi_match = re.search(
-            r'(RAGIONI DELLA DECISIONE|MOTIVI DELLA DECISIONE)',
-            text,
-            re.IGNORECASE
-        )
+        return chunks
 
-        if motivi_match:
-            motivi_start = motivi_match.start()
+    @staticmethod
+    def _add_byte_offsets(text: str, chunks: List[Dict]):
+        """
+        Aggiunge start_byte/end_byte (UTF-8) ai chunks
 
-            # Trova fine motivi (P.Q.M.)
-            pqm_match = re.search(r'P\.Q\.M\.', text[motivi_start:], re.IGNORECASE)
-            if pqm_match:
-                motivi_end = motivi_start + pqm_match.start()
-            else:
-                motivi_end = len(text)
-
-            motivi_text = text[motivi_start:motivi_end]
-
-            # Cerca motivi numerati: "1.-", "2.-", etc.
-            motivo_splits = re.split(r'\n(\d+)\.-', motivi_text)
-
-            if len(motivo_splits) > 1:
-                # Ha motivi numerati
-                for i in range(1, len(motivo_splits), 2):
-                    if i + 1 < len(motivo_splits):
-                        motivo_num = motivo_splits[i]
-                        motivo_content = motivo_splits[i + 1].strip()
-
-                        if motivo_content:
-                            chunks.append({
-                                'chunk_id': f'{int(motivo_num) + 2:03d}_motivo_{motivo_num}',
-                                'type': f'motivo_{motivo_num}',
-                                'content': motivo_content,
-                                'char_count': len(motivo_content),
-                                'token_count': self._count_tokens(motivo_content)
-                            })
-            else:
-                # Nessun motivo numerato, prendi tutto insieme
-                if motivi_text.strip():
-                    chunks.append({
-                        'chunk_id': '003_motivazione',
-                        'type': 'motivazione',
-                        'content': motivi_text.strip(),
-                        'char_count': len(motivi_text.strip()),
-                        'token_count': self._count_tokens(motivi_text.strip())
-                    })
+        Una sola passata sul testo: le posizioni vengono ordinate e
+        convertite incrementalmente.
+        """
+        positions = sorted({c['start_pos'] for c in chunks} | {c['end_pos'] for c in chunks})
 
-        # Chunk finale: Dispositivo (P.Q.M.)
-        pqm_match = re.search(r'P\.Q\.M\.', text, re.IGNORECASE)
-        if pqm_match:
-            dispositivo_text = text[pqm_match.start():].strip()
+        byte_pos = {}
+        prev_char = 0
+        prev_byte = 0
+        for pos in positions:
+            prev_byte += len(text[prev_char:pos].encode('utf-8'))
+            prev_char = pos
+            byte_pos[pos] = prev_byte
 
-            if dispositivo_text:
-                chunks.append({
-                    'chunk_id': '999_dispositivo',
-                    'type': 'dispositivo',
-                    'content': dispositivo_text,
-                    'char_count': len(dispositivo_text),
-                    'token_count': self._count_tokens(dispositivo_text)
-                })
+        for chunk in chunks:
+            chunk['start_byte'] = byte_pos[chunk['start_pos']]
+            chunk['end_byte'] = byte_pos[chunk['end_pos']]
 
-        return chunks
+    def _snap_end(self, text: str, min_end: int, limit: int) -> int:
+        """
+        Sceglie la fine del chunk in [min_end, limit] sul separatore più forte
 
-    def _fixed_size_chunking(self, text: str) -> List[Dict]:
+        Ordine: paragrafo, riga, frase (il punto resta nel chunk), parola.
+        Se nessun separatore è presente il taglio avviene a `limit`
+        (confine di token).
         """
-        Fixed-size chunking con RecursiveCharacterTextSplitter
+        for sep in self.separators:
+            pos = text.rfind(sep, min_end, limit)
+            if pos != -1:
+                return pos + len(sep.rstrip())
+        return limit
+
+    def _snap_start(self, text: str, start: int, limit: int) -> int:
+        """Porta l'inizio dell'overlap all'inizio della parola successiva"""
+        if start == 0 or text[start - 1].isspace():
+            return start
+        for pos in range(start, limit):
+            if text[pos].isspace():
+                return pos + 1
+        return start
+
+    def _fixed_size_chunking(self, text: str, offsets: List[int]) -> List[Dict]:
+        """
+        Fixed-size chunking direttamente sull'array di token
+
+        I confini sono calcolati sugli offset dei token già calcolati:
+        nessuna ri-tokenizzazione per chunk e nessuna ricerca del chunk nel
+        testo (start_pos/end_pos sono esatti per costruzione).
 
         Parametri:
         - Chunk size: 512 token
         - Overlap: 50 token
         - Separators: \\n\\n, \\n, ". ", " "
         """
-        # Split testo
-        text_chunks = self.text_splitter.split_text(text)
-
         chunks = []
-        current_pos = 0
+        n_tokens = len(offsets)
+        start_tok = 0
+        prev_end_char = 0
+        prev_end_pos = 0
 
-        for idx, chunk_text in enumerate(text_chunks):
-            # Trova posizione nel testo originale
-            start_pos = text.find(chunk_text, current_pos)
-            if start_pos == -1:
-                start_pos = current_pos
+        while start_tok < n_tokens:
+            start_char = offsets[start_tok]
+            limit_tok = start_tok + self.chunk_size
 
-            end_pos = start_pos + len(chunk_text)
+            if limit_tok >= n_tokens:
+                end_char = len(text)
+            else:
+                # Separatore oltre la dimensione minima e oltre la fine del
+                # chunk precedente: ogni chunk finisce dopo il precedente
+                min_tok = min(start_tok + self.min_chunk_tokens, limit_tok)
+                min_end = max(offsets[min_tok], prev_end_char + 1)
+                end_char = self._snap_end(text, min_end, offsets[limit_tok])
+
+            start_pos, end_pos = self._strip_span(text, start_char, end_char)
+            prev_end_char = end_char
+
+            # Mai un chunk contenuto nel precedente
+            if end_pos > start_pos and end_pos > prev_end_pos:
+                prev_end_pos = end_pos
+                chunk_text = text[start_pos:end_pos]
+                chunks.append({
+                    'chunk_id': f'fixed_{len(chunks) + 1:03d}',
+                    'content': chunk_text,
+                    'char_count': len(chunk_text),
+                    'token_count': self._span_tokens(offsets, start_pos, end_pos),
+                    'start_pos': start_pos,
+                    'end_pos': end_pos
+                })
 
-            chunks.append({
-                'chunk_id': f'fixed_{idx + 1:03d}',
-                'content': chunk_text,
-                'char_count': len(chunk_text),
-                'token_count': self._count_tokens(chunk_text),
-                'start_pos': start_pos,
-                'end_pos': end_pos
-            })
+            if limit_tok >= n_tokens:
+                break
 
-            current_pos = end_pos
+            # Prossimo chunk: arretra di `chunk_overlap` token dalla fine
+            # (senza overlap se il chunk è più corto dell'overlap stesso)
+            end_tok = bisect_left(offsets, end_char)
+            next_tok = end_tok - self.chunk_overlap
+            if next_tok <= start_tok:
+                next_tok = end_tok
+            next_char = self._snap_start(text, offsets[next_tok], end_char)
+            start_tok = max(bisect_right(offsets, next_char) - 1, start_tok + 1)
 
         return chunks
 
-    def save_results(self, results: Dict, output_path: Path):
-        """Salva chunks in JSON"""
+    def save_results(self, results: Dict, output_path: Path, store_content: bool = False):
+        """
+        Salva chunks in JSON
+
+        Args:
+            results: Output di process_text
+            output_path: Path JSON
+            store_content: Se False salva solo gli span (il testo si ricava
+                dal TXT con chunk_reader.load_chunks)
+        """
+        if not store_content:
+            results = dict(results)
+            for key in ('semantic_chunks', 'fixed_chunks'):
+                results[key] = [
+                    {k: v for k, v in chunk.items() if k != 'content'}
+                    for chunk in results[key]
+                ]
+
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(results, f, ensure_ascii=False, indent=2)
 
         print(f"✓ Salvato: {output_path}")
 
 
-def process_sentenza_chunking(txt_path: Path, sentenza_id: str, output_dir: Path) -> Dict:
+def process_sentenza_chunking(txt_path: Path, sentenza_id: str, output_dir: Path,
+                              sections: Optional[Dict] = None,
+                              store_content: bool = False) -> Dict:
     """
     Processa una sentenza e genera chunks
 
@@ -235,21 +309,24 @@ def process_sentenza_chunking(txt_path: Path, sentenza_id: str, output_dir: Path
         txt_path: Path al TXT estratto
         sentenza_id: ID sentenza
         output_dir: Directory output
+        sections: Span da segment_sections (opzionale)
+        store_content: Se True salva anche il testo di ogni chunk
 
     Returns:
         Statistiche chunking
     """
-    # Carica testo
-    with open(txt_path, 'r', encoding='utf-8') as f:
+    # Carica testo (newline='' mantiene gli offset in byte allineati al file)
+    with open(txt_path, 'r', encoding='utf-8', newline='') as f:
         text = f.read()
 
     # Processa chunking
     processor = ChunkingProcessor()
-    results = processor.process_text(text, sentenza_id)
+    results = processor.process_text(text, sentenza_id, sections=sections)
+    results['txt_file'] = str(txt_path)
 
     # Salva risultati
     output_path = output_dir / f"{sentenza_id}_chunks.json"
-    processor.save_results(results, output_path)
+    processor.save_results(results, output_path, store_content=store_content)
 
     return {
         'sentenza_id': sentenza_id,
@@ -282,9 +359,8 @@ if __name__ == '__main__':
     print(f"\n✓ Output: {stats['output_file']}")
     print("="*80)
 
-    # Mostra preview chunks semantici
-    with open(stats['output_file'], 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # Mostra preview chunks semantici (testo ricavato dagli span)
+    data = load_chunks(Path(stats['output_file']), txt_path)
 
     print("\n" + "="*80)
     print("PREVIEW SEMANTIC CHUNKS:")
@@ -4,13 +4,14 @@ Embeddings Generator - Step 5
 Genera embeddings con sentence-transformers per semantic search
 """
 
-import json
 import numpy as np
 from pathlib import Path
 from typing import Dict, List
 from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 
+from chunk_reader import load_chunks
+
 class EmbeddingsGenerator:
     """Genera embeddings per chunks con sentence-transformers"""
 
@@ -24,20 +25,21 @@ class EmbeddingsGenerator:
         self.model_name = model_name
         print(f"✓ Modello caricato (dimensioni: {self.model.get_sentence_embedding_dimension()})")
 
-    def generate_embeddings(self, chunks_path: Path, use_both: bool = False) -> Dict:
+    def generate_embeddings(self, chunks_path: Path, use_both: bool = False,
+                            sentenza_id: str = None) -> Dict:
         """
         Genera embeddings per chunks
 
         Args:
-            chunks_path: Path al JSON chunks
+            chunks_path: Path al JSON chunks o al chunk store (.schk)
             use_both: Se True usa semantic+fixed, altrimenti solo semantic
+            sentenza_id: ID sentenza (necessario con chunk store)
 
         Returns:
             Dict con embeddings e metadata
         """
-        # Carica chunks
-        with open(chunks_path, 'r', encoding='utf-8') as f:
-            chunks_data = json.load(f)
+        # Carica chunks (testo dal TXT via memory map se il JSON ha solo span)
+        chunks_data = load_chunks(chunks_path, sentenza_id=sentenza_id)
 
         sentenza_id = chunks_data['sentenza_id']
         print(f"\nGenerazione embeddings per {sentenza_id}...")
@@ -105,7 +107,7 @@ def process_sentenza_embeddings(chunks_path: Path, sentenza_id: str,
     Processa una sentenza e genera embeddings
 
     Args:
-        chunks_path: Path al JSON chunks
+        chunks_path: Path al JSON chunks o al chunk store (.schk)
         sentenza_id: ID sentenza
         output_dir: Directory output
         use_both: Se True usa semantic+fixed chunks
@@ -137,7 +139,7 @@ def process_sentenza_embeddings(chunks_path: Path, sentenza_id: str,
 
     # Genera embeddings
     generator = EmbeddingsGenerator()
-    results = generator.generate_embeddings(chunks_path, use_both=use_both)
+    results = generator.generate_embeddings(chunks_path, use_both=use_both, sentenza_id=sentenza_id)
 
     # Salva
     generator.save_embeddings(results, output_path)
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Hybrid Search - Ricerca ibrida BM25 + embeddings
+Combina la ricerca lessicale (FTS5, search_index) con quella semantica
+(embeddings dei chunks) tramite Reciprocal Rank Fusion.
+
+- Norme e numeri ("art. 7", "504/1995") trovati dalla parte lessicale
+- Concetti e parafrasi trovati dalla parte semantica
+- Le due ricerche girano in parallelo (sqlite3 e numpy rilasciano il GIL)
+- Risultati a livello di chunk con span e snippet evidenziato
+
+Requisiti: pip install numpy sentence-transformers
+Prerequisiti: search_index build --chunks ... e hybrid_search build-vectors
+"""
+
+import json
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from search_index import SearchIndex, DEFAULT_DB
+
+DEFAULT_INDEX_DIR = Path("search/vectors")
+RRF_K = 60
+
+DEFAULT_QUERIES = [
+    "art. 7 d.lgs. 504/1995",
+    "contraddittorio preventivo endoprocedimentale",
+    "reverse charge IVA detrazione",
+    "studi di settore accertamento analitico-induttivo",
+    "notifica cartella di pagamento decadenza",
+    "credito d'imposta investimenti nel Mezzogiorno",
+    "giudicato esterno tributario",
+    "motivazione apparente sentenza CTR",
+]
+
+
+def reciprocal_rank_fusion(rankings: List[List], k: int = RRF_K) -> List:
+    """
+    Reciprocal Rank Fusion: score(d) = Σ 1 / (k + rank(d))
+
+    Args:
+        rankings: Liste di chiavi ordinate per rilevanza (una per sistema)
+        k: Costante di smorzamento (60 come nel paper originale)
+
+    Returns:
+        Lista (chiave, score) ordinata per score decrescente
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class VectorIndex:
+    """Matrice embeddings normalizzati di tutti i chunks (memory map)"""
+
+    def __init__(self, index_dir: Path = DEFAULT_INDEX_DIR):
+        index_dir = Path(index_dir)
+        self.vectors = np.load(index_dir / 'vectors.npy', mmap_mode='r')
+
+        with open(index_dir / 'keys.json', 'r', encoding='utf-8') as f:
+            info = json.load(f)
+
+        self.model_name = info['model_name']
+        self.keys = [tuple(key) for key in info['keys']]
+        # Anno dall'ID sentenza (es: snciv2020529915I → 2020) per i filtri
+        self.anni = np.array([sid[5:9] for sid, _ in self.keys])
+
+    @staticmethod
+    def build(embeddings_dir: Path, index_dir: Path = DEFAULT_INDEX_DIR) -> Dict:
+        """
+        Unisce gli embeddings .npz di tutte le sentenze in un'unica matrice
+
+        I vettori vengono normalizzati: il prodotto scalare è la similarità coseno.
+        """
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+
+        keys = []
+        matrices = []
+        model_name = None
+
+        for path in sorted(Path(embeddings_dir).glob('*_embeddings.npz')):
+            sentenza_id = path.name[:-len('_embeddings.npz')]
+            data = np.load(path)
+            matrix = data['embeddings'].astype(np.float32)
+            model_name = model_name or str(data['model_name'])
+
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrices.append(matrix / np.maximum(norms, 1e-12))
+            keys.extend((sentenza_id, str(chunk_id)) for chunk_id in data['chunk_ids'])
+
+        if not matrices:
+            raise FileNotFoundError(f"Nessun embedding in {embeddings_dir}")
+
+        vectors = np.concatenate(matrices)
+        np.save(index_dir / 'vectors.npy', vectors)
+
+        with open(index_dir / 'keys.json', 'w', encoding='utf-8') as f:
+            json.dump({'model_name': model_name, 'dim': vectors.shape[1], 'keys': keys}, f)
+
+        return {'documents': len(matrices), 'chunks': len(keys), 'dim': vectors.shape[1]}
+
+    def search(self, query_vector: np.ndarray, k: int = 50, anno: Optional[str] = None) -> List:
+        """Top-k chunks per similarità coseno"""
+        scores = self.vectors @ query_vector
+        if anno is not None:
+            scores = np.where(self.anni == anno, scores, -np.inf)
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [(self.keys[i], float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+
+class HybridSearch:
+    """Motore di ricerca ibrido (BM25 chunks + embeddings) con RRF"""
+
+    def __init__(self, db_path: Path = DEFAULT_DB, index_dir: Path = DEFAULT_INDEX_DIR,
+                 model_name: Optional[str] = None, candidates: int = 50, rrf_k: int = RRF_K):
+        """
+        Args:
+            db_path: Database search_index (con chunks indicizzati)
+            index_dir: Directory VectorIndex
+            model_name: Modello embeddings (default: quello usato per l'indice)
+            candidates: Candidati per ciascuna ricerca prima della fusione
+            rrf_k: Costante RRF
+        """
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError("Installa: pip install sentence-transformers")
+
+        self.index = SearchIndex(db_path, check_same_thread=False)
+        self.vectors = VectorIndex(index_dir)
+
+        model_name = model_name or self.vectors.model_name
+        print(f"Caricamento modello {model_name}...")
+        self.model = SentenceTransformer(model_name)
+
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.executor = ThreadPoolExecutor(max_workers=2)
+
+    def _lexical(self, query: str, anno: Optional[str]):
+        start = time.perf_counter()
+        hits = self.index.search_chunks(query, anno=anno, limit=self.candidates, operator='OR')
+        return hits, time.perf_counter() - start
+
+    def _semantic(self, query: str, anno: Optional[str]):
+        start = time.perf_counter()
+        query_vector = self.model.encode(query, convert_to_numpy=True, normalize_embeddings=True)
+        hits = self.vectors.search(query_vector.astype(np.float32), k=self.candidates, anno=anno)
+        return hits, time.perf_counter() - start
+
+    def search(self, query: str, k: int = 10, anno: Optional[str] = None) -> Dict:
+        """
+        Ricerca ibrida
+
+        Args:
+            query: Testo libero
+            k: Numero risultati
+            anno: Filtro anno (opzionale)
+
+        Returns:
+            {
+                'results': [{sentenza_id, chunk_id, type, start_pos, end_pos,
+                             score, lexical_rank, semantic_rank, snippet}],
+                'timings': {lexical_ms, semantic_ms, total_ms}
+            }
+        """
+        start = time.perf_counter()
+
+        lexical_future = self.executor.submit(self._lexical, query, anno)
+        semantic_future = self.executor.submit(self._semantic, query, anno)
+        lexical_hits, lexical_time = lexical_future.result()
+        semantic_hits, semantic_time = semantic_future.result()
+
+        lexical_keys = [(h['sentenza_id'], h['chunk_id']) for h in lexical_hits]
+        semantic_keys = [key for key, _ in semantic_hits]
+        fused = reciprocal_rank_fusion([lexical_keys, semantic_keys], self.rrf_k)[:k]
+
+        lexical_by_key = dict(zip(lexical_keys, lexical_hits))
+        lexical_rank = {key: i for i, key in enumerate(lexical_keys, 1)}
+        semantic_rank = {key: i for i, key in enumerate(semantic_keys, 1)}
+
+        # Chunks trovati solo semanticamente: span e inizio testo dal database
+        missing = [key for key, _ in fused if key not in lexical_by_key]
+        details = self.index.get_chunks(missing)
+
+        results = []
+        for key, score in fused:
+            hit = lexical_by_key.get(key) or details.get(key)
+            if hit is None:
+                continue
+            results.append({
+                'sentenza_id': key[0],
+                'chunk_id': key[1],
+                'type': hit['type'],
+                'start_pos': hit['start_pos'],
+                'end_pos': hit['end_pos'],
+                'score': score,
+                'lexical_rank': lexical_rank.get(key),
+                'semantic_rank': semantic_rank.get(key),
+                'snippet': hit['snippet'],
+            })
+
+        return {
+            'results': results,
+            'timings': {
+                'lexical_ms': lexical_time * 1000,
+                'semantic_ms': semantic_time * 1000,
+                'total_ms': (time.perf_counter() - start) * 1000,
+            }
+        }
+
+    def close(self):
+        self.executor.shutdown()
+        self.index.close()
+
+
+def benchmark(engine: HybridSearch, queries: List[str], repeat: int = 5) -> Dict:
+    """
+    Latenza (p50 / p95 / max in ms) di ricerca lessicale, semantica e ibrida
+
+    La prima esecuzione di ogni query (cache fredda) è esclusa.
+    """
+    for query in queries:
+        engine.search(query)
+
+    timings = {'lexical_ms': [], 'semantic_ms': [], 'total_ms': []}
+    for _ in range(repeat):
+        for query in queries:
+            result = engine.search(query)
+            for name, value in result['timings'].items():
+                timings[name].append(value)
+
+    stats = {}
+    for name, values in timings.items():
+        values = np.array(values)
+        stats[name] = {
+            'p50': float(np.percentile(values, 50)),
+            'p95': float(np.percentile(values, 95)),
+            'max': float(values.max()),
+        }
+    stats['queries'] = len(queries) * repeat
+    stats['chunks'] = len(engine.vectors.keys)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ricerca ibrida BM25 + embeddings (Reciprocal Rank Fusion)")
+    parser.add_argument("--db", type=str, default=str(DEFAULT_DB), help=f"Database search_index (default: {DEFAULT_DB})")
+    parser.add_argument("--index-dir", type=str, default=str(DEFAULT_INDEX_DIR),
+                        help=f"Directory indice vettoriale (default: {DEFAULT_INDEX_DIR})")
+    subparsers = parser.add_subparsers(dest='command', help='Comando da eseguire')
+
+    build_parser = subparsers.add_parser('build-vectors', help='Crea l\'indice vettoriale da embeddings/')
+    build_parser.add_argument("--embeddings-dir", type=str, default="embeddings", help="Directory embeddings (default: embeddings)")
+
+    search_parser = subparsers.add_parser('search', help='Ricerca ibrida')
+    search_parser.add_argument("query", type=str, help="Testo da cercare")
+    search_parser.add_argument("--k", type=int, default=10, help="Numero risultati (default: 10)")
+    search_parser.add_argument("--anno", type=str, default=None, help="Filtro anno")
+
+    bench_parser = subparsers.add_parser('bench', help='Benchmark latenza')
+    bench_parser.add_argument("--queries", type=str, default=None, help="File con una query per riga (default: query di esempio)")
+    bench_parser.add_argument("--repeat", type=int, default=5, help="Ripetizioni (default: 5)")
+
+    args = parser.parse_args()
+
+    if args.command == 'build-vectors':
+        print(f"🧮 Indice vettoriale da {args.embeddings_dir}...")
+        stats = VectorIndex.build(Path(args.embeddings_dir), Path(args.index_dir))
+        print(f"✅ {stats['chunks']:,} chunks da {stats['documents']:,} sentenze (dim {stats['dim']})")
+        return
+
+    if args.command not in ('search', 'bench'):
+        parser.print_help()
+        return
+
+    engine = HybridSearch(Path(args.db), Path(args.index_dir))
+
+    try:
+        if args.command == 'search':
+            result = engine.search(args.query, k=args.k, anno=args.anno)
+            t = result['timings']
+            print(f"🔎 {len(result['results'])} risultati in {t['total_ms']:.1f} ms "
+                  f"(BM25 {t['lexical_ms']:.1f} ms | embeddings {t['semantic_ms']:.1f} ms)\n")
+
+            for i, r in enumerate(result['results'], 1):
+                ranks = f"bm25 #{r['lexical_rank'] or '-'} | emb #{r['semantic_rank'] or '-'}"
+                print(f"{i:>2}. {r['sentenza_id']} {r['chunk_id']} [{r['start_pos']}:{r['end_pos']}] "
+                      f"(rrf {r['score']:.4f} | {ranks})")
+                print(f"    {' '.join(r['snippet'].split())}")
+
+        else:
+            queries = DEFAULT_QUERIES
+            if args.queries:
+                queries = [q.strip() for q in Path(args.queries).read_text(encoding='utf-8').splitlines() if q.strip()]
+
+            stats = benchmark(engine, queries, repeat=args.repeat)
+
+            print("="*80)
+            print(f"HYBRID SEARCH - Benchmark ({stats['queries']} query su {stats['chunks']:,} chunks)")
+            print("="*80)
+            for name, label in (('lexical_ms', 'BM25 (FTS5)'), ('semantic_ms', 'Embeddings'),
+                                ('total_ms', 'Ibrida (parallela)')):
+                s = stats[name]
+                print(f"{label:<20} p50 {s['p50']:7.1f} ms | p95 {s['p95']:7.1f} ms | max {s['max']:7.1f} ms")
+            print("="*80)
+    finally:
+        engine.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -155,12 +155,7 @@ Rispondi SOLO con il JSON, senza altre spiegazioni."""
 
         for attempt in range(max_retries):
             try:
-                if self.backend == "claude":
-                    response = self._extract_claude(prompt)
-                elif self.backend == "gemini":
-                    response = self._extract_gemini(prompt)
-                elif self.backend == "ollama":
-                    response = self._extract_ollama(prompt)
+                response = self.complete(prompt)
 
                 # Parse JSON response
                 entities = self._parse_response(response)
@@ -176,6 +171,16 @@ Rispondi SOLO con il JSON, senza altre spiegazioni."""
 
         return self._empty_entities()
 
+    def complete(self, prompt: str) -> str:
+        """Risposta testuale del backend a un prompt (usato anche dalla categorizzazione)"""
+        if self.backend == "claude":
+            return self._extract_claude(prompt)
+        elif self.backend == "gemini":
+            return self._extract_gemini(prompt)
+        elif self.backend == "ollama":
+            return self._extract_ollama(prompt)
+        raise ValueError(f"Backend non supportato: {self.backend}")
+
     def _extract_claude(self, prompt: str) -> str:
         """Estrae usando Claude API"""
         message = self.client.messages.create(
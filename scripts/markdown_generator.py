@@ -4,26 +4,62 @@ Markdown Generator - Step 7 (FIXED)
 Genera Markdown AI-optimized con frontmatter YAML - TESTO COMPLETO
 """
 
+import io
 import json
 import re
+import time
 import yaml
 from pathlib import Path
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from chunk_reader import load_chunks, load_chunks_many
+from section_segmenter import segment_sections
+from header_parser import HeaderMetadata, parse_header
+from txt_archive import DEFAULT_ARCHIVE_DIR, list_sentenza_ids, read_sentenza_text
+
+# Dumper C di PyYAML se disponibile (stesso output, molto più veloce)
+YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+TITLE_TEMPLATE = (
+    "# Sentenza Cassazione n. {numero}/{anno}\n\n"
+    "**Sezione {sezione} Civile** | **Pubblicata: {data_pub}**\n\n"
+)
+SECTION_TEMPLATE = "## {title}\n\n{content}\n\n"
+FOOTER = "\n---\n\n*Documento generato automaticamente | Fonte: Corte Suprema di Cassazione*"
+
+VALUTAZIONE_PHRASES = ('la censura', 'il motivo', 'la doglianza', 'infondat', 'fondat')
+
+# Sezione entità: etichetta → gruppi fabiod20 (nell'ordine di stampa)
+ENTITY_SECTIONS = (
+    ('Ricorrente', ('RCR',)),
+    ('Controricorrente', ('CTR',)),
+    ('Avvocati', ('AVV',)),
+    ('Giudici/Consiglieri', ('CNS', 'GIU')),
+    ('Presidente', ('PRE',)),
+    ('Relatore', ('REL',)),
+    ('Riferimenti registro', ('RIC',)),
+    ('Tribunali', ('TRI',)),
+)
+
+
 class MarkdownGenerator:
     """Genera Markdown ottimizzato per AI/RAG da dati estratti"""
 
     def generate(self, txt_path: Path, entities_path: Path,
-                 chunks_path: Path, sentenza_id: str) -> str:
+                 chunks_path: Path, sentenza_id: str,
+                 sections: Optional[Dict] = None,
+                 header: Optional[HeaderMetadata] = None) -> str:
         """
         Genera Markdown completo
 
         Args:
             txt_path: Path al TXT estratto
             entities_path: Path al JSON entities
-            chunks_path: Path al JSON chunks
+            chunks_path: Path al JSON chunks o al chunk store (.schk)
             sentenza_id: ID sentenza
+            sections: Span da segment_sections (calcolati qui se assenti)
+            header: Metadata da parse_header (calcolati qui se assenti)
 
         Returns:
             Stringa Markdown completa
@@ -35,72 +71,55 @@ class MarkdownGenerator:
         with open(entities_path, 'r', encoding='utf-8') as f:
             entities = json.load(f)
 
-        with open(chunks_path, 'r', encoding='utf-8') as f:
-            chunks_data = json.load(f)
+        chunks_data = load_chunks(chunks_path, txt_path, sentenza_id=sentenza_id)
 
-        # Estrai metadata
-        metadata = self._extract_metadata(text, sentenza_id, entities)
+        return self.render(text, entities, chunks_data, sentenza_id, sections, header)
 
-        # Costruisci frontmatter YAML
-        frontmatter = self._build_frontmatter(metadata, text)
+    def render(self, text: str, entities: Dict, chunks_data: Dict, sentenza_id: str,
+               sections: Optional[Dict] = None,
+               header: Optional[HeaderMetadata] = None) -> str:
+        """
+        Genera Markdown da dati già in memoria (nessun accesso a disco)
+
+        Args:
+            text: Testo sentenza
+            entities: Entities JSON
+            chunks_data: Chunks (con 'content' o solo span)
+            sentenza_id: ID sentenza
+            sections: Span da segment_sections (calcolati qui se assenti)
+            header: Metadata da parse_header (calcolati qui se assenti)
+
+        Returns:
+            Stringa Markdown completa
+        """
+        if sections is None:
+            sections = segment_sections(text)
 
-        # Costruisci corpo markdown
-        body = self._build_body(metadata, chunks_data, entities, text)
+        # Estrai metadata
+        metadata = self._extract_metadata(text, sentenza_id, entities, sections, header)
 
-        # Combina
-        markdown = f"---\n{yaml.dump(frontmatter, allow_unicode=True, sort_keys=False)}---\n\n{body}"
+        # Frontmatter YAML + corpo in un unico buffer
+        out = io.StringIO()
+        out.write("---\n")
+        yaml.dump(self._build_frontmatter(metadata, text), out, Dumper=YAML_DUMPER,
+                  allow_unicode=True, sort_keys=False)
+        out.write("---\n\n")
+        self._write_body(out, metadata, self._index_chunks(chunks_data, text), entities)
 
-        return markdown
+        return out.getvalue()
 
-    def _extract_metadata(self, text: str, sentenza_id: str, entities: Dict) -> Dict:
+    def _extract_metadata(self, text: str, sentenza_id: str, entities: Dict,
+                          sections: Optional[Dict] = None,
+                          header: Optional[HeaderMetadata] = None) -> Dict:
         """Estrae metadata dal testo e entities"""
 
+        # Header parsing (prime righe), condiviso con akoma_ntoso_generator
+        header = header or parse_header(text)
+
         metadata = {'id': sentenza_id}
-        lines = text.split('\n')
-
-        # Parse header (prime 20 righe)
-        for line in lines[:20]:
-            # Numero
-            if 'Num.' in line:
-                match = re.search(r'Num\.\s+(\d+)', line)
-                if match:
-                    metadata['numero'] = match.group(1)
-
-            # Anno
-            if 'Anno' in line:
-                match = re.search(r'Anno\s+(\d{4})', line)
-                if match:
-                    metadata['anno'] = int(match.group(1))
-
-            # Sezione
-            if 'Sez.' in line:
-                match = re.search(r'Sez\.\s+(\d+|[A-Z]+)', line)
-                if match:
-                    metadata['sezione'] = match.group(1)
-
-            # Presidente
-            if 'Presidente:' in line:
-                metadata['presidente'] = line.split('Presidente:')[1].strip()
-
-            # Relatore
-            if 'Relatore:' in line:
-                metadata['relatore'] = line.split('Relatore:')[1].strip()
-
-            # Data pubblicazione
-            if 'Data pubblicazione:' in line:
-                match = re.search(r'(\d{1,2}/\d{1,2}/\d{4})', line)
-                if match:
-                    metadata['data_pubblicazione'] = match.group(1)
-
-            # RG
-            if 'R.G.' in line or 'Registro:' in line:
-                match = re.search(r'n\.\s*([\d/]+)', line)
-                if match:
-                    metadata['rg_numero'] = match.group(1)
-
-            # Oggetto
-            if 'Oggetto:' in line:
-                metadata['oggetto'] = line.split('Oggetto:')[1].strip()
+        metadata.update(header.to_dict())
+        if 'registro' in metadata:
+            metadata['rg_numero'] = metadata.pop('registro')
 
         # Estrai parti da entities
         entity_list = entities.get('entities', [])
@@ -110,10 +129,14 @@ class MarkdownGenerator:
             elif entity['entity_group'] == 'CTR':
                 metadata['controricorrente'] = entity['word']
 
-        # Estrai esito dal dispositivo
-        if 'Rigetta il ricorso' in text or 'rigetta il ricorso' in text:
+        # Estrai esito dal dispositivo (tutto il testo se P.Q.M. non trovato)
+        dispositivo = text
+        if sections and 'dispositivo' in sections:
+            dispositivo = text[sections['dispositivo'][0]:]
+
+        if 'Rigetta il ricorso' in dispositivo or 'rigetta il ricorso' in dispositivo:
             metadata['esito'] = 'rigetto'
-        elif 'Accoglie il ricorso' in text or 'accoglie il ricorso' in text:
+        elif 'Accoglie il ricorso' in dispositivo or 'accoglie il ricorso' in dispositivo:
             metadata['esito'] = 'accoglimento'
         else:
             metadata['esito'] = 'altro'
@@ -170,8 +193,9 @@ class MarkdownGenerator:
             'contraddittorio': 'contraddittorio_preventivo'
         }
 
+        inizio = text[:5000].lower()
         for keyword, tag in keyword_map.items():
-            if keyword in oggetto or keyword in text.lower()[:5000]:
+            if keyword in oggetto or keyword in inizio:
                 if tag not in materie:
                     materie.append(tag)
 
@@ -204,122 +228,90 @@ class MarkdownGenerator:
 
         return frontmatter
 
-    def _build_body(self, metadata: Dict, chunks_data: Dict,
-                    entities: Dict, text: str) -> str:
-        """Costruisce corpo Markdown - TESTO COMPLETO"""
+    def _index_chunks(self, chunks_data: Dict, text: str) -> Dict:
+        """
+        Indicizza i chunks semantici per tipo in una sola passata
 
-        lines = []
+        Il contenuto mancante (chunks salvati solo come span) viene
+        ricavato dal testo già in memoria.
+        """
+        index = {'motivi': []}
+        for chunk in chunks_data['semantic_chunks']:
+            content = chunk.get('content')
+            if content is None:
+                content = text[chunk['start_pos']:chunk['end_pos']]
+
+            chunk_type = chunk['type']
+            if chunk_type.startswith('motivo_'):
+                index['motivi'].append((chunk_type.split('_')[-1], content))
+            else:
+                index.setdefault(chunk_type, content)
+        return index
+
+    def _write_body(self, out, metadata: Dict, chunk_index: Dict, entities: Dict):
+        """Scrive il corpo Markdown nel writer (chunks già indicizzati)"""
+        write = out.write
 
         # Titolo
-        numero = metadata.get('numero', 'N/A')
-        anno = metadata.get('anno', 'N/A')
-        lines.append(f"# Sentenza Cassazione n. {numero}/{anno}\n")
-
-        sezione = metadata.get('sezione', 'N/A')
-        data_pub = metadata.get('data_pubblicazione', 'N/A')
-        lines.append(f"**Sezione {sezione} Civile** | **Pubblicata: {data_pub}**\n")
+        write(TITLE_TEMPLATE.format(
+            numero=metadata.get('numero', 'N/A'),
+            anno=metadata.get('anno', 'N/A'),
+            sezione=metadata.get('sezione', 'N/A'),
+            data_pub=metadata.get('data_pubblicazione', 'N/A')
+        ))
 
         # Sintesi (prime righe oggetto o fatti)
         if 'oggetto' in metadata:
-            lines.append(f"## 📋 Oggetto\n\n{metadata['oggetto']}\n")
+            write(f"## 📋 Oggetto\n\n{metadata['oggetto']}\n\n")
 
         # Parti
-        lines.append("## 👥 Parti\n")
+        write("## 👥 Parti\n\n")
         if 'ricorrente' in metadata:
-            lines.append(f"**Ricorrente**: {metadata['ricorrente']}  ")
+            write(f"**Ricorrente**: {metadata['ricorrente']}  \n")
         if 'controricorrente' in metadata:
-            lines.append(f"**Controricorrente**: {metadata['controricorrente']}  ")
-        lines.append("")
+            write(f"**Controricorrente**: {metadata['controricorrente']}  \n")
+        write("\n")
 
         # Fatti di causa - TESTO COMPLETO
-        fatti_chunk = next((c for c in chunks_data['semantic_chunks'] if c['type'] == 'fatti'), None)
-        if fatti_chunk:
-            lines.append("## 📖 Fatti di Causa\n")
-            lines.append(fatti_chunk['content'] + "\n")
+        if 'fatti' in chunk_index:
+            write(SECTION_TEMPLATE.format(title="📖 Fatti di Causa", content=chunk_index['fatti']))
 
         # Motivi del ricorso - TESTO COMPLETO
-        motivi_chunks = [c for c in chunks_data['semantic_chunks']
-                        if c['type'].startswith('motivo_') and c['type'] != 'motivo']
-
-        if motivi_chunks:
-            lines.append("## ⚖️ Motivi e Valutazioni\n")
-
-            # Raggruppa per numero motivo se possibile
-            for i, chunk in enumerate(motivi_chunks, 1):
-                motivo_num = chunk['type'].split('_')[-1]
+        if chunk_index['motivi']:
+            write("## ⚖️ Motivi e Valutazioni\n\n")
 
+            for motivo_num, content in chunk_index['motivi']:
                 # Determina se è ricorrente o giudice (analisi euristica)
-                content_lower = chunk['content'][:200].lower()
+                content_lower = content[:200].lower()
                 if 'con il' in content_lower and 'motivo' in content_lower:
                     tipo = "Motivo Ricorrente"
-                elif any(phrase in content_lower for phrase in ['la censura', 'il motivo', 'la doglianza', 'infondat', 'fondat']):
+                elif any(phrase in content_lower for phrase in VALUTAZIONE_PHRASES):
                     tipo = "Valutazione Corte"
                 else:
                     tipo = "Blocco"
 
-                lines.append(f"### {tipo} {motivo_num}\n")
-                lines.append(chunk['content'] + "\n")
+                write(f"### {tipo} {motivo_num}\n\n{content}\n\n")
 
         # Dispositivo - TESTO COMPLETO
-        dispositivo_chunk = next((c for c in chunks_data['semantic_chunks']
-                                 if c['type'] == 'dispositivo'), None)
-        if dispositivo_chunk:
-            lines.append("## 🎯 Dispositivo\n")
-            lines.append(dispositivo_chunk['content'] + "\n")
+        if 'dispositivo' in chunk_index:
+            write(SECTION_TEMPLATE.format(title="🎯 Dispositivo", content=chunk_index['dispositivo']))
 
         # Entità estratte (fabiod20 legal-specific)
-        lines.append("## 🔗 Entità Estratte (NER)\n")
-
-        entity_list = entities.get('entities', [])
-
-        # Raggruppa per tipo (solo categorie fabiod20)
-        entity_groups = {
-            'RCR': [],
-            'CTR': [],
-            'AVV': [],
-            'CNS': [],
-            'RIC': [],
-            'GIU': [],
-            'PRE': [],
-            'REL': [],
-            'TRI': []
-        }
-
-        for e in entity_list:
-            entity_type = e['entity_group']
-            if entity_type in entity_groups:
-                entity_groups[entity_type].append(e['word'])
+        write("## 🔗 Entità Estratte (NER)\n\n")
 
-        # Componi sezioni
-        if entity_groups['RCR']:
-            lines.append(f"**Ricorrente**: {', '.join(set(entity_groups['RCR']))}  ")
+        # Raggruppa per tipo in una passata (dict ordinato = deduplica stabile)
+        entity_groups = {}
+        for e in entities.get('entities', []):
+            entity_groups.setdefault(e['entity_group'], {})[e['word']] = None
 
-        if entity_groups['CTR']:
-            lines.append(f"**Controricorrente**: {', '.join(set(entity_groups['CTR']))}  ")
+        for label, groups in ENTITY_SECTIONS:
+            words = {}
+            for group in groups:
+                words.update(entity_groups.get(group, {}))
+            if words:
+                write(f"**{label}**: {', '.join(words)}  \n")
 
-        if entity_groups['AVV']:
-            lines.append(f"**Avvocati**: {', '.join(set(entity_groups['AVV']))}  ")
-
-        if entity_groups['CNS'] or entity_groups['GIU']:
-            giudici = list(set(entity_groups['CNS'] + entity_groups['GIU']))
-            lines.append(f"**Giudici/Consiglieri**: {', '.join(giudici)}  ")
-
-        if entity_groups['PRE']:
-            lines.append(f"**Presidente**: {', '.join(set(entity_groups['PRE']))}  ")
-
-        if entity_groups['REL']:
-            lines.append(f"**Relatore**: {', '.join(set(entity_groups['REL']))}  ")
-
-        if entity_groups['RIC']:
-            lines.append(f"**Riferimenti registro**: {', '.join(set(entity_groups['RIC']))}  ")
-
-        if entity_groups['TRI']:
-            lines.append(f"**Tribunali**: {', '.join(set(entity_groups['TRI']))}  ")
-
-        lines.append("\n---\n")
-        lines.append("*Documento generato automaticamente | Fonte: Corte Suprema di Cassazione*")
-
-        return '\n'.join(lines)
+        write(FOOTER)
 
     def save_markdown(self, markdown: str, output_path: Path):
         """Salva Markdown con encoding UTF-8"""
@@ -330,7 +322,8 @@ class MarkdownGenerator:
 
 def process_sentenza_markdown(txt_path: Path, entities_path: Path,
                               chunks_path: Path, sentenza_id: str,
-                              output_dir: Path) -> Dict:
+                              output_dir: Path, sections: Optional[Dict] = None,
+                              header: Optional[HeaderMetadata] = None) -> Dict:
     """
     Processa una sentenza e genera Markdown AI-optimized
 
@@ -340,6 +333,8 @@ def process_sentenza_markdown(txt_path: Path, entities_path: Path,
         chunks_path: Path al JSON chunks
         sentenza_id: ID sentenza
         output_dir: Directory output
+        sections: Span da segment_sections (opzionale)
+        header: Metadata da parse_header (opzionale)
 
     Returns:
         Statistiche markdown
@@ -348,7 +343,8 @@ def process_sentenza_markdown(txt_path: Path, entities_path: Path,
 
     # Genera markdown
     print(f"Generazione Markdown per {sentenza_id}...")
-    markdown = generator.generate(txt_path, entities_path, chunks_path, sentenza_id)
+    markdown = generator.generate(txt_path, entities_path, chunks_path, sentenza_id,
+                                  sections=sections, header=header)
 
     # Salva
     output_path = output_dir / f"{sentenza_id}.md"
@@ -362,7 +358,93 @@ def process_sentenza_markdown(txt_path: Path, entities_path: Path,
     }
 
 
+def process_batch_markdown(sentenza_ids: List[str], txt_dir: Path, entities_dir: Path,
+                           chunks_source: Path, output_dir: Path,
+                           archive_dir: Path = DEFAULT_ARCHIVE_DIR) -> Dict:
+    """
+    Genera il Markdown di molte sentenze in un unico processo
+
+    Entities e chunks vengono precaricati una volta; per ogni sentenza si
+    legge solo il TXT (o il suo frame nell'archivio compresso) e il rendering
+    avviene interamente in memoria.
+
+    Args:
+        sentenza_ids: ID sentenze
+        txt_dir: Directory TXT
+        entities_dir: Directory entities JSON
+        chunks_source: Directory chunks JSON oppure chunk store (.schk)
+        output_dir: Directory output Markdown
+        archive_dir: Directory archivi .stxa (sentenze senza TXT estratto)
+
+    Returns:
+        Statistiche (documenti, saltati, docs/s)
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"📂 Precaricamento entities e chunks ({len(sentenza_ids)} sentenze)...")
+    entities = {}
+    for sid in sentenza_ids:
+        path = entities_dir / f"{sid}_entities.json"
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                entities[sid] = json.load(f)
+    chunks = load_chunks_many(sentenza_ids, chunks_source)
+
+    ready = [sid for sid in sentenza_ids if sid in entities and sid in chunks]
+    print(f"📋 Sentenze da generare: {len(ready)} ({len(sentenza_ids) - len(ready)} senza entities/chunks)")
+
+    generator = MarkdownGenerator()
+    processed = 0
+    total_bytes = 0
+    start = time.time()
+
+    for sid in ready:
+        text = read_sentenza_text(sid, txt_dir, archive_dir)
+        if text is None:
+            continue
+
+        markdown = generator.render(text, entities[sid], chunks[sid], sid)
+        with open(output_dir / f"{sid}.md", 'w', encoding='utf-8') as f:
+            total_bytes += f.write(markdown)
+        processed += 1
+
+        if processed % 100 == 0:
+            elapsed = time.time() - start
+            print(f"   [{processed}/{len(ready)}] {processed / elapsed:.1f} docs/s")
+
+    elapsed = time.time() - start
+
+    return {
+        'processed': processed,
+        'skipped': len(sentenza_ids) - processed,
+        'markdown_chars': total_bytes,
+        'elapsed_seconds': elapsed,
+        'docs_per_second': processed / elapsed if elapsed > 0 else 0
+    }
+
+
 if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="STEP 7: Markdown AI-optimized")
+    parser.add_argument("--batch", action="store_true", help="Genera tutte le sentenze di --txt-dir")
+    parser.add_argument("--txt-dir", type=str, default="txt", help="Directory TXT (default: txt)")
+    parser.add_argument("--archive-dir", type=str, default=str(DEFAULT_ARCHIVE_DIR),
+                        help=f"Directory archivi TXT .stxa (default: {DEFAULT_ARCHIVE_DIR})")
+    parser.add_argument("--entities-dir", type=str, default="entities", help="Directory entities (default: entities)")
+    parser.add_argument("--chunks", type=str, default="chunks", help="Directory chunks JSON o chunk store .schk (default: chunks)")
+    parser.add_argument("--output-dir", type=str, default="markdown_ai", help="Directory output (default: markdown_ai)")
+    args = parser.parse_args()
+
+    if args.batch:
+        ids = list_sentenza_ids(Path(args.txt_dir), Path(args.archive_dir))
+        stats = process_batch_markdown(ids, Path(args.txt_dir), Path(args.entities_dir),
+                                       Path(args.chunks), Path(args.output_dir), Path(args.archive_dir))
+
+        print(f"\n✅ Markdown generati: {stats['processed']} (saltati: {stats['skipped']})")
+        print(f"⚡ Throughput: {stats['docs_per_second']:.1f} docs/s ({stats['elapsed_seconds']:.1f}s)")
+        raise SystemExit(0)
+
     print("="*80)
     print("MARKDOWN GENERATOR - Step 7 (FIXED - TESTO COMPLETO)")
     print("="*80)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+NER Entity Extractor - Step 2 Locale
+Estrazione entità offline con fabiod20/italian-legal-ner (CPU, batch, sliding window)
+Output compatibile con markdown_generator e akoma_ntoso_generator (entity_group RCR/CTR/AVV/...)
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+NER_MODEL = os.getenv("NER_MODEL", "fabiod20/italian-legal-ner")
+
+# Categorie fabiod20 → descrizione
+LABEL_MAP = {
+    'RCR': 'Ricorrente',
+    'CTR': 'Controricorrente',
+    'AVV': 'Avvocato',
+    'CNS': 'Consigliere/Giudice',
+    'RIC': 'Riferimento Ricorso',
+    'GIU': 'Giudice',
+    'PRE': 'Presidente',
+    'REL': 'Relatore',
+    'TRI': 'Tribunale'
+}
+
+
+class NEREntityExtractor:
+    """Estrae entità con modello NER locale (alternativa offline a LLMEntityExtractor)"""
+
+    def __init__(self, model_name: str = None, batch_size: int = 8,
+                 stride: int = 64, num_threads: Optional[int] = None):
+        """
+        Args:
+            model_name: Modello token-classification (default: fabiod20/italian-legal-ner)
+            batch_size: Finestre processate per forward pass
+            stride: Token di sovrapposizione tra finestre consecutive
+            num_threads: Thread CPU per torch (default: tutti)
+        """
+        self.model_name = model_name or NER_MODEL
+        self.batch_size = batch_size
+        self.stride = stride
+
+        print(f"Inizializzazione NER Entity Extractor ({self.model_name})...")
+
+        try:
+            import torch
+            from transformers import pipeline
+        except ImportError:
+            raise ImportError("Installa: pip install transformers torch")
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        # Sliding window gestita dalla pipeline: testi più lunghi di
+        # model_max_length vengono spezzati in finestre sovrapposte di `stride`
+        # token e le entità nelle zone di sovrapposizione vengono unite.
+        self.ner = pipeline(
+            "token-classification",
+            model=self.model_name,
+            aggregation_strategy="average",  # Unisce subword correttamente
+            stride=self.stride,
+            device=-1  # CPU
+        )
+
+        print("✓ Modello NER pronto\n")
+
+    def extract_entities(self, text: str) -> Dict:
+        """
+        Estrae entità da una singola sentenza
+
+        Args:
+            text: Testo sentenza completo
+
+        Returns:
+            Dict con entities, merged_best e count
+        """
+        return self.extract_batch([text])[0]
+
+    def extract_batch(self, texts: List[str]) -> List[Dict]:
+        """
+        Estrae entità da più sentenze in un'unica chiamata alla pipeline
+
+        Le finestre di tutte le sentenze vengono raggruppate in batch da
+        `batch_size`, così il modello resta saturo anche con testi brevi.
+
+        Args:
+            texts: Lista testi sentenze
+
+        Returns:
+            Lista di Dict (uno per testo, stesso ordine)
+        """
+        if not texts:
+            return []
+
+        raw_results = self.ner(texts, batch_size=self.batch_size)
+
+        return [self._build_result(raw) for raw in raw_results]
+
+    def _build_result(self, raw_entities: List[Dict]) -> Dict:
+        """Normalizza output pipeline nel formato entities JSON"""
+        entities = []
+        for ent in raw_entities:
+            entities.append({
+                'entity_group': ent['entity_group'],
+                'word': ent['word'].strip(),
+                'score': float(ent['score']),  # numpy.float32 → float per JSON
+                'start': int(ent['start']),
+                'end': int(ent['end']),
+                'label_extended': LABEL_MAP.get(ent['entity_group'], ent['entity_group'])
+            })
+
+        return {
+            'model': self.model_name,
+            'entities': entities,
+            'merged_best': self._merge_best(entities),
+            'extraction_method': 'ner_local',
+            'count': len(entities)
+        }
+
+    def _merge_best(self, entities: List[Dict]) -> List[Dict]:
+        """
+        Deduplica entità ripetute (stesso gruppo + stesso testo)
+        mantenendo la menzione con score più alto
+        """
+        best = {}
+        for ent in entities:
+            key = (ent['entity_group'], ' '.join(ent['word'].upper().split()))
+            if key not in best or ent['score'] > best[key]['score']:
+                best[key] = ent
+
+        return sorted(best.values(), key=lambda e: e['start'])
+
+    def save_results(self, results: Dict, output_path: Path):
+        """Salva risultati in JSON"""
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"✓ Salvato: {output_path}")
+
+
+def process_sentenza_ner(txt_path: Path, sentenza_id: str, output_dir: Path,
+                         extractor: Optional[NEREntityExtractor] = None) -> Dict:
+    """
+    Processa una singola sentenza con NER locale
+
+    Args:
+        txt_path: Path al file TXT estratto
+        sentenza_id: ID sentenza
+        output_dir: Directory output
+        extractor: Extractor già inizializzato (evita di ricaricare il modello)
+
+    Returns:
+        Statistiche processing
+    """
+    with open(txt_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    print(f"Processamento NER {sentenza_id} ({len(text):,} caratteri)...")
+
+    extractor = extractor or NEREntityExtractor()
+    entities = extractor.extract_entities(text)
+
+    output_path = output_dir / f"{sentenza_id}_entities.json"
+    extractor.save_results(entities, output_path)
+
+    return {
+        'sentenza_id': sentenza_id,
+        'entities_count': entities['count'],
+        'extraction_method': entities['extraction_method'],
+        'output_file': str(output_path)
+    }
+
+
+def process_batch_ner(txt_paths: List[Path], output_dir: Path,
+                      docs_per_batch: int = 16, skip_existing: bool = True,
+                      extractor: Optional[NEREntityExtractor] = None) -> Dict:
+    """
+    Processa molte sentenze in batch con un unico modello caricato
+
+    Args:
+        txt_paths: Lista di TXT (lo stem è l'ID sentenza)
+        output_dir: Directory output entities
+        docs_per_batch: Sentenze passate insieme alla pipeline
+        skip_existing: Salta sentenze con entities già presenti
+        extractor: Extractor già inizializzato
+
+    Returns:
+        Statistiche (documenti, entità, docs/min)
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if skip_existing:
+        txt_paths = [p for p in txt_paths
+                     if not (output_dir / f"{p.stem}_entities.json").exists()]
+
+    print(f"📋 Sentenze da processare: {len(txt_paths)}")
+
+    extractor = extractor or NEREntityExtractor()
+
+    processed = 0
+    total_entities = 0
+    start = time.time()
+
+    for i in range(0, len(txt_paths), docs_per_batch):
+        batch_paths = txt_paths[i:i + docs_per_batch]
+        texts = [p.read_text(encoding='utf-8') for p in batch_paths]
+
+        for txt_path, entities in zip(batch_paths, extractor.extract_batch(texts)):
+            output_path = output_dir / f"{txt_path.stem}_entities.json"
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(entities, f, ensure_ascii=False, indent=2)
+            total_entities += entities['count']
+
+        processed += len(batch_paths)
+        elapsed = time.time() - start
+        rate = processed / elapsed * 60 if elapsed > 0 else 0
+        print(f"   [{processed}/{len(txt_paths)}] {rate:.0f} docs/min")
+
+    elapsed = time.time() - start
+
+    return {
+        'processed': processed,
+        'entities': total_entities,
+        'elapsed_seconds': elapsed,
+        'docs_per_minute': processed / elapsed * 60 if elapsed > 0 else 0
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="NER Entity Extractor - Step 2 Locale (batch CPU)")
+    parser.add_argument("--txt-dir", type=str, default="txt", help="Directory TXT input (default: txt)")
+    parser.add_argument("--output-dir", type=str, default="entities", help="Directory output (default: entities)")
+    parser.add_argument("--docs-per-batch", type=int, default=16, help="Sentenze per batch (default: 16)")
+    parser.add_argument("--batch-size", type=int, default=8, help="Finestre per forward pass (default: 8)")
+    parser.add_argument("--threads", type=int, default=None, help="Thread CPU torch")
+    parser.add_argument("--max", type=int, default=None, help="Limita numero sentenze")
+    parser.add_argument("--force", action="store_true", help="Riprocessa anche sentenze già estratte")
+
+    args = parser.parse_args()
+
+    print("="*80)
+    print("NER ENTITY EXTRACTOR - Step 2 Locale")
+    print("="*80)
+    print()
+
+    txt_paths = sorted(p for p in Path(args.txt_dir).glob('*.txt') if p.stem != 'template')
+    if args.max:
+        txt_paths = txt_paths[:args.max]
+
+    extractor = NEREntityExtractor(batch_size=args.batch_size, num_threads=args.threads)
+    stats = process_batch_ner(
+        txt_paths,
+        Path(args.output_dir),
+        docs_per_batch=args.docs_per_batch,
+        skip_existing=not args.force,
+        extractor=extractor
+    )
+
+    print("\n" + "="*80)
+    print("RISULTATI:")
+    print("="*80)
+    print(f"  Sentenze:  {stats['processed']}")
+    print(f"  Entità:    {stats['entities']}")
+    print(f"  Tempo:     {stats['elapsed_seconds']:.1f}s")
+    print(f"  Throughput: {stats['docs_per_minute']:.0f} docs/min")
+    print("="*80)
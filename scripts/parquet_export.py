@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Parquet Export - Corpus in formato colonnare
+Esporta metadata, testo, entities (con norme e precedenti normalizzati),
+chunks e embeddings in dataset Parquet partizionati per anno/sezione
+(layout hive: <dataset>/anno=2020/sezione=QUINTA/*.parquet).
+
+Gli utilizzatori leggono solo le colonne e le partizioni che servono
+(column pruning + predicate pushdown) invece di aprire un file per sentenza.
+
+Requisiti: pip install pyarrow numpy
+"""
+
+import json
+import re
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from chunk_reader import load_chunks_many
+from txt_archive import read_sentenza_text
+
+DATASETS = ('metadata', 'text', 'entities', 'norme', 'precedenti', 'chunks', 'embeddings')
+PARTITION_COLS = ['anno', 'sezione']
+
+METADATA_FIELDS = [
+    'sentenza_id', 'archivio', 'tipo_provvedimento', 'numero', 'data_pubblicazione',
+    'data_udienza', 'ecli', 'presidente', 'relatore', 'pdf_url'
+]
+
+# Campi dell'output LLM → gruppo entità (stesse sigle del NER fabiod20)
+LLM_ENTITY_GROUPS = {
+    'presidente': 'PRE',
+    'relatore': 'REL',
+    'ricorrenti': 'RCR',
+    'controricorrenti': 'CTR',
+    'avvocati': 'AVV',
+    'riferimenti_ricorso': 'RIC',
+    'tribunali': 'TRI',
+}
+
+
+def _require_pyarrow():
+    """Import lazy di pyarrow (dipendenza opzionale)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Installa: pip install pyarrow")
+    return pa, pq
+
+
+def _schemas(pa) -> Dict:
+    """Schema esplicito per ogni dataset (stabile tra un anno e l'altro)"""
+    key = [('sentenza_id', pa.string()), ('anno', pa.string()), ('sezione', pa.string())]
+
+    return {
+        'metadata': pa.schema(key + [(f, pa.string()) for f in METADATA_FIELDS if f != 'sentenza_id']),
+        'text': pa.schema(key + [
+            ('text', pa.large_string()),
+            ('char_count', pa.int32()),
+        ]),
+        'entities': pa.schema(key + [
+            ('entity_group', pa.string()),
+            ('value', pa.string()),
+            ('parte', pa.string()),
+            ('score', pa.float32()),
+            ('start', pa.int32()),
+            ('end', pa.int32()),
+        ]),
+        'norme': pa.schema(key + [
+            ('articolo', pa.string()),
+            ('comma', pa.string()),
+            ('legge', pa.string()),
+        ]),
+        'precedenti': pa.schema(key + [
+            ('numero', pa.int32()),
+            ('anno_citato', pa.int16()),
+            ('sezione_citata', pa.string()),
+        ]),
+        'chunks': pa.schema(key + [
+            ('chunk_id', pa.string()),
+            ('kind', pa.string()),
+            ('type', pa.string()),
+            ('start_pos', pa.int32()),
+            ('end_pos', pa.int32()),
+            ('start_byte', pa.int32()),
+            ('end_byte', pa.int32()),
+            ('token_count', pa.int32()),
+        ]),
+        # embedding aggiunto in _write_embeddings (fixed_size_list di dimensione nota)
+        'embeddings': pa.schema(key + [
+            ('chunk_id', pa.string()),
+            ('chunk_type', pa.string()),
+            ('model_name', pa.string()),
+        ]),
+    }
+
+
+# ==================== NORMALIZZAZIONE ====================
+
+def _clean(value) -> Optional[str]:
+    """Stringa con spazi normalizzati (None se vuota)"""
+    if value is None:
+        return None
+    value = ' '.join(str(value).split())
+    return value or None
+
+
+def _to_int(value) -> Optional[int]:
+    """Prima sequenza di cifre come intero (None se assente)"""
+    match = re.search(r'\d+', str(value or ''))
+    return int(match.group(0)) if match else None
+
+
+def normalize_norma(norma: Dict) -> Dict:
+    """Norma citata dall'output LLM → articolo / comma / legge normalizzati"""
+    articolo = _clean(norma.get('articolo'))
+    if articolo:
+        # "Art.  360" / "art.360" → "art. 360"
+        articolo = re.sub(r'^art\.?\s*', 'art. ', articolo, flags=re.IGNORECASE)
+    return {
+        'articolo': articolo,
+        'comma': _clean(norma.get('comma')),
+        'legge': _clean(norma.get('legge')),
+    }
+
+
+def normalize_precedente(precedente: Dict) -> Dict:
+    """Precedente citato dall'output LLM → numero / anno interi"""
+    sezione = _clean(precedente.get('sezione'))
+    return {
+        'numero': _to_int(precedente.get('numero')),
+        'anno_citato': _to_int(precedente.get('anno')),
+        'sezione_citata': sezione.upper() if sezione else None,
+    }
+
+
+def entity_rows(entities: Dict) -> List[Dict]:
+    """
+    Righe entità da output NER (lista 'entities') o LLM (campi per categoria)
+    """
+    rows = []
+
+    for e in entities.get('entities', []):
+        rows.append({
+            'entity_group': e.get('entity_group'),
+            'value': _clean(e.get('word')),
+            'parte': None,
+            'score': e.get('score'),
+            'start': e.get('start'),
+            'end': e.get('end'),
+        })
+
+    for field, group in LLM_ENTITY_GROUPS.items():
+        values = entities.get(field)
+        if not values:
+            continue
+        if not isinstance(values, list):
+            values = [values]
+        for value in values:
+            is_dict = isinstance(value, dict)
+            rows.append({
+                'entity_group': group,
+                'value': _clean(value.get('nome') if is_dict else value),
+                'parte': _clean(value.get('parte')) if is_dict else None,
+                'score': None,
+                'start': None,
+                'end': None,
+            })
+
+    return rows
+
+
+# ==================== LETTURA CORPUS ====================
+
+def available_years(metadata_dir: Path) -> List[str]:
+    """Anni con file metadata_cassazione_{anno}.json"""
+    years = []
+    for path in metadata_dir.glob('metadata_cassazione_*.json'):
+        year = path.stem.rsplit('_', 1)[-1]
+        if year.isdigit():
+            years.append(year)
+    return sorted(years)
+
+
+def load_year_sentences(year: str, metadata_dir: Path) -> List[Dict]:
+    """Sentenze di un anno dal JSON metadata"""
+    json_path = metadata_dir / f"metadata_cassazione_{year}.json"
+    with open(json_path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('sentences', [])
+
+
+# ==================== EXPORT ====================
+
+def _write(pa, pq, rows: List[Dict], schema, output_dir: Path, name: str) -> int:
+    """Scrive le righe di un dataset nelle partizioni anno/sezione"""
+    if not rows:
+        return 0
+
+    table = pa.Table.from_pylist(rows, schema=schema)
+    pq.write_to_dataset(
+        table,
+        root_path=str(output_dir / name),
+        partition_cols=PARTITION_COLS,
+        compression='zstd',
+        # Riesportare un anno sostituisce solo le sue partizioni
+        existing_data_behavior='delete_matching',
+    )
+    return table.num_rows
+
+
+def _write_embeddings(pa, pq, sentences: List[Dict], embeddings_dir: Path,
+                      schema, output_dir: Path) -> int:
+    """Embeddings .npz → colonna fixed_size_list<float32>"""
+    import numpy as np
+
+    columns = {name: [] for name in schema.names}
+    vectors = []
+    dim = None
+
+    for sentence in sentences:
+        path = embeddings_dir / f"{sentence['sentenza_id']}_embeddings.npz"
+        if not path.exists():
+            continue
+
+        data = np.load(path)
+        matrix = data['embeddings'].astype(np.float32)
+        if dim is None:
+            dim = matrix.shape[1]
+        elif matrix.shape[1] != dim:
+            print(f"   ⚠️  {sentence['sentenza_id']}: dimensione {matrix.shape[1]} != {dim} (skip)")
+            continue
+
+        model_name = str(data['model_name'])
+        for chunk_id, chunk_type in zip(data['chunk_ids'], data['chunk_types']):
+            columns['sentenza_id'].append(sentence['sentenza_id'])
+            columns['anno'].append(sentence['anno'])
+            columns['sezione'].append(sentence['sezione'])
+            columns['chunk_id'].append(str(chunk_id))
+            columns['chunk_type'].append(str(chunk_type))
+            columns['model_name'].append(model_name)
+        vectors.append(matrix)
+
+    if not vectors:
+        return 0
+
+    flat = pa.array(np.concatenate(vectors).ravel(), type=pa.float32())
+    embedding = pa.FixedSizeListArray.from_arrays(flat, dim)
+
+    table = pa.Table.from_pydict(columns, schema=schema).append_column(
+        pa.field('embedding', pa.list_(pa.float32(), dim)), embedding
+    )
+    pq.write_to_dataset(
+        table,
+        root_path=str(output_dir / 'embeddings'),
+        partition_cols=PARTITION_COLS,
+        compression='zstd',
+        existing_data_behavior='delete_matching',
+    )
+    return table.num_rows
+
+
+def export_year(year: str, metadata_dir: Path, txt_dir: Path, entities_dir: Path,
+                chunks_source: Path, embeddings_dir: Path, output_dir: Path,
+                datasets=DATASETS) -> Dict:
+    """
+    Esporta un anno in tutti i dataset richiesti
+
+    Returns:
+        Righe scritte per dataset
+    """
+    pa, pq = _require_pyarrow()
+    schemas = _schemas(pa)
+
+    sentences = []
+    for s in load_year_sentences(year, metadata_dir):
+        record = {f: s.get(f) for f in METADATA_FIELDS if f != 'sentenza_id'}
+        record.update({'sentenza_id': s['id'], 'anno': str(s.get('anno') or year),
+                       'sezione': s.get('sezione') or 'ND'})
+        sentences.append(record)
+
+    print(f"📅 Anno {year}: {len(sentences)} sentenze")
+
+    rows = {name: [] for name in DATASETS if name != 'embeddings'}
+    ids = [s['sentenza_id'] for s in sentences]
+    chunks = load_chunks_many(ids, chunks_source) if 'chunks' in datasets else {}
+
+    for s in sentences:
+        sid = s['sentenza_id']
+        key = {'sentenza_id': sid, 'anno': s['anno'], 'sezione': s['sezione']}
+        rows['metadata'].append(s)
+
+        text = read_sentenza_text(sid, txt_dir) if 'text' in datasets else None
+        if text is not None:
+            rows['text'].append({**key, 'text': text, 'char_count': len(text)})
+
+        entities_path = entities_dir / f"{sid}_entities.json"
+        if entities_path.exists():
+            with open(entities_path, 'r', encoding='utf-8') as f:
+                entities = json.load(f)
+            rows['entities'].extend({**key, **r} for r in entity_rows(entities))
+            rows['norme'].extend({**key, **normalize_norma(n)}
+                                 for n in entities.get('norme_citate') or [])
+            rows['precedenti'].extend({**key, **normalize_precedente(p)}
+                                      for p in entities.get('precedenti_citati') or [])
+
+        if sid in chunks:
+            for kind in ('semantic', 'fixed'):
+                for c in chunks[sid].get(f'{kind}_chunks', []):
+                    rows['chunks'].append({
+                        **key,
+                        'chunk_id': c['chunk_id'],
+                        'kind': kind,
+                        'type': c.get('type', 'fixed'),
+                        'start_pos': c.get('start_pos'),
+                        'end_pos': c.get('end_pos'),
+                        'start_byte': c.get('start_byte'),
+                        'end_byte': c.get('end_byte'),
+                        'token_count': c.get('token_count'),
+                    })
+
+    stats = {}
+    for name, dataset_rows in rows.items():
+        if name in datasets:
+            stats[name] = _write(pa, pq, dataset_rows, schemas[name], output_dir, name)
+
+    if 'embeddings' in datasets:
+        stats['embeddings'] = _write_embeddings(pa, pq, sentences, embeddings_dir,
+                                                schemas['embeddings'], output_dir)
+
+    for name, count in stats.items():
+        print(f"   ✓ {name:<11} {count:>8,} righe")
+
+    return stats
+
+
+def read_dataset(output_dir: Path, name: str, columns: Optional[List[str]] = None,
+                 filters=None):
+    """
+    Legge un dataset esportato con pruning di colonne e partizioni
+
+    Esempio:
+        read_dataset(Path('parquet'), 'chunks', columns=['sentenza_id', 'type'],
+                     filters=[('anno', '=', '2020'), ('sezione', '=', 'QUINTA')])
+    """
+    pa, pq = _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    # Colonne di partizione stringa come in scrittura (hive le dedurrebbe int32)
+    partitioning = ds.partitioning(pa.schema([(col, pa.string()) for col in PARTITION_COLS]),
+                                   flavor='hive')
+    return pq.read_table(str(output_dir / name), columns=columns, filters=filters,
+                         partitioning=partitioning)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export del corpus in dataset Parquet partizionati per anno/sezione"
+    )
+    parser.add_argument("--years", nargs='*', default=None, help="Anni da esportare (default: tutti)")
+    parser.add_argument("--metadata-dir", type=str, default="metadata", help="Directory metadata JSON (default: metadata)")
+    parser.add_argument("--txt-dir", type=str, default="txt", help="Directory TXT (default: txt)")
+    parser.add_argument("--entities-dir", type=str, default="entities", help="Directory entities (default: entities)")
+    parser.add_argument("--chunks", type=str, default="chunks", help="Directory chunks JSON o chunk store .schk (default: chunks)")
+    parser.add_argument("--embeddings-dir", type=str, default="embeddings", help="Directory embeddings (default: embeddings)")
+    parser.add_argument("--output-dir", type=str, default="parquet", help="Directory output (default: parquet)")
+    parser.add_argument("--datasets", nargs='*', default=list(DATASETS), choices=DATASETS,
+                        help="Dataset da esportare (default: tutti)")
+    args = parser.parse_args()
+
+    metadata_dir = Path(args.metadata_dir)
+    output_dir = Path(args.output_dir)
+    years = args.years or available_years(metadata_dir)
+
+    print("="*80)
+    print("PARQUET EXPORT - Corpus colonnare")
+    print("="*80)
+    print(f"📂 Output: {output_dir}")
+    print(f"📅 Anni: {', '.join(years)}")
+    print()
+
+    start = time.time()
+    totals = {}
+
+    for year in years:
+        stats = export_year(year, metadata_dir, Path(args.txt_dir), Path(args.entities_dir),
+                            Path(args.chunks), Path(args.embeddings_dir), output_dir,
+                            datasets=args.datasets)
+        for name, count in stats.items():
+            totals[name] = totals.get(name, 0) + count
+
+    print("\n" + "="*80)
+    print(f"✅ Export completato in {time.time() - start:.1f}s")
+    for name, count in totals.items():
+        print(f"   {name:<11} {count:>10,} righe")
+    print("="*80)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+"""
+Search Index - Ricerca full-text sulle sentenze (SQLite FTS5)
+Indice invertito sui TXT estratti con ranking BM25, frasi esatte e filtri
+per anno / sezione / tipo provvedimento.
+
+- Tokenizer unicode61 con rimozione diacritici (perché = perche, società = societa)
+- Aggiornamento incrementale per ID sentenza (solo TXT nuovi o modificati)
+- Nessuna dipendenza esterna: sqlite3 della libreria standard
+"""
+
+import re
+import json
+import time
+import sqlite3
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from chunk_reader import load_chunks_many
+from header_parser import parse_header
+from txt_archive import ARCHIVE_SUFFIX, TxtArchive
+
+DEFAULT_DB = Path("search/sentenze.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documenti (
+    rowid INTEGER PRIMARY KEY,
+    sentenza_id TEXT UNIQUE NOT NULL,
+    anno TEXT,
+    sezione TEXT,
+    tipo_provvedimento TEXT,
+    numero TEXT,
+    data_pubblicazione TEXT,
+    txt_mtime REAL,
+    txt_size INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_documenti_filtri
+    ON documenti(anno, sezione, tipo_provvedimento);
+CREATE VIRTUAL TABLE IF NOT EXISTS documenti_fts USING fts5(
+    testo,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    rowid INTEGER PRIMARY KEY,
+    sentenza_id TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    type TEXT,
+    start_pos INTEGER,
+    end_pos INTEGER,
+    UNIQUE (sentenza_id, chunk_id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+    testo,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+METADATA_COLUMNS = ('anno', 'sezione', 'tipo_provvedimento', 'numero', 'data_pubblicazione')
+
+# Frase tra virgolette oppure singola parola
+QUERY_TOKEN_PATTERN = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def to_match_query(query: str, operator: str = 'AND') -> str:
+    """
+    Converte una ricerca libera in sintassi FTS5 sicura
+
+    Le frasi tra virgolette restano frasi, le altre parole vengono quotate
+    (così "art.", "504/1995" o "d.lgs." non producono errori di sintassi)
+    e unite con operator (AND di default, OR per la ricerca ibrida).
+
+    Esempio:
+        'art. 7 "d.lgs. 504/1995"' → '"art." "7" "d.lgs. 504/1995"'
+    """
+    terms = []
+    for phrase, word in QUERY_TOKEN_PATTERN.findall(query):
+        term = phrase or word
+        terms.append('"' + term.replace('"', '""') + '"')
+    return f' {operator} '.join(terms)
+
+
+def load_metadata_map(metadata_dir: Path) -> Dict[str, Dict]:
+    """ID sentenza → record metadata (da tutti i metadata_cassazione_{anno}.json)"""
+    records = {}
+    for json_path in sorted(metadata_dir.glob('metadata_cassazione_*.json')):
+        with open(json_path, 'r', encoding='utf-8') as f:
+            for sentence in json.load(f).get('sentences', []):
+                records[sentence['id']] = sentence
+    return records
+
+
+class SearchIndex:
+    """Indice FTS5 persistente delle sentenze"""
+
+    def __init__(self, db_path: Path = DEFAULT_DB, check_same_thread: bool = True):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # check_same_thread=False per usare l'indice da un thread worker (hybrid_search)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=check_same_thread)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def add(self, sentenza_id: str, text: str, metadata: Optional[Dict] = None,
+            txt_mtime: Optional[float] = None, txt_size: Optional[int] = None):
+        """
+        Inserisce o sostituisce una sentenza (upsert per ID)
+
+        Non esegue commit: usare update_from_dir o commit() per i batch.
+        """
+        metadata = metadata or {}
+        values = [metadata.get(col) for col in METADATA_COLUMNS]
+        if values[0] is None:
+            # Anno dall'ID (es: snciv2020529915I → 2020)
+            values[0] = sentenza_id[5:9] if sentenza_id[5:9].isdigit() else None
+
+        row = self.conn.execute(
+            "SELECT rowid FROM documenti WHERE sentenza_id = ?", (sentenza_id,)
+        ).fetchone()
+
+        if row:
+            rowid = row[0]
+            self.conn.execute("DELETE FROM documenti_fts WHERE rowid = ?", (rowid,))
+            # Chunks del testo precedente non più validi (reindicizzati da update_chunks)
+            self._delete_chunks(sentenza_id)
+            self.conn.execute(
+                "UPDATE documenti SET anno = ?, sezione = ?, tipo_provvedimento = ?, numero = ?, "
+                "data_pubblicazione = ?, txt_mtime = ?, txt_size = ? WHERE rowid = ?",
+                (*values, txt_mtime, txt_size, rowid)
+            )
+        else:
+            rowid = self.conn.execute(
+                "INSERT INTO documenti (sentenza_id, anno, sezione, tipo_provvedimento, numero, "
+                "data_pubblicazione, txt_mtime, txt_size) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (sentenza_id, *values, txt_mtime, txt_size)
+            ).lastrowid
+
+        self.conn.execute("INSERT INTO documenti_fts (rowid, testo) VALUES (?, ?)", (rowid, text))
+
+    def remove(self, sentenza_id: str) -> bool:
+        """Rimuove una sentenza dall'indice"""
+        row = self.conn.execute(
+            "SELECT rowid FROM documenti WHERE sentenza_id = ?", (sentenza_id,)
+        ).fetchone()
+        if not row:
+            return False
+        self.conn.execute("DELETE FROM documenti_fts WHERE rowid = ?", (row[0],))
+        self.conn.execute("DELETE FROM documenti WHERE rowid = ?", (row[0],))
+        self._delete_chunks(sentenza_id)
+        return True
+
+    def _delete_chunks(self, sentenza_id: str):
+        self.conn.execute(
+            "DELETE FROM chunks_fts WHERE rowid IN (SELECT rowid FROM chunks WHERE sentenza_id = ?)",
+            (sentenza_id,)
+        )
+        self.conn.execute("DELETE FROM chunks WHERE sentenza_id = ?", (sentenza_id,))
+
+    def index_chunks(self, sentenza_id: str, chunks_data: Dict) -> int:
+        """
+        Indicizza i chunks semantici di una sentenza già presente nell'indice
+
+        Il testo dei chunks è ricavato dagli span sul testo già memorizzato.
+        Non esegue commit.
+
+        Returns:
+            Numero chunks indicizzati
+        """
+        row = self.conn.execute(
+            "SELECT f.testo FROM documenti d JOIN documenti_fts f ON f.rowid = d.rowid "
+            "WHERE d.sentenza_id = ?", (sentenza_id,)
+        ).fetchone()
+        if not row:
+            return 0
+
+        text = row[0]
+        self._delete_chunks(sentenza_id)
+
+        for chunk in chunks_data.get('semantic_chunks', []):
+            rowid = self.conn.execute(
+                "INSERT INTO chunks (sentenza_id, chunk_id, type, start_pos, end_pos) VALUES (?, ?, ?, ?, ?)",
+                (sentenza_id, chunk['chunk_id'], chunk.get('type'), chunk['start_pos'], chunk['end_pos'])
+            ).lastrowid
+            self.conn.execute(
+                "INSERT INTO chunks_fts (rowid, testo) VALUES (?, ?)",
+                (rowid, text[chunk['start_pos']:chunk['end_pos']])
+            )
+
+        return len(chunks_data.get('semantic_chunks', []))
+
+    def update_chunks(self, chunks_source: Path, batch_size: int = 500) -> Dict:
+        """
+        Indicizza i chunks delle sentenze che non li hanno ancora
+        (nuove o con testo aggiornato da update_from_dir)
+
+        Args:
+            chunks_source: Directory chunks JSON oppure chunk store (.schk)
+            batch_size: Sentenze per transazione
+
+        Returns:
+            Statistiche (sentenze, chunks)
+        """
+        missing = [row[0] for row in self.conn.execute(
+            "SELECT sentenza_id FROM documenti "
+            "WHERE sentenza_id NOT IN (SELECT DISTINCT sentenza_id FROM chunks)"
+        )]
+
+        stats = {'documents': 0, 'chunks': 0}
+
+        for i in range(0, len(missing), batch_size):
+            batch = load_chunks_many(missing[i:i + batch_size], chunks_source)
+            for sentenza_id, chunks_data in batch.items():
+                stats['chunks'] += self.index_chunks(sentenza_id, chunks_data)
+                stats['documents'] += 1
+            self.commit()
+
+        if stats['documents']:
+            self.conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('optimize')")
+            self.commit()
+
+        return stats
+
+    def commit(self):
+        self.conn.commit()
+
+    @staticmethod
+    def _header_metadata(text: str) -> Dict:
+        """Metadata dall'intestazione quando manca il JSON (sezione esclusa: formato diverso)"""
+        header = parse_header(text)
+        return {
+            'anno': str(header.anno) if header.anno else None,
+            'numero': header.numero,
+            'data_pubblicazione': header.data_pubblicazione,
+        }
+
+    def update_from_dir(self, txt_dir: Path, metadata_dir: Optional[Path] = None,
+                        prune: bool = False, batch_size: int = 500,
+                        archive_dir: Optional[Path] = None) -> Dict:
+        """
+        Indicizza i TXT nuovi o modificati (confronto mtime + dimensione)
+
+        Args:
+            txt_dir: Directory TXT
+            metadata_dir: Directory metadata JSON (per anno/sezione/tipo)
+            prune: Rimuove dall'indice le sentenze senza più TXT
+            batch_size: Sentenze per transazione
+            archive_dir: Directory archivi .stxa: indicizza anche le sentenze
+                         presenti solo negli archivi (mtime = quello dell'archivio)
+
+        Returns:
+            Statistiche (aggiunte, aggiornate, invariate, rimosse)
+        """
+        metadata = load_metadata_map(metadata_dir) if metadata_dir else {}
+        known = {
+            sid: (mtime, size) for sid, mtime, size in
+            self.conn.execute("SELECT sentenza_id, txt_mtime, txt_size FROM documenti")
+        }
+
+        stats = {'added': 0, 'updated': 0, 'unchanged': 0, 'removed': 0}
+        seen = set()
+        pending = 0
+
+        def sources():
+            """(sentenza_id, mtime, size, lettore testo): prima i TXT, poi gli archivi"""
+            for txt_path in sorted(txt_dir.glob('*.txt')):
+                if txt_path.stem == 'template':
+                    continue
+                st = txt_path.stat()
+                yield txt_path.stem, st.st_mtime, st.st_size, \
+                    lambda path=txt_path: path.read_text(encoding='utf-8')
+
+            if archive_dir is None:
+                return
+            for archive_path in sorted(Path(archive_dir).glob(f'*{ARCHIVE_SUFFIX}')):
+                mtime = archive_path.stat().st_mtime
+                with TxtArchive(archive_path) as archive:
+                    for sentenza_id in archive.sentenza_ids:
+                        yield sentenza_id, mtime, archive.size(sentenza_id), \
+                            lambda sid=sentenza_id, a=archive: a.read_text(sid)
+
+        for sentenza_id, mtime, size, read_text in sources():
+            if sentenza_id in seen:
+                continue
+            seen.add(sentenza_id)
+
+            if known.get(sentenza_id) == (mtime, size):
+                stats['unchanged'] += 1
+                continue
+
+            text = read_text()
+            record = metadata.get(sentenza_id) or self._header_metadata(text)
+            self.add(sentenza_id, text, record, mtime, size)
+            stats['updated' if sentenza_id in known else 'added'] += 1
+
+            pending += 1
+            if pending >= batch_size:
+                self.commit()
+                pending = 0
+                print(f"   [{stats['added'] + stats['updated']}] sentenze indicizzate...")
+
+        if prune:
+            for sentenza_id in set(known) - seen:
+                self.remove(sentenza_id)
+                stats['removed'] += 1
+
+        self.commit()
+
+        if stats['added'] or stats['updated'] or stats['removed']:
+            # Unisce i segmenti dell'indice (query più veloci)
+            self.conn.execute("INSERT INTO documenti_fts (documenti_fts) VALUES ('optimize')")
+            self.commit()
+
+        return stats
+
+    def search(self, query: str, anno: Optional[str] = None, sezione: Optional[str] = None,
+               tipo_provvedimento: Optional[str] = None, limit: int = 20,
+               raw: bool = False) -> List[Dict]:
+        """
+        Ricerca BM25 con filtri sui metadata
+
+        Args:
+            query: Testo libero ("frase esatta" tra virgolette)
+            anno / sezione / tipo_provvedimento: Filtri opzionali
+            limit: Numero massimo risultati
+            raw: Se True la query è già in sintassi FTS5 (AND/OR/NOT/NEAR, prefisso*)
+
+        Returns:
+            Lista risultati ordinati per rilevanza (score BM25: più basso = migliore)
+            ([] se la query è vuota)
+        """
+        match_query = query.strip() if raw else to_match_query(query)
+        if not match_query:
+            return []
+
+        sql = (
+            "SELECT d.sentenza_id, d.anno, d.sezione, d.tipo_provvedimento, d.numero, "
+            "d.data_pubblicazione, bm25(documenti_fts) AS score, "
+            "snippet(documenti_fts, 0, '**', '**', '…', 24) "
+            "FROM documenti_fts JOIN documenti d ON d.rowid = documenti_fts.rowid "
+            "WHERE documenti_fts MATCH ?"
+        )
+        params = [match_query]
+
+        for column, value in (('anno', anno), ('sezione', sezione),
+                              ('tipo_provvedimento', tipo_provvedimento)):
+            if value is not None:
+                sql += f" AND d.{column} = ?"
+                params.append(value)
+
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+
+        return [
+            {
+                'sentenza_id': row[0],
+                'anno': row[1],
+                'sezione': row[2],
+                'tipo_provvedimento': row[3],
+                'numero': row[4],
+                'data_pubblicazione': row[5],
+                'score': row[6],
+                'snippet': row[7],
+            }
+            for row in self.conn.execute(sql, params)
+        ]
+
+    def search_chunks(self, query: str, anno: Optional[str] = None, limit: int = 50,
+                      operator: str = 'AND') -> List[Dict]:
+        """
+        Ricerca BM25 a livello di chunk
+
+        Args:
+            query: Testo libero ("frase esatta" tra virgolette)
+            anno: Filtro anno (opzionale)
+            limit: Numero massimo chunks
+            operator: AND (tutti i termini) oppure OR (almeno uno)
+
+        Returns:
+            Lista chunks (sentenza_id, chunk_id, span, score, snippet evidenziato)
+            ([] se la query è vuota, anche per la gamba lessicale di hybrid_search)
+        """
+        match_query = to_match_query(query, operator)
+        if not match_query:
+            return []
+
+        sql = (
+            "SELECT c.sentenza_id, c.chunk_id, c.type, c.start_pos, c.end_pos, "
+            "bm25(chunks_fts) AS score, snippet(chunks_fts, 0, '**', '**', '…', 24) "
+            "FROM chunks_fts JOIN chunks c ON c.rowid = chunks_fts.rowid"
+        )
+        params = [match_query]
+
+        if anno is not None:
+            sql += " JOIN documenti d ON d.sentenza_id = c.sentenza_id WHERE chunks_fts MATCH ? AND d.anno = ?"
+            params.append(anno)
+        else:
+            sql += " WHERE chunks_fts MATCH ?"
+
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+
+        return [
+            {
+                'sentenza_id': row[0],
+                'chunk_id': row[1],
+                'type': row[2],
+                'start_pos': row[3],
+                'end_pos': row[4],
+                'score': row[5],
+                'snippet': row[6],
+            }
+            for row in self.conn.execute(sql, params)
+        ]
+
+    def get_chunks(self, keys: List, preview_chars: int = 300) -> Dict:
+        """
+        Span e inizio testo di chunks dati (sentenza_id, chunk_id)
+
+        Returns:
+            Dict (sentenza_id, chunk_id) → chunk
+        """
+        chunks = {}
+        for sentenza_id, chunk_id in keys:
+            row = self.conn.execute(
+                "SELECT c.type, c.start_pos, c.end_pos, substr(f.testo, c.start_pos + 1, ?) "
+                "FROM chunks c JOIN documenti d ON d.sentenza_id = c.sentenza_id "
+                "JOIN documenti_fts f ON f.rowid = d.rowid "
+                "WHERE c.sentenza_id = ? AND c.chunk_id = ?",
+                (preview_chars, sentenza_id, chunk_id)
+            ).fetchone()
+            if row:
+                chunks[(sentenza_id, chunk_id)] = {
+                    'sentenza_id': sentenza_id,
+                    'chunk_id': chunk_id,
+                    'type': row[0],
+                    'start_pos': row[1],
+                    'end_pos': row[2],
+                    'snippet': row[3],
+                }
+        return chunks
+
+    def stats(self) -> Dict:
+        """Statistiche indice"""
+        total = self.conn.execute("SELECT COUNT(*) FROM documenti").fetchone()[0]
+        chunks = self.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        per_anno = dict(self.conn.execute(
+            "SELECT anno, COUNT(*) FROM documenti GROUP BY anno ORDER BY anno"
+        ).fetchall())
+        return {
+            'documents': total,
+            'chunks': chunks,
+            'per_anno': per_anno,
+            'db_size': self.db_path.stat().st_size,
+        }
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ricerca full-text sulle sentenze (SQLite FTS5 + BM25)")
+    parser.add_argument("--db", type=str, default=str(DEFAULT_DB), help=f"Database indice (default: {DEFAULT_DB})")
+    subparsers = parser.add_subparsers(dest='command', help='Comando da eseguire')
+
+    build_parser = subparsers.add_parser('build', help='Crea/aggiorna l\'indice')
+    build_parser.add_argument("--txt-dir", type=str, default="txt", help="Directory TXT (default: txt)")
+    build_parser.add_argument("--metadata-dir", type=str, default="metadata", help="Directory metadata JSON (default: metadata)")
+    build_parser.add_argument("--archive-dir", type=str, default=None,
+                              help="Directory archivi TXT .stxa (sentenze senza TXT estratto)")
+    build_parser.add_argument("--prune", action="store_true", help="Rimuove sentenze senza più TXT")
+    build_parser.add_argument("--chunks", type=str, default=None,
+                              help="Directory chunks JSON o chunk store .schk: indicizza anche i chunks semantici")
+
+    search_parser = subparsers.add_parser('search', help='Cerca nell\'indice')
+    search_parser.add_argument("query", type=str, help='Testo da cercare ("frase esatta" tra virgolette)')
+    search_parser.add_argument("--anno", type=str, default=None, help="Filtro anno")
+    search_parser.add_argument("--sezione", type=str, default=None, help="Filtro sezione (es: QUINTA)")
+    search_parser.add_argument("--tipo", type=str, default=None, help="Filtro tipo provvedimento (es: Ordinanza)")
+    search_parser.add_argument("--limit", type=int, default=10, help="Numero risultati (default: 10)")
+    search_parser.add_argument("--raw", action="store_true", help="Query in sintassi FTS5")
+
+    subparsers.add_parser('stats', help='Statistiche indice')
+
+    args = parser.parse_args()
+
+    if args.command is None:
+        parser.print_help()
+        return
+
+    with SearchIndex(Path(args.db)) as index:
+        if args.command == 'build':
+            print(f"🔎 Indicizzazione {args.txt_dir} → {args.db}")
+            start = time.time()
+            stats = index.update_from_dir(Path(args.txt_dir), Path(args.metadata_dir), prune=args.prune,
+                                          archive_dir=Path(args.archive_dir) if args.archive_dir else None)
+            print(f"\n✅ Indice aggiornato in {time.time() - start:.1f}s")
+            print(f"   Aggiunte: {stats['added']} | Aggiornate: {stats['updated']} | "
+                  f"Invariate: {stats['unchanged']} | Rimosse: {stats['removed']}")
+
+            if args.chunks:
+                chunk_stats = index.update_chunks(Path(args.chunks))
+                print(f"   Chunks: {chunk_stats['chunks']} da {chunk_stats['documents']} sentenze")
+
+        elif args.command == 'search':
+            start = time.perf_counter()
+            results = index.search(args.query, anno=args.anno, sezione=args.sezione,
+                                   tipo_provvedimento=args.tipo, limit=args.limit, raw=args.raw)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            print(f"🔎 {len(results)} risultati in {elapsed_ms:.1f} ms\n")
+            for i, r in enumerate(results, 1):
+                print(f"{i:>2}. {r['sentenza_id']} | {r['tipo_provvedimento'] or '-'} n. {r['numero'] or '-'} "
+                      f"del {r['data_pubblicazione'] or '-'} (bm25 {r['score']:.2f})")
+                print(f"    {' '.join(r['snippet'].split())}")
+
+        elif args.command == 'stats':
+            stats = index.stats()
+            print(f"📊 Sentenze indicizzate: {stats['documents']:,} ({stats['chunks']:,} chunks)")
+            for anno, count in stats['per_anno'].items():
+                print(f"   {anno}: {count:,}")
+            print(f"💾 Dimensione: {stats['db_size'] / 1024 / 1024:.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Section Segmenter - Sezioni sentenza in un'unica passata
+Individua intestazione / FATTI DI CAUSA / RAGIONI|MOTIVI DELLA DECISIONE /
+motivi numerati / P.Q.M. e restituisce gli span (start, end) nel testo.
+
+Usato da chunking_processor, akoma_ntoso_generator e markdown_generator:
+ogni sentenza viene segmentata una sola volta.
+"""
+
+import re
+from typing import Dict, Tuple
+
+# Un solo pattern precompilato con gruppi nominati: finditer scorre il testo
+# una volta e registra tutti i marker di sezione.
+SECTION_PATTERN = re.compile(
+    r'(?P<motivi>RAGIONI DELLA DECISIONE|MOTIVI DELLA DECISIONE)'
+    r'|(?P<fatti>FATTI DI CAUSA)'
+    r'|(?P<pqm>P\.Q\.M\.)'
+    r'|(?P<header>ORDINANZA|SENTENZA)'
+    r'|\n(?P<motivo>\d+)\.-',
+    re.IGNORECASE
+)
+
+# "DIRITTO" / "IN DIRITTO" solo come titolo maiuscolo su una riga propria:
+# "diritto di difesa" nel testo non chiude i fatti
+DIRITTO_PATTERN = re.compile(r'^[ \t]*(?:IN[ \t]+)?DIRITTO[ \t]*$', re.MULTILINE)
+
+
+def segment_sections(text: str) -> Dict:
+    """
+    Segmenta la sentenza in sezioni
+
+    Args:
+        text: Testo completo sentenza
+
+    Returns:
+        Dict con span (start, end) non strippati, presenti solo se trovati:
+        {
+            'intestazione': (0, e),       # fino a ORDINANZA/SENTENZA
+            'fatti': (s, e),              # fino a RAGIONI/MOTIVI/DIRITTO/P.Q.M.
+            'motivazione': (s, e),        # fino a P.Q.M.
+            'motivi': [('1', s, e), ...], # motivi "N.-" dentro la motivazione
+            'dispositivo': (s, len(text)) # da P.Q.M.
+        }
+    """
+    first = {}
+    diritto = [match.start() for match in DIRITTO_PATTERN.finditer(text)]
+    pqm = []
+    motivi = []
+
+    for match in SECTION_PATTERN.finditer(text):
+        kind = match.lastgroup
+        pos = match.start()
+
+        if kind == 'motivo':
+            motivi.append((match.group('motivo'), pos, match.end()))
+            continue
+        if kind == 'pqm':
+            pqm.append(pos)
+        first.setdefault(kind, pos)
+
+    sections = {}
+
+    if 'header' in first:
+        sections['intestazione'] = (0, first['header'])
+
+    if 'fatti' in first:
+        start = first['fatti']
+        candidates = [p for p in diritto + pqm if p > start]
+        if first.get('motivi', -1) > start:
+            candidates.append(first['motivi'])
+        # Se non trova la fine, prende fino a metà del testo restante
+        end = min(candidates) if candidates else start + (len(text) - start) // 2
+        sections['fatti'] = (start, end)
+
+    if 'motivi' in first:
+        start = first['motivi']
+        end = next((p for p in pqm if p > start), len(text))
+        sections['motivazione'] = (start, end)
+
+        # Motivi numerati: ogni motivo va fino al successivo
+        inside = [m for m in motivi if start <= m[1] < end]
+        sections['motivi'] = [
+            (num, body_start, inside[i + 1][1] if i + 1 < len(inside) else end)
+            for i, (num, _, body_start) in enumerate(inside)
+        ]
+
+    if 'pqm' in first:
+        sections['dispositivo'] = (first['pqm'], len(text))
+
+    return sections
+
+
+def section_text(text: str, span: Tuple[int, int]) -> str:
+    """Testo (strippato) di uno span"""
+    return text[span[0]:span[1]].strip()
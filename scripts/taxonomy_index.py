@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+"""
+Taxonomy Index - Indice binario precompilato delle tassonomie di pattern/
+Liste TXT della strategia (whitelist/blacklist/graylist) e JSON MEF,
+Giustizia Tributaria e Cassazione compilati una volta sola in un file
+pensato per mmap: i worker di categorizzazione non rileggono i JSON e non
+ricostruiscono l'automa, lo aprono in pochi millisecondi.
+
+Contenuto:
+    termine → lista, codici materia/classificazione, forma normalizzata
+    tabelle dell'automa Aho-Corasick di taxonomy_matcher (goto, fail,
+    output, lunghezze) come array uint32 contigui
+
+Formato file (.taxidx):
+    MAGIC
+    sezioni allineate a 8 byte:
+      vocab          token separati da '\\n' (id = posizione)
+      goto_offsets   uint32[nodi + 1]   archi del nodo i in [off[i], off[i+1])
+      goto_tokens    uint32[archi]
+      goto_targets   uint32[archi]
+      fail           uint32[nodi]
+      out_offsets    uint32[nodi + 1]
+      out_ids        uint32[uscite]
+      lengths        uint32[pattern]
+      term_offsets   uint32[pattern + 1]
+      term_records   JSON per pattern: [normalizzato, [[lista, termine, [codici]], ...]]
+    footer JSON (sezioni, sorgenti con sha256, dimensioni liste)
+    lunghezza footer (8 byte little-endian) | MAGIC
+
+Le tabelle restano nella memory map: i dict di transizione di un nodo e i
+record dei termini vengono decodificati solo quando la scansione li tocca.
+"""
+
+import sys
+import json
+import mmap
+import time
+import array
+import struct
+import hashlib
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from taxonomy_matcher import PATTERN_DIR, TAXONOMY_LISTS, AhoCorasick, TaxonomyMatcher
+
+MAGIC = b'TAXIDX1\n'
+DEFAULT_INDEX_PATH = Path('categorization/taxonomy.taxidx')
+ALIGNMENT = 8
+
+# Tassonomie JSON (codici: materia MEF "D040", coppia materia/classificazione
+# "D040/0500" come nelle combinazioni di mef_scrape_by_combinations.py)
+JSON_SOURCES = {
+    'mef_materia': 'mef/mef.json',
+    'mef_classificazione': 'mef/mef_by_classificazioni.json',
+    'mef_autosuggest': 'mef/mef_autosuggest.json',
+    'giustizia_tributaria': 'giustizia_trib/giustizia_tributaria.json',
+    'cassazione': 'cassazione/2_cassazione.json',
+}
+
+
+# ==================== SORGENTI ====================
+
+def _load_json(path: Path) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def mef_materia_terms(pattern_dir: Path) -> List[Tuple[str, List[str]]]:
+    """Materie MEF: descrizione → codice materia"""
+    data = _load_json(Path(pattern_dir) / 'mef/mef.json')
+    return [(m['descrizione'], [m['codice']]) for m in data['materie']]
+
+
+def mef_classificazione_terms(pattern_dir: Path) -> List[Tuple[str, List[str]]]:
+    """
+    Classificazioni MEF: descrizione → coppie materia/classificazione
+
+    Unione di mef.json (materia → classificazioni) e
+    mef_by_classificazioni.json (classificazione → materie).
+    """
+    codes: Dict[str, List[str]] = {}
+
+    for materia in _load_json(Path(pattern_dir) / 'mef/mef.json')['materie']:
+        for classif in materia.get('classificazioni', []):
+            code = f"{materia['codice']}/{classif['codiceClassificazione']}"
+            codes.setdefault(classif['descrizioneVC'], []).append(code)
+
+    for classif in _load_json(Path(pattern_dir) / 'mef/mef_by_classificazioni.json')['classificazioni']:
+        for materia in classif.get('materie', []):
+            code = f"{materia['codice']}/{classif['codiceClassificazione']}"
+            codes.setdefault(classif['descrizioneVC'], []).append(code)
+
+    return list(codes.items())
+
+
+def giustizia_tributaria_terms(pattern_dir: Path) -> List[Tuple[str, List[str]]]:
+    """Materie Giustizia Tributaria: descrizione → codice"""
+    data = _load_json(Path(pattern_dir) / 'giustizia_trib/giustizia_tributaria.json')
+    return [(m['descrizione'], [m['codice']]) for m in data['materie']]
+
+
+def mef_autosuggest_terms(pattern_dir: Path) -> List[str]:
+    return _load_json(Path(pattern_dir) / 'mef/mef_autosuggest.json')['autosuggest']
+
+
+def cassazione_terms(pattern_dir: Path) -> List[str]:
+    return _load_json(Path(pattern_dir) / 'cassazione/2_cassazione.json')['suggestions']
+
+
+JSON_LOADERS = {
+    'mef_materia': mef_materia_terms,
+    'mef_classificazione': mef_classificazione_terms,
+    'mef_autosuggest': mef_autosuggest_terms,
+    'giustizia_tributaria': giustizia_tributaria_terms,
+    'cassazione': cassazione_terms,
+}
+
+
+def _is_numeric(term) -> bool:
+    """Suggerimenti solo numerici ("104", "104 1992"): match ovunque, esclusi"""
+    text = term if isinstance(term, str) else term[0]
+    return not any(c.isalpha() for c in text)
+
+
+def source_files(pattern_dir: Path = PATTERN_DIR) -> Dict[str, Path]:
+    """Tutti i file sorgente dell'indice (liste TXT + JSON)"""
+    files = {name: Path(pattern_dir) / filename for name, filename in TAXONOMY_LISTS.items()}
+    files.update({name: Path(pattern_dir) / filename for name, filename in JSON_SOURCES.items()})
+    return files
+
+
+def _sha256(path: Path) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def compile_matcher(pattern_dir: Path = PATTERN_DIR) -> TaxonomyMatcher:
+    """Matcher con tutte le liste: TXT di TAXONOMY_LISTS + tassonomie JSON"""
+    matcher = TaxonomyMatcher()
+    for list_name, filename in TAXONOMY_LISTS.items():
+        with open(Path(pattern_dir) / filename, 'r', encoding='utf-8') as f:
+            matcher.add_terms(list_name, f)
+    for list_name, loader in JSON_LOADERS.items():
+        matcher.add_terms(list_name, (t for t in loader(pattern_dir) if not _is_numeric(t)))
+    matcher.automaton.build()
+    return matcher
+
+
+# ==================== SCRITTURA ====================
+
+def _uint32(values) -> bytes:
+    data = array.array('I', values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tobytes()
+
+
+def write_index(matcher: TaxonomyMatcher, output_path: Path,
+                pattern_dir: Optional[Path] = None) -> Dict:
+    """
+    Serializza automa e termini di un matcher già costruito
+
+    Con pattern_dir il footer registra lo sha256 delle sorgenti (is_stale()).
+
+    Returns:
+        Footer scritto (sezioni, conteggi, sorgenti)
+    """
+    automaton = matcher.automaton
+    if not automaton._built:
+        automaton.build()
+
+    vocab = sorted(automaton.vocab.items(), key=lambda x: x[1])
+    tokens = [token for token, _ in vocab]
+
+    goto_offsets, goto_tokens, goto_targets = [0], [], []
+    for edges in automaton.goto:
+        for tid in sorted(edges):
+            goto_tokens.append(tid)
+            goto_targets.append(edges[tid])
+        goto_offsets.append(len(goto_tokens))
+
+    out_offsets, out_ids = [0], []
+    for outputs in automaton.output:
+        out_ids.extend(outputs)
+        out_offsets.append(len(out_ids))
+
+    normalized = {pid: ' '.join(key) for key, pid in matcher._pattern_ids.items()}
+    term_offsets, records = [0], []
+    size = 0
+    for pid, entries in enumerate(matcher.terms):
+        record = json.dumps([normalized.get(pid, ''), [[n, t, list(c)] for n, t, c in entries]],
+                            ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        records.append(record)
+        size += len(record)
+        term_offsets.append(size)
+
+    sections = [
+        ('vocab', '\n'.join(tokens).encode('utf-8')),
+        ('goto_offsets', _uint32(goto_offsets)),
+        ('goto_tokens', _uint32(goto_tokens)),
+        ('goto_targets', _uint32(goto_targets)),
+        ('fail', _uint32(automaton.fail)),
+        ('out_offsets', _uint32(out_offsets)),
+        ('out_ids', _uint32(out_ids)),
+        ('lengths', _uint32(automaton.lengths)),
+        ('term_offsets', _uint32(term_offsets)),
+        ('term_records', b''.join(records)),
+    ]
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_suffix(output_path.suffix + '.tmp')
+
+    layout = {}
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        for name, data in sections:
+            f.write(b'\0' * (-f.tell() % ALIGNMENT))
+            layout[name] = [f.tell(), len(data)]
+            f.write(data)
+
+        footer = {
+            'version': 1,
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'sections': layout,
+            'counts': {
+                'nodes': len(automaton.goto),
+                'edges': len(goto_tokens),
+                'patterns': len(matcher.terms),
+                'vocab': len(tokens),
+            },
+            'list_sizes': matcher.list_sizes,
+            'pattern_dir': str(pattern_dir) if pattern_dir else None,
+            'sources': {
+                name: {'file': str(path.relative_to(pattern_dir)), 'sha256': _sha256(path)}
+                for name, path in (source_files(pattern_dir) if pattern_dir else {}).items()
+            },
+        }
+        encoded = json.dumps(footer, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        f.write(encoded)
+        f.write(struct.pack('<Q', len(encoded)))
+        f.write(MAGIC)
+
+    # Rename atomico: i worker che hanno già l'indice aperto tengono il vecchio
+    tmp_path.replace(output_path)
+    return footer
+
+
+def build_index(pattern_dir: Path = PATTERN_DIR, output_path: Path = DEFAULT_INDEX_PATH) -> Dict:
+    """Compila tutte le tassonomie di pattern/ in un indice binario"""
+    matcher = compile_matcher(pattern_dir)
+    return write_index(matcher, output_path, pattern_dir)
+
+
+# ==================== LETTURA ====================
+
+class _LazyTable:
+    """Sequenza di nodi/pattern decodificati al primo accesso (CSR su memory map)"""
+
+    def __init__(self, offsets: memoryview, decode):
+        self._offsets = offsets
+        self._decode = decode
+        self._cache = [None] * (len(offsets) - 1)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def __getitem__(self, i):
+        value = self._cache[i]
+        if value is None:
+            value = self._cache[i] = self._decode(self._offsets[i], self._offsets[i + 1])
+        return value
+
+    def __iter__(self) -> Iterator:
+        for i in range(len(self)):
+            yield self[i]
+
+
+class TaxonomyIndex:
+    """
+    Indice aperto in memory map
+
+    Il matcher (sola lettura) ha la stessa interfaccia di
+    TaxonomyMatcher.from_pattern_dir(): find(), match(), stats().
+    """
+
+    def __init__(self, path: Path = DEFAULT_INDEX_PATH):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        trailer = len(MAGIC) + 8
+        if self._mm[:len(MAGIC)] != MAGIC or self._mm[-len(MAGIC):] != MAGIC:
+            raise ValueError(f"Indice tassonomia non valido: {self.path}")
+
+        footer_len = struct.unpack('<Q', self._mm[-trailer:-len(MAGIC)])[0]
+        footer_start = len(self._mm) - trailer - footer_len
+        self.footer = json.loads(self._mm[footer_start:footer_start + footer_len].decode('utf-8'))
+
+        view = memoryview(self._mm)
+        self._sections = {
+            name: view[offset:offset + length]
+            for name, (offset, length) in self.footer['sections'].items()
+        }
+        # Viste sulla map da rilasciare in close()
+        self._views = [view, *self._sections.values()]
+        self.matcher = self._load_matcher()
+
+    def _array(self, name: str):
+        """Sezione uint32: memoryview sulla map (copia solo su macchine big-endian)"""
+        data = self._sections[name]
+        if sys.byteorder == 'little':
+            values = data.cast('I')
+            self._views.append(values)
+            return values
+        values = array.array('I', data.tobytes())
+        values.byteswap()
+        return values
+
+    def _load_matcher(self) -> TaxonomyMatcher:
+        vocab_bytes = bytes(self._sections['vocab'])
+        tokens = vocab_bytes.decode('utf-8').split('\n') if vocab_bytes else []
+
+        goto_tokens = self._array('goto_tokens')
+        goto_targets = self._array('goto_targets')
+        out_ids = self._array('out_ids')
+        records = self._sections['term_records']
+
+        def decode_edges(start, end):
+            return dict(zip(goto_tokens[start:end], goto_targets[start:end]))
+
+        def decode_outputs(start, end):
+            return tuple(out_ids[start:end])
+
+        def decode_terms(start, end):
+            _, entries = json.loads(bytes(records[start:end]).decode('utf-8'))
+            return [(name, term, tuple(codes)) for name, term, codes in entries]
+
+        automaton = AhoCorasick()
+        automaton.vocab = dict(zip(tokens, range(len(tokens))))
+        automaton.goto = _LazyTable(self._array('goto_offsets'), decode_edges)
+        automaton.fail = self._array('fail')
+        automaton.output = _LazyTable(self._array('out_offsets'), decode_outputs)
+        automaton.lengths = self._array('lengths')
+        automaton._built = True
+
+        matcher = TaxonomyMatcher()
+        matcher.automaton = automaton
+        matcher.terms = _LazyTable(self._array('term_offsets'), decode_terms)
+        matcher.list_sizes = dict(self.footer['list_sizes'])
+        return matcher
+
+    def normalized(self, pattern_id: int) -> str:
+        """Forma normalizzata (token separati da spazio) di un pattern"""
+        offsets = self.matcher.terms._offsets
+        record = bytes(self._sections['term_records'][offsets[pattern_id]:offsets[pattern_id + 1]])
+        return json.loads(record.decode('utf-8'))[0]
+
+    def is_stale(self, pattern_dir: Optional[Path] = None) -> bool:
+        """True se un file sorgente è cambiato (o mancante) rispetto alla build"""
+        pattern_dir = Path(pattern_dir or self.footer['pattern_dir'] or PATTERN_DIR)
+        for source in self.footer['sources'].values():
+            path = pattern_dir / source['file']
+            if not path.exists() or _sha256(path) != source['sha256']:
+                return True
+        return False
+
+    def stats(self) -> Dict:
+        return {
+            **self.footer['counts'],
+            'lists': dict(self.footer['list_sizes']),
+            'file_bytes': len(self._mm),
+            'built_at': self.footer['built_at'],
+        }
+
+    def close(self):
+        """Rilascia le viste e chiude la memory map (il matcher non è più utilizzabile)"""
+        if self._mm.closed:
+            return
+        self.matcher = None
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._sections = {}
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def load_matcher(index_path: Path = DEFAULT_INDEX_PATH, pattern_dir: Path = PATTERN_DIR,
+                 build_missing: bool = True) -> TaxonomyMatcher:
+    """
+    Matcher dall'indice compilato (lo compila se manca o è obsoleto e build_missing)
+
+    Per i worker: aprire l'indice costa millisecondi, ricompilarlo secondi.
+    Se le sorgenti in pattern_dir sono cambiate dopo la build e build_missing
+    è False, l'indice obsoleto viene usato con un avviso.
+    """
+    index_path = Path(index_path)
+    if not index_path.exists():
+        if not build_missing:
+            raise FileNotFoundError(f"Indice tassonomia non trovato: {index_path}")
+        build_index(pattern_dir, index_path)
+        return TaxonomyIndex(index_path).matcher
+
+    index = TaxonomyIndex(index_path)
+    if not index.is_stale(pattern_dir):
+        return index.matcher
+
+    if not build_missing:
+        print(f"⚠️  Indice tassonomia obsoleto rispetto a {pattern_dir}: {index_path} (rigenera con build)")
+        return index.matcher
+
+    print(f"⚠️  Indice tassonomia obsoleto rispetto a {pattern_dir}: ricompilo {index_path}")
+    index.close()
+    build_index(pattern_dir, index_path)
+    return TaxonomyIndex(index_path).matcher
+
+
+def benchmark(index_path: Path = DEFAULT_INDEX_PATH, pattern_dir: Path = PATTERN_DIR,
+              txt_dir: Path = Path('txt'), repeat: int = 5) -> Dict:
+    """
+    Avvio worker: compilazione da JSON/TXT vs apertura indice, più verifica
+    che i match sulle sentenze coincidano
+    """
+    start = time.perf_counter()
+    compiled = compile_matcher(pattern_dir)
+    compile_seconds = time.perf_counter() - start
+
+    load_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        loaded = TaxonomyIndex(index_path).matcher
+        load_times.append(time.perf_counter() - start)
+
+    texts = [p.read_text(encoding='utf-8') for p in sorted(Path(txt_dir).glob('*.txt')) if p.stem != 'template']
+
+    start = time.perf_counter()
+    mismatches = sum(compiled.match(text) != loaded.match(text) for text in texts)
+    compare_seconds = time.perf_counter() - start
+
+    return {
+        'compile_ms': compile_seconds * 1000,
+        'load_ms': min(load_times) * 1000,
+        'speedup': compile_seconds / min(load_times) if min(load_times) else 0,
+        'documents': len(texts),
+        'mismatches': mismatches,
+        'compare_seconds': compare_seconds,
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Taxonomy Index - tassonomie di pattern/ compilate per mmap")
+    parser.add_argument("--index", type=str, default=str(DEFAULT_INDEX_PATH),
+                        help=f"File indice (default: {DEFAULT_INDEX_PATH})")
+    parser.add_argument("--pattern-dir", type=str, default=str(PATTERN_DIR), help="Directory tassonomie (default: pattern)")
+    subparsers = parser.add_subparsers(dest='command', help='Comando da eseguire')
+
+    subparsers.add_parser('build', help='Compila liste TXT e JSON in un indice binario')
+    subparsers.add_parser('info', help='Statistiche indice e stato sorgenti')
+
+    lookup_parser = subparsers.add_parser('lookup', help='Liste e codici dei termini trovati in un testo')
+    lookup_parser.add_argument("text", type=str, help="Testo (o frase) da cercare")
+
+    bench_parser = subparsers.add_parser('bench', help='Compilazione da sorgenti vs apertura indice')
+    bench_parser.add_argument("--txt-dir", type=str, default="txt", help="Directory TXT (default: txt)")
+
+    args = parser.parse_args()
+    index_path = Path(args.index)
+    pattern_dir = Path(args.pattern_dir)
+
+    if args.command == 'build':
+        start = time.time()
+        footer = build_index(pattern_dir, index_path)
+        counts = footer['counts']
+        print(f"✅ Indice creato: {index_path} ({time.time() - start:.1f}s, "
+              f"{index_path.stat().st_size / 1024 / 1024:.2f} MB)")
+        print(f"📊 {counts['patterns']:,} pattern, {counts['nodes']:,} nodi, "
+              f"{counts['edges']:,} archi, {counts['vocab']:,} token")
+        for list_name, size in footer['list_sizes'].items():
+            print(f"   {list_name:22s} {size:,}")
+
+    elif args.command == 'info':
+        start = time.perf_counter()
+        index = TaxonomyIndex(index_path)
+        load_ms = (time.perf_counter() - start) * 1000
+        stats = index.stats()
+        print(f"📦 {index_path} ({stats['file_bytes'] / 1024 / 1024:.2f} MB, build {stats['built_at']})")
+        print(f"📊 {stats['patterns']:,} pattern, {stats['nodes']:,} nodi, "
+              f"{stats['edges']:,} archi, {stats['vocab']:,} token")
+        for list_name, size in stats['lists'].items():
+            print(f"   {list_name:22s} {size:,}")
+        print(f"⚡ Apertura: {load_ms:.1f} ms")
+        if index.is_stale(pattern_dir):
+            print("⚠️  Sorgenti modificate dopo la build: rieseguire 'build'")
+
+    elif args.command == 'lookup':
+        index = TaxonomyIndex(index_path)
+        for start, end, pattern_id in index.matcher.find(args.text, overlapping=True):
+            print(f"\n[{start}:{end}] {args.text[start:end]!r} → {index.normalized(pattern_id)}")
+            for list_name, term, codes in index.matcher.terms[pattern_id]:
+                print(f"   {list_name:22s} {term}" + (f"  {', '.join(codes)}" if codes else ''))
+
+    elif args.command == 'bench':
+        stats = benchmark(index_path, pattern_dir, Path(args.txt_dir))
+        print("="*80)
+        print("TAXONOMY INDEX - Avvio worker")
+        print("="*80)
+        print(f"Compilazione da JSON/TXT:  {stats['compile_ms']:.0f} ms")
+        print(f"Apertura indice (mmap):    {stats['load_ms']:.1f} ms")
+        print(f"Speedup:                   {stats['speedup']:.0f}x")
+        print(f"Sentenze confrontate:      {stats['documents']} ({stats['mismatches']} differenze)")
+        print("="*80)
+
+    else:
+        parser.print_help()
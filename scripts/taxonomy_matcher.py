@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Taxonomy Matcher - Livelli 1-2 di pattern/STRATEGIA_CATEGORIZZAZIONE.md
+Whitelist tributaria, blacklist penale/civile e graylist ambigua cercate in
+un solo passaggio lineare per sentenza con un automa Aho-Corasick.
+
+L'automa lavora a livello di parola: testo e termini vengono normalizzati
+(minuscolo, senza accenti, punteggiatura = separatore) e spezzati in token;
+le transizioni sono sui token, quindi i match rispettano sempre i confini
+di parola ("iva" non trova "derivante"). Le posizioni restituite sono
+offset di carattere nel testo originale.
+
+Output per lista: numero di match, conteggio per termine e posizioni, così
+allo step Gemini arrivano solo i casi davvero ambigui.
+"""
+
+import re
+import json
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+PATTERN_DIR = Path('pattern')
+
+# Liste della strategia di categorizzazione (livello 1, 2 e contesto LLM)
+TAXONOMY_LISTS = {
+    'whitelist': 'whitelist_tributario_completa.txt',
+    'blacklist': 'cassazione/blacklist_penale_civile.txt',
+    'graylist': 'cassazione/graylist_ambigui.txt',
+}
+
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+
+def _build_fold_table() -> Dict[int, str]:
+    """
+    Tabella minuscolo + senza accenti per i caratteri latini
+
+    Ogni carattere è sostituito da un solo carattere, così gli offset del
+    testo normalizzato coincidono con quelli del testo originale.
+    """
+    table = {}
+    for code in range(0x41, 0x250):
+        char = chr(code)
+        base = unicodedata.normalize('NFKD', char.lower())
+        base = ''.join(c for c in base if not unicodedata.combining(c))
+        if len(base) == 1 and base != char:
+            table[code] = base
+    return table
+
+
+FOLD_TABLE = _build_fold_table()
+
+
+def fold(text: str) -> str:
+    """Minuscolo senza accenti, stessa lunghezza del testo originale"""
+    return text.translate(FOLD_TABLE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Token normalizzati di un termine"""
+    return TOKEN_PATTERN.findall(fold(text))
+
+
+class AhoCorasick:
+    """
+    Automa Aho-Corasick su sequenze di token
+
+    Nodi come liste parallele (goto, fail, output); le uscite dei suffissi
+    vengono unite in fase di costruzione, così la scansione non segue
+    catene di output.
+    """
+
+    def __init__(self):
+        self.vocab: Dict[str, int] = {}
+        self.goto: List[Dict[int, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[Tuple[int, ...]] = [()]
+        self.lengths: List[int] = []
+        self._built = False
+
+    def add(self, tokens: List[str]) -> int:
+        """Aggiunge una sequenza di token, ritorna l'id pattern"""
+        node = 0
+        for token in tokens:
+            tid = self.vocab.setdefault(token, len(self.vocab))
+            nxt = self.goto[node].get(tid)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][tid] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(())
+            node = nxt
+
+        pattern_id = len(self.lengths)
+        self.lengths.append(len(tokens))
+        self.output[node] = self.output[node] + (pattern_id,)
+        self._built = False
+        return pattern_id
+
+    def build(self):
+        """Calcola i link di fallimento (visita in ampiezza)"""
+        queue = list(self.goto[0].values())
+        for node in queue:
+            self.fail[node] = 0
+
+        i = 0
+        while i < len(queue):
+            node = queue[i]
+            i += 1
+            for tid, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and tid not in self.goto[state]:
+                    state = self.fail[state]
+                target = self.goto[state].get(tid, 0)
+                self.fail[child] = target if target != child else 0
+                if self.output[self.fail[child]]:
+                    self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+        self._built = True
+
+    def iter_matches(self, token_ids: Iterable[Optional[int]]):
+        """
+        Match su una sequenza di id token (None = token fuori vocabolario)
+
+        Yields:
+            (indice ultimo token, pattern_id)
+        """
+        if not self._built:
+            self.build()
+
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+
+        for i, tid in enumerate(token_ids):
+            if tid is None:
+                # Nessun pattern contiene questo token
+                state = 0
+                continue
+            while state and tid not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(tid, 0)
+            for pattern_id in output[state]:
+                yield i, pattern_id
+
+
+class TaxonomyMatcher:
+    """Whitelist / blacklist / graylist in un unico automa"""
+
+    def __init__(self):
+        self.automaton = AhoCorasick()
+        # pattern_id → [(lista, termine originale, codici materia/classificazione)],
+        # una voce per lista (la prima grafia incontrata)
+        self.terms: List[List[Tuple[str, str, Tuple[str, ...]]]] = []
+        self._pattern_ids: Dict[Tuple[str, ...], int] = {}
+        self.list_sizes: Dict[str, int] = {}
+
+    def add_terms(self, list_name: str, terms: Iterable[Union[str, Tuple[str, Iterable[str]]]]) -> int:
+        """
+        Aggiunge i termini di una lista (termini uguali dopo normalizzazione condividono il pattern)
+
+        Grafie diverse dello stesso termine nella stessa lista ("imu (ex ici)" /
+        "imu ex ici") diventano una sola voce: resta la prima, i codici si uniscono.
+
+        Args:
+            list_name: Nome lista
+            terms: Termini, oppure coppie (termine, codici) per le tassonomie
+                   codificate (materie/classificazioni MEF)
+        """
+        added = 0
+        for item in terms:
+            term, codes = (item, ()) if isinstance(item, str) else item
+            # "=" finale: rumore di estrazione nelle liste TXT
+            term = term.strip().rstrip('=').strip()
+            tokens = tuple(tokenize(term))
+            if not tokens:
+                continue
+
+            pattern_id = self._pattern_ids.get(tokens)
+            if pattern_id is None:
+                pattern_id = self.automaton.add(list(tokens))
+                self._pattern_ids[tokens] = pattern_id
+                self.terms.append([])
+
+            entries = self.terms[pattern_id]
+            for i, (name, existing, existing_codes) in enumerate(entries):
+                if name == list_name:
+                    # Stesso termine normalizzato con altri codici (es. classificazione
+                    # in più materie) o altra grafia
+                    merged = existing_codes + tuple(c for c in codes if c not in existing_codes)
+                    entries[i] = (name, existing, merged)
+                    break
+            else:
+                entries.append((list_name, term, tuple(dict.fromkeys(codes))))
+                added += 1
+
+        self.list_sizes[list_name] = self.list_sizes.get(list_name, 0) + added
+        return added
+
+    @classmethod
+    def from_pattern_dir(cls, pattern_dir: Path = PATTERN_DIR,
+                         lists: Optional[Dict[str, str]] = None) -> 'TaxonomyMatcher':
+        """Carica le liste di pattern/ (default: TAXONOMY_LISTS)"""
+        matcher = cls()
+        for list_name, filename in (lists or TAXONOMY_LISTS).items():
+            path = Path(pattern_dir) / filename
+            with open(path, 'r', encoding='utf-8') as f:
+                matcher.add_terms(list_name, f)
+        matcher.automaton.build()
+        return matcher
+
+    def _token_matches(self, text: str) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int, int]]]:
+        """Span di carattere dei token e match (token iniziale, token finale, pattern_id)"""
+        vocab = self.automaton.vocab
+
+        # lower() è molto più veloce di translate(); gli accenti si tolgono
+        # solo sui token non ASCII fuori vocabolario
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            lowered = fold(text)
+
+        spans = []
+        token_ids = []
+        for match in TOKEN_PATTERN.finditer(lowered):
+            token = match.group()
+            tid = vocab.get(token)
+            if tid is None and not token.isascii():
+                tid = vocab.get(fold(token))
+            spans.append(match.span())
+            token_ids.append(tid)
+
+        lengths = self.automaton.lengths
+        matches = [
+            (end_token - lengths[pattern_id] + 1, end_token, pattern_id)
+            for end_token, pattern_id in self.automaton.iter_matches(token_ids)
+        ]
+        return spans, matches
+
+    def find_by_list(self, text: str, overlapping: bool = False) -> Dict[str, List[Tuple[int, int, int]]]:
+        """
+        Match nel testo raggruppati per lista
+
+        Le sovrapposizioni si risolvono dentro ogni lista: un termine più
+        lungo della graylist ("ricorso incidentale") non toglie alla
+        whitelist il suo match ("ricorso"), così i conteggi di una lista
+        non dipendono dalle altre liste caricate.
+
+        Args:
+            text: Testo sentenza
+            overlapping: Se False tiene, per lista, il match più lungo a partire
+                         da sinistra ("abitazione principale" e non anche "abitazione")
+
+        Returns:
+            {lista: [(start, end, pattern_id), ...]} con offset di carattere nel testo
+        """
+        spans, matches = self._token_matches(text)
+
+        by_list: Dict[str, List[Tuple[int, int, int]]] = {}
+        for match in matches:
+            for list_name in dict.fromkeys(entry[0] for entry in self.terms[match[2]]):
+                by_list.setdefault(list_name, []).append(match)
+
+        for list_name, list_matches in by_list.items():
+            if not overlapping:
+                list_matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+                selected = []
+                last_end = -1
+                for start_token, end_token, pattern_id in list_matches:
+                    if start_token > last_end:
+                        selected.append((start_token, end_token, pattern_id))
+                        last_end = end_token
+                list_matches = selected
+            by_list[list_name] = [(spans[s][0], spans[e][1], pid) for s, e, pid in list_matches]
+
+        return by_list
+
+    def find(self, text: str, overlapping: bool = False) -> List[Tuple[int, int, int]]:
+        """
+        Match nel testo (unione dei match di find_by_list)
+
+        Returns:
+            Lista (start, end, pattern_id) con offset di carattere nel testo
+        """
+        found = set()
+        for list_matches in self.find_by_list(text, overlapping).values():
+            found.update(list_matches)
+        return sorted(found, key=lambda m: (m[0], m[0] - m[1], m[2]))
+
+    def match(self, text: str, overlapping: bool = False, with_positions: bool = True) -> Dict:
+        """
+        Conteggi e posizioni per lista
+
+        'exclusive' conta i match di termini che non compaiono in un'altra
+        lista di TAXONOMY_LISTS ("ricorso" è sia whitelist sia graylist: conta
+        in 'hits' ma non in 'exclusive').
+
+        Returns:
+            {lista: {'hits': n, 'exclusive': n, 'terms': {termine: n}, 'codes': {codice: n},
+                     'positions': [[start, end, termine], ...]}}
+        """
+        result = {
+            name: {'hits': 0, 'exclusive': 0, 'terms': {}, 'codes': {}, 'positions': []}
+            for name in self.list_sizes
+        }
+
+        for list_name, list_matches in self.find_by_list(text, overlapping).items():
+            bucket = result[list_name]
+            for start, end, pattern_id in list_matches:
+                entries = self.terms[pattern_id]
+                shared = any(name != list_name and name in TAXONOMY_LISTS for name, _, _ in entries)
+                # Un hit per match e lista
+                for name, term, codes in entries:
+                    if name != list_name:
+                        continue
+                    bucket['hits'] += 1
+                    if not shared:
+                        bucket['exclusive'] += 1
+                    bucket['terms'][term] = bucket['terms'].get(term, 0) + 1
+                    for code in codes:
+                        bucket['codes'][code] = bucket['codes'].get(code, 0) + 1
+                    if with_positions:
+                        bucket['positions'].append([start, end, term])
+                    break
+
+        if not with_positions:
+            for bucket in result.values():
+                del bucket['positions']
+
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            'patterns': len(self.terms),
+            'nodes': len(self.automaton.goto),
+            'vocab': len(self.automaton.vocab),
+            'lists': dict(self.list_sizes),
+        }
+
+
+def naive_match(text: str, terms_by_list: Dict[str, List[str]]) -> Dict[str, int]:
+    """Ricerca `term in text` per termine (solo per il benchmark)"""
+    text = text.lower()
+    return {
+        name: sum(1 for term in terms if term in text)
+        for name, terms in terms_by_list.items()
+    }
+
+
+def benchmark(txt_dir: Path = Path('txt'), pattern_dir: Path = PATTERN_DIR, naive_docs: int = 20) -> Dict:
+    """
+    Automa vs `term in text` (sulle prime naive_docs sentenze: il metodo
+    naive è troppo lento per l'intero corpus)
+    """
+    start = time.perf_counter()
+    matcher = TaxonomyMatcher.from_pattern_dir(pattern_dir)
+    build_seconds = time.perf_counter() - start
+
+    texts = [p.read_text(encoding='utf-8') for p in sorted(Path(txt_dir).glob('*.txt')) if p.stem != 'template']
+
+    start = time.perf_counter()
+    for text in texts:
+        matcher.match(text)
+    automaton_seconds = time.perf_counter() - start
+
+    terms_by_list = {}
+    for list_name, filename in TAXONOMY_LISTS.items():
+        with open(Path(pattern_dir) / filename, 'r', encoding='utf-8') as f:
+            terms_by_list[list_name] = [line.strip().lower() for line in f if line.strip()]
+
+    sample = texts[:naive_docs]
+    start = time.perf_counter()
+    for text in sample:
+        naive_match(text, terms_by_list)
+    naive_seconds = time.perf_counter() - start
+
+    automaton_ms = automaton_seconds / len(texts) * 1000 if texts else 0
+    naive_ms = naive_seconds / len(sample) * 1000 if sample else 0
+
+    return {
+        'documents': len(texts),
+        'build_seconds': build_seconds,
+        'automaton_ms': automaton_ms,
+        'naive_ms': naive_ms,
+        'speedup': naive_ms / automaton_ms if automaton_ms else 0,
+        **matcher.stats(),
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Taxonomy Matcher - whitelist/blacklist/graylist Aho-Corasick")
+    parser.add_argument("--pattern-dir", type=str, default=str(PATTERN_DIR), help="Directory liste (default: pattern)")
+    subparsers = parser.add_subparsers(dest='command', help='Comando da eseguire')
+
+    scan_parser = subparsers.add_parser('scan', help='Match su tutte le sentenze di una directory')
+    scan_parser.add_argument("--txt-dir", type=str, default="txt", help="Directory TXT (default: txt)")
+    scan_parser.add_argument("--output", type=str, default="categorization/taxonomy_matches.jsonl",
+                             help="File JSONL output (default: categorization/taxonomy_matches.jsonl)")
+    scan_parser.add_argument("--no-positions", action="store_true", help="Solo conteggi, senza posizioni")
+
+    show_parser = subparsers.add_parser('show', help='Match di una sentenza')
+    show_parser.add_argument("txt", type=str, help="File TXT")
+
+    bench_parser = subparsers.add_parser('bench', help='Automa vs ricerca naive')
+    bench_parser.add_argument("--txt-dir", type=str, default="txt", help="Directory TXT (default: txt)")
+    bench_parser.add_argument("--naive-docs", type=int, default=20, help="Sentenze per la ricerca naive (default: 20)")
+
+    args = parser.parse_args()
+
+    if args.command == 'scan':
+        matcher = TaxonomyMatcher.from_pattern_dir(Path(args.pattern_dir))
+        txt_paths = sorted(p for p in Path(args.txt_dir).glob('*.txt') if p.stem != 'template')
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+
+        start = time.time()
+        with open(output, 'w', encoding='utf-8') as f:
+            for txt_path in txt_paths:
+                result = matcher.match(txt_path.read_text(encoding='utf-8'), with_positions=not args.no_positions)
+                f.write(json.dumps({'sentenza_id': txt_path.stem, **result}, ensure_ascii=False) + '\n')
+        elapsed = time.time() - start
+
+        print(f"✅ {len(txt_paths)} sentenze → {output} ({elapsed:.1f}s, "
+              f"{len(txt_paths) / elapsed if elapsed else 0:.0f} docs/s)")
+
+    elif args.command == 'show':
+        matcher = TaxonomyMatcher.from_pattern_dir(Path(args.pattern_dir))
+        result = matcher.match(Path(args.txt).read_text(encoding='utf-8'))
+        for list_name, bucket in result.items():
+            top = sorted(bucket['terms'].items(), key=lambda x: x[1], reverse=True)[:15]
+            print(f"\n{list_name.upper()} ({bucket['hits']} match)")
+            for term, count in top:
+                print(f"   {count:3d}  {term}")
+
+    elif args.command == 'bench':
+        stats = benchmark(Path(args.txt_dir), Path(args.pattern_dir), args.naive_docs)
+        print("="*80)
+        print("TAXONOMY MATCHER - Benchmark")
+        print("="*80)
+        print(f"Liste:              {stats['lists']}")
+        print(f"Automa:             {stats['patterns']:,} pattern, {stats['nodes']:,} nodi, "
+              f"{stats['vocab']:,} token ({stats['build_seconds']:.2f}s costruzione)")
+        print(f"Sentenze:           {stats['documents']}")
+        print(f"Aho-Corasick:       {stats['automaton_ms']:.2f} ms/sentenza (3 liste, una passata)")
+        print(f"term in text:       {stats['naive_ms']:.2f} ms/sentenza")
+        print(f"Speedup:            {stats['speedup']:.0f}x")
+        print("="*80)
+
+    else:
+        parser.print_help()
@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+TXT Archive - Archivio TXT compresso ad accesso casuale
+Sostituisce i tar.gz per anno: ogni sentenza è un frame compresso
+indipendente (zstd con dizionario addestrato sul corpus, fallback zlib con
+dizionario preimpostato), più un indice sentenza_id → offset. Leggere una
+sentenza = un seek + la decompressione del solo frame, senza estrarre nulla.
+
+Formato file (.stxa):
+    MAGIC
+    dizionario (boilerplate comune: intestazioni, P.Q.M., formule di rito)
+    frame_1 ... frame_n (uno per sentenza, contigui)
+    footer JSON (codec, posizione dizionario, sentenze, offset, dimensioni)
+    lunghezza footer (8 byte little-endian) | MAGIC
+
+I consumatori di txt/<id>.txt usano read_sentenza_text(): prima il TXT su
+disco, altrimenti l'archivio che contiene la sentenza in txt_compressed/.
+"""
+
+import json
+import mmap
+import zlib
+import random
+import struct
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b'STXA1\n'
+ARCHIVE_SUFFIX = '.stxa'
+DEFAULT_ARCHIVE_DIR = Path('txt_compressed')
+
+# zstd 9: rapporto già migliore del tar.gz a velocità superiore. Sulle 133
+# sentenze di txt/ (0.98 MB) con dizionario da 34 KB: livello 9 → 0.29 MB
+# (306.303 byte, 3.4x); livello 19 → 0.28 MB (296.243 byte, 3.5x), ~3% in
+# meno a 1/6 della velocità
+DEFAULT_LEVELS = {'zstd': 9, 'zlib': 9}
+
+# Dimensione dizionario: zstd ~110 KB (default di zstd --train),
+# zlib al massimo la finestra di 32 KB
+ZSTD_DICT_SIZE = 112640
+ZLIB_DICT_SIZE = 32768
+MIN_DICT_SIZE = 4096
+DICT_SAMPLES = 2000
+
+# Campione ~30x il dizionario: oltre, il dizionario costa più di quanto fa
+# risparmiare sui frame (misurato sui TXT di txt/)
+DICT_SAMPLE_RATIO = 30
+
+
+def _require_zstd():
+    """Import lazy di zstandard"""
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Installa: pip install zstandard")
+    return zstandard
+
+
+def default_codec() -> str:
+    """zstd se installato, altrimenti zlib (libreria standard)"""
+    try:
+        _require_zstd()
+        return 'zstd'
+    except ImportError:
+        return 'zlib'
+
+
+# ==================== DIZIONARIO ====================
+
+def build_zlib_dictionary(samples: List[bytes], size: int = ZLIB_DICT_SIZE) -> bytes:
+    """
+    Dizionario preimpostato zlib dalle righe ricorrenti del corpus
+
+    Righe presenti in almeno due sentenze, pesate per frequenza × lunghezza;
+    le più utili vanno in fondo (distanze più brevi per deflate).
+    """
+    doc_freq = {}
+    for sample in samples:
+        for line in set(sample.splitlines(keepends=True)):
+            if len(line.strip()) >= 8:
+                doc_freq[line] = doc_freq.get(line, 0) + 1
+
+    ranked = sorted(
+        (line for line, freq in doc_freq.items() if freq >= 2),
+        key=lambda line: doc_freq[line] * len(line),
+        reverse=True
+    )
+
+    selected = []
+    total = 0
+    for line in ranked:
+        if total + len(line) > size:
+            continue
+        selected.append(line)
+        total += len(line)
+
+    return b''.join(reversed(selected))
+
+
+def train_dictionary(samples: List[bytes], codec: str = 'zstd', size: Optional[int] = None) -> bytes:
+    """
+    Addestra il dizionario su un campione di sentenze
+
+    Args:
+        samples: Testi (bytes UTF-8)
+        codec: 'zstd' (zstd --train) o 'zlib' (righe ricorrenti)
+        size: Dimensione massima dizionario in byte (default: in base al campione)
+
+    Returns:
+        Dizionario (b'' se il campione è troppo piccolo)
+    """
+    if not samples:
+        return b''
+
+    max_size = ZLIB_DICT_SIZE if codec == 'zlib' else ZSTD_DICT_SIZE
+    if not size:
+        size = min(max_size, max(MIN_DICT_SIZE, sum(len(s) for s in samples) // DICT_SAMPLE_RATIO))
+
+    if codec == 'zlib':
+        return build_zlib_dictionary(samples, min(size, ZLIB_DICT_SIZE))
+
+    zstandard = _require_zstd()
+    try:
+        return zstandard.train_dictionary(size, samples).as_bytes()
+    except zstandard.ZstdError as e:
+        print(f"⚠️  Training dizionario non riuscito ({e}): compressione senza dizionario")
+        return b''
+
+
+def sample_files(paths: List[Path], max_samples: int = DICT_SAMPLES, seed: int = 42) -> List[bytes]:
+    """Campione casuale (riproducibile) dei TXT per il training"""
+    paths = list(paths)
+    if len(paths) > max_samples:
+        paths = random.Random(seed).sample(paths, max_samples)
+    return [Path(p).read_bytes() for p in paths]
+
+
+# ==================== CODEC ====================
+
+def make_compressor(codec: str, dictionary: bytes = b'', level: Optional[int] = None) -> Callable[[bytes], bytes]:
+    """
+    Funzione di compressione di un singolo frame
+
+    Non condividere lo stesso compressore tra thread: crearne uno per thread.
+    """
+    level = level or DEFAULT_LEVELS[codec]
+
+    if codec == 'zstd':
+        zstandard = _require_zstd()
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        compressor = zstandard.ZstdCompressor(level=level, dict_data=dict_data, write_content_size=True)
+        return compressor.compress
+
+    if codec == 'zlib':
+        def compress(data: bytes) -> bytes:
+            obj = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS, zdict=dictionary) if dictionary \
+                else zlib.compressobj(level)
+            return obj.compress(data) + obj.flush()
+        return compress
+
+    raise ValueError(f"Codec non supportato: {codec}")
+
+
+def make_decompressor(codec: str, dictionary: bytes = b'') -> Callable[[bytes], bytes]:
+    """Funzione di decompressione di un singolo frame (una per thread)"""
+    if codec == 'zstd':
+        zstandard = _require_zstd()
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdDecompressor(dict_data=dict_data).decompress
+
+    if codec == 'zlib':
+        def decompress(frame: bytes) -> bytes:
+            obj = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+            return obj.decompress(frame) + obj.flush()
+        return decompress
+
+    raise ValueError(f"Codec non supportato: {codec}")
+
+
+# ==================== SCRITTURA ====================
+
+class TxtArchiveWriter:
+    """
+    Scrive sentenze come frame compressi indipendenti in un unico file
+
+    Scrive su <path>.tmp e rinomina in close(): in archive_dir compare solo
+    un archivio completo di footer.
+    """
+
+    def __init__(self, path: Path, dictionary: bytes = b'', codec: Optional[str] = None,
+                 level: Optional[int] = None):
+        self.path = Path(path)
+        self.codec = codec or default_codec()
+        self.level = level or DEFAULT_LEVELS[self.codec]
+        self.dictionary = dictionary
+        self._compress = make_compressor(self.codec, dictionary, self.level)
+        self._documents = {'sentenza_id': [], 'offset': [], 'size': []}
+
+        self.tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.tmp_path, 'wb')
+        self._file.write(MAGIC)
+        self._dict_offset = self._file.tell()
+        self._file.write(dictionary)
+        self.raw_bytes = 0
+
+    def add(self, sentenza_id: str, data: bytes):
+        """Comprime e aggiunge una sentenza (bytes UTF-8 del TXT)"""
+        self.add_frame(sentenza_id, self._compress(data), len(data))
+
+    def add_frame(self, sentenza_id: str, frame: bytes, size: int):
+        """Aggiunge un frame già compresso (con lo stesso codec e dizionario)"""
+        self._documents['sentenza_id'].append(sentenza_id)
+        self._documents['offset'].append(self._file.tell())
+        self._documents['size'].append(size)
+        self._file.write(frame)
+        self.raw_bytes += size
+
+    def close(self):
+        """Scrive footer con l'indice e sposta l'archivio sul path finale"""
+        if self._file.closed:
+            return
+
+        documents = dict(self._documents)
+        documents['offset'] = documents['offset'] + [self._file.tell()]
+
+        footer = json.dumps({
+            'version': 1,
+            'codec': self.codec,
+            'level': self.level,
+            'dict_offset': self._dict_offset,
+            'dict_length': len(self.dictionary),
+            'documents': documents,
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+        try:
+            self._file.write(footer)
+            self._file.write(struct.pack('<Q', len(footer)))
+            self._file.write(MAGIC)
+            self._file.close()
+        except BaseException:
+            self.abort()
+            raise
+
+        self.tmp_path.replace(self.path)
+
+    def abort(self):
+        """Scarta l'archivio incompleto"""
+        self._file.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Errore durante add: nessun archivio scritto
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+# ==================== LETTURA ====================
+
+class TxtArchive:
+    """
+    Lettura casuale (memory map) di un archivio scritto da TxtArchiveWriter
+
+    Il decompressore non è thread-safe: un'istanza per thread.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # File vuoto
+            self._file.close()
+            raise ValueError(f"Archivio TXT non valido: {self.path}")
+
+        trailer = len(MAGIC) + 8
+        try:
+            if self._mm[:len(MAGIC)] != MAGIC or self._mm[-len(MAGIC):] != MAGIC:
+                raise ValueError("magic")
+            footer_len = struct.unpack('<Q', self._mm[-trailer:-len(MAGIC)])[0]
+            footer_start = len(self._mm) - trailer - footer_len
+            footer = json.loads(self._mm[footer_start:footer_start + footer_len].decode('utf-8'))
+        except (ValueError, struct.error):
+            self.close()
+            raise ValueError(f"Archivio TXT non valido: {self.path}") from None
+
+        self.codec = footer['codec']
+        self.level = footer['level']
+        self.documents = footer['documents']
+        self.dictionary = self._mm[footer['dict_offset']:footer['dict_offset'] + footer['dict_length']]
+        self._pos = {sid: i for i, sid in enumerate(self.documents['sentenza_id'])}
+        self._decompress = make_decompressor(self.codec, self.dictionary)
+
+    @property
+    def sentenza_ids(self) -> List[str]:
+        return self.documents['sentenza_id']
+
+    def __contains__(self, sentenza_id: str) -> bool:
+        return sentenza_id in self._pos
+
+    def __len__(self) -> int:
+        return len(self._pos)
+
+    def size(self, sentenza_id: str) -> int:
+        """Dimensione originale del TXT in byte"""
+        return self.documents['size'][self._pos[sentenza_id]]
+
+    def frame(self, sentenza_id: str) -> bytes:
+        """Frame compresso (senza decomprimere)"""
+        i = self._pos[sentenza_id]
+        offsets = self.documents['offset']
+        return self._mm[offsets[i]:offsets[i + 1]]
+
+    def read(self, sentenza_id: str) -> bytes:
+        """Bytes originali del TXT"""
+        return self._decompress(self.frame(sentenza_id))
+
+    def read_text(self, sentenza_id: str) -> str:
+        """Testo del TXT (come open(..., newline=''))"""
+        return self.read(sentenza_id).decode('utf-8')
+
+    def iter_documents(self) -> Iterator[Tuple[str, bytes]]:
+        """(sentenza_id, bytes) nell'ordine dell'archivio"""
+        for sentenza_id in self.sentenza_ids:
+            yield sentenza_id, self.read(sentenza_id)
+
+    def stats(self) -> Dict:
+        compressed = self.documents['offset'][-1] - self.documents['offset'][0] if self.sentenza_ids else 0
+        raw = sum(self.documents['size'])
+        return {
+            'documents': len(self),
+            'codec': self.codec,
+            'level': self.level,
+            'dict_bytes': len(self.dictionary),
+            'raw_bytes': raw,
+            'frame_bytes': compressed,
+            'file_bytes': len(self._mm),
+            'ratio': raw / len(self._mm) if len(self._mm) else 0,
+        }
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArchiveSet:
+    """Tutti gli archivi .stxa di una directory (indici caricati al primo uso)"""
+
+    def __init__(self, archive_dir: Path = DEFAULT_ARCHIVE_DIR):
+        self.archive_dir = Path(archive_dir)
+        self._archives = None
+        self._owner = {}
+
+    def _load(self):
+        self._archives = []
+        if self.archive_dir.exists():
+            for path in sorted(self.archive_dir.glob(f'*{ARCHIVE_SUFFIX}')):
+                try:
+                    archive = TxtArchive(path)
+                except ValueError as e:
+                    # Un archivio rovinato non deve bloccare la lettura degli altri
+                    print(f"⚠️  {e}: ignorato")
+                    continue
+                self._archives.append(archive)
+                for sentenza_id in archive.sentenza_ids:
+                    self._owner[sentenza_id] = archive
+
+    def get(self, sentenza_id: str) -> Optional[TxtArchive]:
+        """Archivio che contiene la sentenza (None se assente)"""
+        if self._archives is None:
+            self._load()
+        return self._owner.get(sentenza_id)
+
+    def sentenza_ids(self) -> List[str]:
+        if self._archives is None:
+            self._load()
+        return list(self._owner)
+
+    def close(self):
+        for archive in self._archives or []:
+            archive.close()
+        self._archives = None
+        self._owner = {}
+
+
+_ARCHIVE_SETS: Dict[Path, ArchiveSet] = {}
+
+
+def _archive_set(archive_dir: Path) -> ArchiveSet:
+    archive_dir = Path(archive_dir)
+    if archive_dir not in _ARCHIVE_SETS:
+        _ARCHIVE_SETS[archive_dir] = ArchiveSet(archive_dir)
+    return _ARCHIVE_SETS[archive_dir]
+
+
+def read_sentenza_bytes(sentenza_id: str, txt_dir: Path = Path('txt'),
+                        archive_dir: Path = DEFAULT_ARCHIVE_DIR) -> Optional[bytes]:
+    """
+    Bytes del TXT di una sentenza
+
+    Ordine: txt_dir/<id>.txt, poi l'archivio .stxa in archive_dir che la
+    contiene. None se la sentenza non è disponibile.
+    """
+    txt_path = Path(txt_dir) / f"{sentenza_id}.txt"
+    if txt_path.exists():
+        return txt_path.read_bytes()
+
+    archive = _archive_set(archive_dir).get(sentenza_id)
+    if archive is not None:
+        return archive.read(sentenza_id)
+    return None
+
+
+def read_sentenza_text(sentenza_id: str, txt_dir: Path = Path('txt'),
+                       archive_dir: Path = DEFAULT_ARCHIVE_DIR) -> Optional[str]:
+    """Testo di una sentenza da TXT o archivio (None se non disponibile)"""
+    data = read_sentenza_bytes(sentenza_id, txt_dir, archive_dir)
+    return data.decode('utf-8') if data is not None else None
+
+
+def list_sentenza_ids(txt_dir: Path = Path('txt'), archive_dir: Path = DEFAULT_ARCHIVE_DIR) -> List[str]:
+    """ID delle sentenze disponibili come TXT o negli archivi (ordinati)"""
+    ids = {p.stem for p in Path(txt_dir).glob('*.txt') if p.stem != 'template'}
+    ids.update(_archive_set(archive_dir).sentenza_ids())
+    return sorted(ids)
+
+
+# ==================== COSTRUZIONE ====================
+
+def build_archive(txt_files: List[Path], output_path: Path, codec: Optional[str] = None,
+                  level: Optional[int] = None, dict_size: Optional[int] = None,
+                  dictionary: Optional[bytes] = None) -> Dict:
+    """
+    Crea un archivio dai TXT indicati
+
+    Args:
+        txt_files: TXT da archiviare (sentenza_id = nome file senza .txt)
+        output_path: File .stxa
+        codec: 'zstd' / 'zlib' (default: zstd se installato)
+        level: Livello compressione (default: DEFAULT_LEVELS)
+        dict_size: Dimensione dizionario da addestrare
+        dictionary: Dizionario già addestrato (salta il training)
+
+    Returns:
+        Statistiche archivio
+    """
+    codec = codec or default_codec()
+    if dictionary is None:
+        dictionary = train_dictionary(sample_files(txt_files), codec, dict_size)
+
+    with TxtArchiveWriter(output_path, dictionary, codec, level) as writer:
+        for txt_file in txt_files:
+            writer.add(Path(txt_file).stem, Path(txt_file).read_bytes())
+
+    with TxtArchive(output_path) as archive:
+        return archive.stats()
+
+
+if __name__ == '__main__':
+    import time
+    import argparse
+
+    parser = argparse.ArgumentParser(description="TXT Archive - archivio TXT compresso ad accesso casuale")
+    subparsers = parser.add_subparsers(dest='command', help='Comando da eseguire')
+
+    build_parser = subparsers.add_parser('build', help='Crea archivio da una directory TXT')
+    build_parser.add_argument("--txt-dir", type=str, default="txt", help="Directory TXT (default: txt)")
+    build_parser.add_argument("--output", type=str, required=True, help="File archivio .stxa")
+    build_parser.add_argument("--codec", choices=['zstd', 'zlib'], default=None, help="Codec (default: zstd se installato)")
+    build_parser.add_argument("--level", type=int, default=None, help="Livello compressione")
+
+    get_parser = subparsers.add_parser('get', help='Stampa il testo di una sentenza')
+    get_parser.add_argument("sentenza_id", type=str, help="ID sentenza")
+    get_parser.add_argument("--txt-dir", type=str, default="txt", help="Directory TXT (default: txt)")
+    get_parser.add_argument("--archive-dir", type=str, default=str(DEFAULT_ARCHIVE_DIR), help="Directory archivi")
+
+    info_parser = subparsers.add_parser('info', help='Statistiche archivio e tempo di lettura')
+    info_parser.add_argument("archive", type=str, help="File archivio .stxa")
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        txt_files = sorted(p for p in Path(args.txt_dir).glob('*.txt') if p.stem != 'template')
+        start = time.time()
+        stats = build_archive(txt_files, Path(args.output), args.codec, args.level)
+        print(f"✅ Archivio creato: {args.output} ({time.time() - start:.1f}s)")
+        print(f"📊 Sentenze: {stats['documents']} | codec {stats['codec']} livello {stats['level']}")
+        print(f"💾 Originale: {stats['raw_bytes'] / 1024 / 1024:.2f} MB")
+        print(f"📉 Archivio: {stats['file_bytes'] / 1024 / 1024:.2f} MB "
+              f"(dizionario {stats['dict_bytes'] / 1024:.0f} KB, rapporto {stats['ratio']:.1f}x)")
+    elif args.command == 'get':
+        text = read_sentenza_text(args.sentenza_id, Path(args.txt_dir), Path(args.archive_dir))
+        if text is None:
+            print(f"✗ Sentenza non trovata: {args.sentenza_id}")
+        else:
+            print(text)
+    elif args.command == 'info':
+        with TxtArchive(Path(args.archive)) as archive:
+            stats = archive.stats()
+            ids = archive.sentenza_ids
+            start = time.perf_counter()
+            for sentenza_id in ids:
+                archive.read(sentenza_id)
+            per_doc = (time.perf_counter() - start) / len(ids) * 1e6 if ids else 0
+        print(f"📦 {args.archive}")
+        print(f"📊 Sentenze: {stats['documents']} | codec {stats['codec']} livello {stats['level']}")
+        print(f"💾 Originale: {stats['raw_bytes'] / 1024 / 1024:.2f} MB")
+        print(f"📉 Archivio: {stats['file_bytes'] / 1024 / 1024:.2f} MB "
+              f"(dizionario {stats['dict_bytes'] / 1024:.0f} KB, rapporto {stats['ratio']:.1f}x)")
+        print(f"⚡ Lettura: {per_doc:.0f} µs/sentenza")
+    else:
+        parser.print_help()